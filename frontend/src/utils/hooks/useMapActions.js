@@ -81,7 +81,10 @@ const useMapActions = () => {
         };
       }
 
-      const response = await fetch(`${INTERNAL_PATH_URL}/api/get_model`, {
+      // Smaller, quantized models for phones and tablets
+      const lod = window.innerWidth < 1024 ? 'low' : 'medium';
+
+      const response = await fetch(`${INTERNAL_PATH_URL}/api/get_model?lod=${lod}`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json'
@@ -1,3 +1,5 @@
+import os
+import threading
 from flask import Flask, jsonify
 from flask_cors import CORS
 from routes.admin_routes import admin_bp
@@ -16,5 +18,22 @@ app.register_blueprint(admin_bp, url_prefix='/api')
 app.register_blueprint(internal_map_bp, url_prefix='/api')
 app.register_blueprint(outer_map_bp, url_prefix='/api')  # unchanged external map routes
 
+def prewarm():
+    """
+    Load everything the routes otherwise import or build on first use: the outdoor
+    routing graphs and landmark route tables, map popup images, folium and the 3D model
+    geometry stack. Call it from a gunicorn post_fork hook, or set APP_PREWARM=1 to run
+    it in a background thread at startup.
+    """
+    import folium  # noqa: F401
+    from services import model_generation  # noqa: F401
+    from services import route_table, map_assets
+    route_table.prewarm()
+    map_assets.prewarm()
+
+# OUTDOOR_GRAPH_PREWARM is the older name of APP_PREWARM and is still honoured.
+if "1" in (os.getenv("APP_PREWARM", "0"), os.getenv("OUTDOOR_GRAPH_PREWARM", "0")):
+    threading.Thread(target=prewarm, daemon=True).start()
+
 if __name__ == '__main__':
     app.run(debug=True)
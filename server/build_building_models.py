@@ -0,0 +1,33 @@
+import argparse
+import time
+from config import SessionLocal
+from services.models import Landmark
+from services.building_model import (
+    BUILDING_FLOOR_HEIGHT, BUILDING_LOD, load_building_sources, build_building_glb, save_building_model
+)
+
+# Build the stacked multi-floor GLB for one or more landmarks and store it in building_models.
+def build_landmarks(landmark_names, floor_height, lod):
+    if not landmark_names:
+        db = SessionLocal()
+        landmark_names = [lm.landmark_name for lm in db.query(Landmark).all()]
+        db.close()
+
+    for landmark_name in landmark_names:
+        floors = load_building_sources(landmark_name)
+        if not floors:
+            print(f"{landmark_name}: no floor files, skipped")
+            continue
+        start = time.perf_counter()
+        glb_bytes = build_building_glb(floors, floor_height=floor_height, lod=lod)
+        save_building_model(landmark_name, glb_bytes, {"floor_height": floor_height, "elevations": None, "lod": lod})
+        print(f"{landmark_name}: {len(floors)} floors, {len(glb_bytes) / 1024:.0f} KB in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute whole-building 3D models.")
+    parser.add_argument("landmarks", nargs="*", help="Landmark names (default: every landmark)")
+    parser.add_argument("--floor-height", type=float, default=BUILDING_FLOOR_HEIGHT,
+                        help="Vertical distance between stacked floors")
+    parser.add_argument("--lod", default=BUILDING_LOD, choices=["low", "medium", "high"])
+    args = parser.parse_args()
+    build_landmarks(args.landmarks, args.floor_height, args.lod)
@@ -0,0 +1,60 @@
+import os
+import sys
+import argparse
+import subprocess
+
+# Heavy packages that must not be imported when the app starts; they are loaded on
+# first use (or by app.prewarm).
+DEFERRED_MODULES = ["osmnx", "networkx", "geopandas", "folium", "cv2", "trimesh", "shapely", "matplotlib", "scipy"]
+
+# Import `module` in a fresh interpreter with -X importtime and return
+# [(cumulative_us, self_us, name, depth)] for every imported module.
+def measure_imports(module):
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite://")   # the database is never contacted while importing
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"import {module} failed:\n{result.stderr[-2000:]}")
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((int(cumulative_us), int(self_us), name.strip(), depth))
+    return imports
+
+def check(module, budget, top):
+    imports = measure_imports(module)
+    # -X importtime lists a module after everything it imported, so the target's subtree is
+    # everything between the previous top-level entry and the target's own line.
+    end = max(i for i, entry in enumerate(imports) if entry[3] == 0 and entry[2] == module)
+    start = max([i + 1 for i, entry in enumerate(imports[:end]) if entry[3] == 0] or [0])
+    subtree = imports[start:end + 1]
+    total = imports[end][0]
+    print(f"import {module}: {total / 1e6:.2f}s total, {len(subtree)} modules")
+    print(f"{'cumulative s':>12} {'self s':>8}  module (direct imports of {module})")
+    for cumulative, self_us, name, depth in sorted((i for i in subtree if i[3] == 1), reverse=True)[:top]:
+        print(f"{cumulative / 1e6:>12.3f} {self_us / 1e6:>8.3f}  {name}")
+
+    loaded = sorted({name.split(".")[0] for _, _, name, _ in subtree} & set(DEFERRED_MODULES))
+    failures = []
+    if loaded:
+        failures.append(f"heavy modules imported at startup: {', '.join(loaded)}")
+    if budget and total / 1e6 > budget:
+        failures.append(f"import took {total / 1e6:.2f}s, budget is {budget:.2f}s")
+    for failure in failures:
+        print("FAIL:", failure)
+    return not failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time breakdown of the server (python -X importtime) "
+                                                 "and a regression check that heavy modules stay lazy.")
+    parser.add_argument("module", nargs="?", default="app", help="Module to import (default: app)")
+    parser.add_argument("--budget", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET", "0")),
+                        help="Fail if importing takes longer than this many seconds (default: no limit)")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest top-level imports to list")
+    args = parser.parse_args()
+    sys.exit(0 if check(args.module, args.budget, args.top) else 1)
@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from services import graph_artifact, osmnx_compat
+from services.outdoor_graph import REGIONS, DEFAULT_REGION, NETWORK_TYPES, add_travel_times
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+
+# Build the OSM graph for one mode from the chosen source: a local .osm extract,
+# the cached Overpass responses, or (by default) osmnx's own download/cache.
+# Edges are annotated with travel times like the server's own graphs.
+def build_source_graph(mode, bbox, osm_file=None, cache_dir=None):
+    if osm_file or cache_dir:
+        elements = graph_artifact.load_osm_elements(osm_file=osm_file, cache_dir=cache_dir)
+        graph, source = graph_artifact.graph_from_osm_elements(elements, mode, bbox), (osm_file or cache_dir)
+    else:
+        graph, source = osmnx_compat.graph_from_bbox(bbox, mode), "osmnx"
+    return add_travel_times(graph, mode), source
+
+# The default region keeps <out>/<mode>; other region tiles go to <out>/regions/<region>/<mode>.
+# With shared=True the modes are merged into one artifact (<out>/shared) with per-edge mode masks.
+def compile_modes(modes, bbox, out_dir, osm_file=None, cache_dir=None, region=DEFAULT_REGION, shared=False):
+    directory_region = None if region == DEFAULT_REGION else region
+    compiled_modes = {}
+    for mode in modes:
+        start = time.perf_counter()
+        graph, source = build_source_graph(mode, bbox, osm_file, cache_dir)
+        compiled = graph_artifact.compile_graph(graph, mode, bbox, source=source, region=region)
+        if shared:
+            compiled_modes[mode] = compiled
+            print(f"{region}/{mode}: {compiled.node_count} nodes, {compiled.edge_count} edges "
+                  f"in {time.perf_counter() - start:.1f}s")
+            continue
+        path = graph_artifact.artifact_path(mode, out_dir, directory_region)
+        graph_artifact.save_artifact(compiled, path)
+        print(f"{region}/{mode}: {compiled.node_count} nodes, {compiled.edge_count} edges "
+              f"in {time.perf_counter() - start:.1f}s -> {path}")
+    if shared:
+        merged = graph_artifact.merge_mode_graphs(compiled_modes)
+        path = graph_artifact.artifact_path(graph_artifact.SHARED_GRAPH, out_dir, directory_region)
+        graph_artifact.save_artifact(merged, path)
+        print(f"{region}/{graph_artifact.SHARED_GRAPH}: {merged.node_count} nodes, {merged.edge_count} edges "
+              f"(separately {sum(c.node_count for c in compiled_modes.values())} nodes, "
+              f"{sum(c.edge_count for c in compiled_modes.values())} edges) -> {path}")
+
+def _rss_mb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+# Runs in a fresh interpreter: load the modes the way the server would (separate
+# graphs or views of the shared artifact), ready to route, and report the load time,
+# resident memory and private heap (tracemalloc: what each worker holds on its own,
+# memory-mapped artifact pages excluded since workers share them) as JSON.
+def measure(kind, modes, bbox, out_dir, osm_file=None, cache_dir=None):
+    import tracemalloc
+    if kind == "networkx":
+        import osmnx  # noqa: F401  (library imports are not part of the graph's cost)
+    else:
+        import scipy.sparse.csgraph, scipy.spatial  # noqa: F401
+    baseline = _rss_mb()
+    tracemalloc.start()
+    start = time.perf_counter()
+    graphs, nodes = [], 0
+    shared = None
+    if kind == "shared":
+        shared = graph_artifact.load_artifact(graph_artifact.artifact_path(graph_artifact.SHARED_GRAPH, out_dir))
+        nodes = shared.node_count
+    for mode in modes:
+        if kind == "networkx":
+            graph, _ = build_source_graph(mode, bbox, osm_file, cache_dir)
+            graphs.append(graph)
+            nodes += len(graph)
+            continue
+        compiled = shared.for_mode(mode) if shared else graph_artifact.load_artifact(
+            graph_artifact.artifact_path(mode, out_dir))
+        for weight in graph_artifact.ROUTING_WEIGHTS:
+            compiled.csr(weight)
+        compiled.nearest_node(*bbox[1::2])
+        graphs.append(compiled)
+        nodes += 0 if shared else compiled.node_count
+    print(json.dumps({"seconds": time.perf_counter() - start, "rss_mb": _rss_mb(),
+                      "rss_delta_mb": _rss_mb() - baseline, "heap_mb": tracemalloc.get_traced_memory()[0] / 2 ** 20,
+                      "nodes": nodes}))
+
+def benchmark(modes, args):
+    print(f"{'mode':<6} {'loader':<9} {'nodes':>6} {'load s':>8} {'RSS MB':>8} {'+RSS MB':>8} {'heap MB':>8}")
+    runs = [([mode], kind) for mode in modes for kind in ("networkx", "artifact")]
+    # All modes in one worker: three separate graphs against one shared graph with mode masks
+    runs += [(modes, kind) for kind in ("networkx", "artifact")]
+    if os.path.exists(graph_artifact.artifact_path(graph_artifact.SHARED_GRAPH, args.out)):
+        runs.append((modes, "shared"))
+    for run_modes, kind in runs:
+        label = run_modes[0] if len(run_modes) == 1 else "all"
+        command = [sys.executable, os.path.abspath(__file__), "--measure", kind, "--modes", *run_modes,
+                   "--out", args.out, "--bbox", *map(str, args.bbox)]
+        if args.osm_file:
+            command += ["--osm-file", args.osm_file]
+        if args.from_cache:
+            command += ["--from-cache"]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{label:<6} {kind:<9} {result['nodes']:>6} {result['seconds']:>8.3f} "
+              f"{result['rss_mb']:>8.1f} {result['rss_delta_mb']:>8.1f} {result['heap_mb']:>8.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile the outdoor OSM graphs into memory-mappable artifacts.")
+    parser.add_argument("--modes", nargs="+", default=list(NETWORK_TYPES), choices=NETWORK_TYPES)
+    parser.add_argument("--regions", nargs="+", default=[DEFAULT_REGION], choices=list(REGIONS),
+                        help="Region tiles to compile (see OUTDOOR_REGIONS; default: the default region)")
+    parser.add_argument("--bbox", nargs=4, type=float, metavar=("NORTH", "SOUTH", "EAST", "WEST"),
+                        help="Override the bounding box of a single region")
+    parser.add_argument("--osm-file", help="Build from a local .osm XML extract instead of downloading")
+    parser.add_argument("--from-cache", action="store_true",
+                        help="Build from the Overpass responses cached in server/cache")
+    parser.add_argument("--out", default=graph_artifact.OUTDOOR_ARTIFACT_DIR, help="Artifact directory")
+    parser.add_argument("--shared", action="store_true",
+                        help="Write one shared artifact for all the modes, with a per-edge mode mask, "
+                             "instead of one artifact per mode")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Compare load time and memory of the networkx graphs, the per-mode artifacts "
+                             "and the shared artifact")
+    parser.add_argument("--measure", choices=["networkx", "artifact", "shared"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    cache_dir = CACHE_DIR if args.from_cache else None
+    if args.bbox and len(args.regions) > 1:
+        parser.error("--bbox can only be used with a single region")
+    if not args.bbox:
+        args.bbox = list(REGIONS[args.regions[0]])
+
+    if args.measure:
+        measure(args.measure, args.modes, args.bbox, args.out, args.osm_file, cache_dir)
+    elif args.benchmark:
+        benchmark(args.modes, args)
+    else:
+        for region in args.regions:
+            bbox = args.bbox if len(args.regions) == 1 else list(REGIONS[region])
+            compile_modes(args.modes, bbox, args.out, args.osm_file, cache_dir, region, args.shared)
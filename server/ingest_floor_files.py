@@ -0,0 +1,15 @@
+import argparse
+from services.floor_ingest import INGEST_BUILD_3D, ingest_all
+
+# Build the upload-time artifacts (compiled floor graphs, resized base maps, optional 3D
+# layers) for floor files stored before the ingest pipeline existed.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest the latest model and base map of every floor.")
+    parser.add_argument("landmarks", nargs="*", help="Landmark names (default: every landmark)")
+    parser.add_argument("--build-3d", action="store_true", default=INGEST_BUILD_3D,
+                        help="Also build the static 3D layer of each floor")
+    args = parser.parse_args()
+    for landmark_name in args.landmarks or [None]:
+        for report in ingest_all(landmark_name, args.build_3d):
+            print(f"{report['landmark']}/{report['file']}: {report['seconds']:.2f}s "
+                  f"{report['artifacts']} {len(report['warnings'])} warnings")
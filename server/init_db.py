@@ -0,0 +1,46 @@
+import argparse
+from sqlalchemy import inspect, text
+from config import Base, engine
+import services.models  # noqa: F401  (registers every table on Base.metadata)
+
+# Create the missing tables, then add the columns introduced after a table was created.
+# create_all never alters existing tables, so columns added to services/models.py later
+# (e.g. floors.kinds_version, building_models.options) are added here. Only nullable
+# columns can be added this way; anything else is reported and left to a manual migration.
+def missing_columns(bind):
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing.extend(column for column in table.columns if column.name not in existing)
+    return missing
+
+def init_db(bind=engine, dry_run=False):
+    if not dry_run:
+        Base.metadata.create_all(bind)
+    manual = []
+    with bind.begin() as connection:
+        for column in missing_columns(connection):
+            name = f"{column.table.name}.{column.name}"
+            if not column.nullable:
+                print(f"{name}: not nullable, add it by hand")
+                manual.append(name)
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            statement = f'ALTER TABLE {column.table.name} ADD COLUMN {column.name} {column_type}'
+            print(statement if dry_run else f"{name}: added")
+            if not dry_run:
+                connection.execute(text(statement))
+    if dry_run:
+        print("Dry run, nothing changed")
+    elif not manual:
+        print("Database schema is up to date")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the database tables and add missing columns.")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the columns that would be added")
+    args = parser.parse_args()
+    init_db(dry_run=args.dry_run)
@@ -1,13 +1,95 @@
 from flask import Blueprint, jsonify, request, Response
 from config import SessionLocal
 from services.models import FileStorage, Landmark
+from services.floor_files import FLOOR_FILE_PATTERN
 from datetime import datetime as dt
 import mimetypes
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import text
+from services import building_model, model_pool, outdoor_graph, landmark_index, indoor_graph, search_index, floor_ingest, closures, landmark_events
 
 admin_bp = Blueprint('admin_routes', __name__)
 
+def _build_3d_option():
+    """The optional build_3d upload field (None means the INGEST_BUILD_3D default)."""
+    value = request.form.get('build_3d')
+    return None if value is None else value.lower() in ('1', 'true', 'yes')
+
+def _floor_file_kind(filename):
+    """"model" or "mapbase" for a floor file name, None for other files."""
+    match = FLOOR_FILE_PATTERN.match(filename or "")
+    return match.group(1) if match else None
+
+def _invalid_file_response(filename, content):
+    """400 response for a floor file that fails validation, or None if it can be stored."""
+    try:
+        floor_ingest.validate(filename, content)
+    except floor_ingest.IngestError as e:
+        return jsonify({"error": str(e), "details": e.errors}), 400
+    return None
+
+def _refresh_floor_caches(landmark, filename):
+    """
+    Drop the navigation caches that depend on a floor file which was stored, replaced,
+    renamed away or deleted, and queue the building model rebuild. Other files are ignored.
+    """
+    match = FLOOR_FILE_PATTERN.match(filename or "")
+    if not match:
+        return
+    indoor_graph.invalidate(landmark)
+    if match.group(1) == "model":
+        closures.invalidate_routes(landmark, match.group(2))
+        try:
+            search_index.refresh_floor(landmark, match.group(2))
+        except Exception as e:
+            print("Error refreshing search index:", e)
+    try:
+        building_model.queue_building_build(landmark)
+    except model_pool.PoolSaturatedError:
+        print(f"Worker pool busy; building model for '{landmark}' not rebuilt")
+    except Exception as e:
+        print("Error queueing building model build:", e)
+
+def _after_floor_file_change(file_rec, build_3d=None, old_location=None):
+    """
+    Build the derived artifacts of a stored model or base map (see services/floor_ingest.py)
+    and refresh the navigation caches. old_location is the (landmark, filename) the record
+    had before an update, whose floor is refreshed too when it differs. Returns the ingest
+    report, or None for other files.
+    """
+    report = None
+    if FLOOR_FILE_PATTERN.match(file_rec.filename or ""):
+        try:
+            report = floor_ingest.ingest(file_rec, build_3d)
+        except Exception as e:
+            print("Error ingesting floor file:", e)
+            report = {"error": f"Artifacts not built: {e}"}
+        _refresh_floor_caches(file_rec.landmark, file_rec.filename)
+    if old_location is not None and old_location != (file_rec.landmark, file_rec.filename):
+        _refresh_floor_caches(*old_location)
+    landmark_events.notify()
+    return report
+
+@admin_bp.route('/outdoor_graph/refresh', methods=['POST'])
+def refresh_outdoor_graph():
+    """
+    API to rebuild the resident outdoor (OSM) routing graphs.
+    Optional body: {"modes": ["walk", "bike", "drive"]} (default: all modes).
+    """
+    data = request.get_json(silent=True) or {}
+    modes = data.get("modes") or list(outdoor_graph.NETWORK_TYPES)
+    invalid = [mode for mode in modes if mode not in outdoor_graph.NETWORK_TYPES]
+    if invalid:
+        return jsonify({"error": f"Invalid modes: {', '.join(invalid)}"}), 400
+    try:
+        start = dt.utcnow()
+        refreshed = outdoor_graph.refresh(modes)
+        elapsed = (dt.utcnow() - start).total_seconds()
+        return jsonify({"message": "Outdoor graphs refreshed", "modes": refreshed, "seconds": elapsed}), 200
+    except Exception as e:
+        print("Error refreshing outdoor graphs:", e)
+        return jsonify({"error": "Failed to refresh outdoor graphs"}), 500
+
 @admin_bp.route('/update_file', methods=['POST'])
 def update_file():
     """API to upload a new file version for a landmark."""
@@ -19,6 +101,10 @@ def update_file():
     filename = file.filename
     content = file.read()
     file_type = 'image' if filename.endswith('.png') else 'text'
+    invalid = _invalid_file_response(filename, content)
+    if invalid:
+        db.close()
+        return invalid
     try:
         new_file = FileStorage(
             filename=filename,
@@ -29,7 +115,8 @@ def update_file():
         )
         db.add(new_file)
         db.commit()
-        return jsonify({"status": "File updated successfully"}), 200
+        report = _after_floor_file_change(new_file, _build_3d_option())
+        return jsonify({"status": "File updated successfully", "ingest": report}), 200
     except Exception as e:
         db.rollback()
         print("Error saving file to database:", e)
@@ -37,47 +124,45 @@ def update_file():
     finally:
         db.close()
 
+def _directory_response(build):
+    """
+    JSON response built from the landmark directory with its ETag; answers 304 when
+    the client already has the current directory (If-None-Match).
+    """
+    directory = landmark_index.get_directory()
+    etag = directory["etag"]
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status=304, headers={'ETag': etag})
+    response = jsonify(build(list(directory["records"].values())))
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @admin_bp.route('/get_landmarks', methods=['GET'])
 def get_landmarks():
-    """API to get all landmark names."""
-    db = SessionLocal()
+    """API to get all landmark names (served from the in-memory landmark directory)."""
     try:
-        landmarks = db.query(Landmark).all()
-        names = [lm.landmark_name for lm in landmarks]
-        return jsonify({"landmarks": names}), 200
+        return _directory_response(lambda records: {"landmarks": [r.landmark_name for r in records]})
     except Exception as e:
-        db.rollback()
         print("Error retrieving landmarks:", e)
         return jsonify({"error": "Failed to retrieve landmarks"}), 500
-    finally:
-        db.close()
 
 # RESTful endpoints for landmarks
 @admin_bp.route('/landmarks', methods=['GET', 'POST'])
 def handle_landmarks():
-    db = SessionLocal()
     if request.method == 'GET':
+        # Served from the in-memory landmark directory, filtered like ILIKE '%q%' on id and name
+        q = (request.args.get('q') or '').lower()
         try:
-            q = request.args.get('q')
-            if q:
-                records = db.query(Landmark).filter(
-                    (Landmark.id.ilike(f"%{q}%")) | (Landmark.landmark_name.ilike(f"%{q}%"))
-                ).all()
-            else:
-                records = db.query(Landmark).all()
-            result = [
-                {"id": lm.id, "landmark_name": lm.landmark_name,
-                 "latitude": lm.latitude, "longitude": lm.longitude}
-                for lm in records
-            ]
-            return jsonify(result), 200
+            return _directory_response(lambda records: [
+                r._asdict() for r in records
+                if not q or q in r.id.lower() or q in r.landmark_name.lower()
+            ])
         except Exception as e:
-            db.rollback()
             print("Error retrieving landmarks:", e)
             return jsonify({"error": "Failed to retrieve landmarks"}), 500
-        finally:
-            db.close()
-    elif request.method == 'POST':
+    db = SessionLocal()
+    if request.method == 'POST':
         data = request.get_json() or request.form.to_dict()
         if not data or not all(k in data for k in ["id", "landmark_name", "latitude", "longitude"]):
             return jsonify({"error": "Missing required fields"}), 400
@@ -87,13 +172,15 @@ def handle_landmarks():
         except ValueError:
             return jsonify({"error": "Latitude and Longitude must be numbers"}), 400
         new_landmark = Landmark(
-            id=data["id"], 
+            id=str(data["id"]),
             landmark_name=data["landmark_name"],
             latitude=lat_val, longitude=lon_val
         )
         try:
             db.add(new_landmark)
             db.commit()
+            landmark_index.put(landmark_index.LandmarkRecord(
+                new_landmark.id, new_landmark.landmark_name, new_landmark.latitude, new_landmark.longitude))
             return jsonify({"message": "Landmark created successfully"}), 201
         except IntegrityError:
             db.rollback()
@@ -132,6 +219,9 @@ def handle_landmark_by_id(landmark_id):
                 return jsonify({"error": "Longitude must be a number"}), 400
         try:
             db.commit()
+            landmark_index.put(landmark_index.LandmarkRecord(
+                landmark.id, landmark.landmark_name, landmark.latitude, landmark.longitude))
+            db.close()
             return jsonify({"message": "Landmark updated successfully"}), 200
         except IntegrityError:
             db.rollback()
@@ -146,6 +236,7 @@ def handle_landmark_by_id(landmark_id):
         try:
             db.delete(landmark)
             db.commit()
+            landmark_index.remove(landmark_id)
             return jsonify({"message": "Landmark deleted successfully"}), 200
         except Exception as e:
             db.rollback()
@@ -154,6 +245,57 @@ def handle_landmark_by_id(landmark_id):
         finally:
             db.close()
 
+@admin_bp.route('/closures', methods=['GET', 'POST'])
+def handle_closures():
+    """
+    GET: the active closures, optionally of one landmark (?landmark=<name>).
+    POST: block part of a floor until further notice or an expiry time. Body:
+      {"landmark", "floor", "cells": [[x, y]], "edges": [[[x1, y1], [x2, y2]]],
+       "zones": [[x1, y1, x2, y2]], "reason", "expires_at" (ISO time) or "ttl" (seconds)}
+    Routing honors a closure as soon as it is stored (other workers within
+    CLOSURE_POLL_SECONDS); only cached detours crossing it are recomputed.
+    """
+    if request.method == 'GET':
+        try:
+            areas = closures.list_closures(request.args.get('landmark'))
+        except Exception as e:
+            print("Error listing closures:", e)
+            return jsonify({"error": "Failed to list closures"}), 500
+        return jsonify([area.to_dict() for area in areas]), 200
+
+    data = request.get_json(silent=True) or {}
+    landmark_name = data.get('landmark')
+    floor_name = data.get('floor')
+    if not landmark_name or floor_name in (None, ''):
+        return jsonify({"error": "landmark and floor are required"}), 400
+    try:
+        cells, edges, zones = closures.parse_geometry(data)
+        expires_at = closures.parse_expiry(data)
+    except closures.ClosureError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        area, dropped = closures.add_closure(landmark_name, str(floor_name), cells, edges, zones,
+                                             data.get('reason'), expires_at)
+    except Exception as e:
+        print("Error adding closure:", e)
+        return jsonify({"error": "Failed to add closure"}), 500
+    landmark_events.notify()
+    return jsonify({"message": "Closure added successfully", "closure": area.to_dict(),
+                    "invalidated_routes": dropped}), 201
+
+@admin_bp.route('/closures/<int:closure_id>', methods=['DELETE'])
+def delete_closure(closure_id):
+    """Lift a closure before its expiry."""
+    try:
+        landmark_name = closures.remove_closure(closure_id)
+    except Exception as e:
+        print("Error deleting closure:", e)
+        return jsonify({"error": "Failed to delete closure"}), 500
+    if landmark_name is None:
+        return jsonify({"error": "Closure not found"}), 404
+    landmark_events.notify()
+    return jsonify({"message": "Closure deleted successfully"}), 200
+
 # RESTful endpoints for file storage
 @admin_bp.route('/file_storage', methods=['GET', 'POST'])
 def handle_files():
@@ -187,12 +329,17 @@ def handle_files():
         filename = file.filename
         content = file.read()
         file_type = 'image' if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')) else 'text'
+        invalid = _invalid_file_response(filename, content)
+        if invalid:
+            db.close()
+            return invalid
         new_file = FileStorage(filename=filename, file_type=file_type,
                                content=content, timestamp=dt.utcnow(), landmark=landmark_name)
         try:
             db.add(new_file)
             db.commit()
-            return jsonify({"message": "File record created successfully", "id": new_file.id}), 201
+            report = _after_floor_file_change(new_file, _build_3d_option())
+            return jsonify({"message": "File record created successfully", "id": new_file.id, "ingest": report}), 201
         except Exception as e:
             db.rollback()
             print("Error saving file:", e)
@@ -210,6 +357,8 @@ def handle_file_by_id(file_id):
     if request.method == 'PUT':
         file = request.files.get('file')
         data = request.form.to_dict()
+        old_content, old_kind = file_rec.content, _floor_file_kind(file_rec.filename)
+        old_location = (file_rec.landmark, file_rec.filename)
         if file:
             file_content = file.read()
             new_filename = file.filename
@@ -232,9 +381,18 @@ def handle_file_by_id(file_id):
                 file_rec.file_type = 'text'
         if "landmark" in data and data["landmark"]:
             file_rec.landmark = data["landmark"]
+        # Only new content, or a file renamed into another kind of floor file, is validated,
+        # so files stored before validation existed can still be renamed or moved
+        changed = file_rec.content != old_content or _floor_file_kind(file_rec.filename) != old_kind
+        invalid = _invalid_file_response(file_rec.filename, file_rec.content) if changed else None
+        if invalid:
+            db.rollback()
+            db.close()
+            return invalid
         try:
             db.commit()
-            return jsonify({"message": "File record updated successfully"}), 200
+            report = _after_floor_file_change(file_rec, _build_3d_option(), old_location)
+            return jsonify({"message": "File record updated successfully", "ingest": report}), 200
         except Exception as e:
             db.rollback()
             print("Error updating file record:", e)
@@ -242,9 +400,12 @@ def handle_file_by_id(file_id):
         finally:
             db.close()
     elif request.method == 'DELETE':
+        location = (file_rec.landmark, file_rec.filename)
         try:
             db.delete(file_rec)
             db.commit()
+            _refresh_floor_caches(*location)
+            landmark_events.notify()
             return jsonify({"message": "File record deleted successfully"}), 200
         except Exception as e:
             db.rollback()
@@ -300,6 +461,7 @@ def execute_sql():
         else:
             db.commit()
             db.close()
+            landmark_index.invalidate()  # the command may have changed landmarks
             return jsonify({"message": "SQL command executed successfully"}), 200
     except Exception as e:
         db.rollback()
@@ -1,44 +1,74 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, url_for, stream_with_context
 import base64
-from config import SessionLocal
-from services.models import FileStorage
-from services.utils import run_dijkstra, generate_path_image_from_db, load_model_from_db, load_nodes_from_content, find_nearest_lift
-from services.model_generation import generate_3d_model_from_bytes
+import json
+import hashlib
+from services.utils import generate_path_image_from_db, find_nearest_lift
+from services.model_settings import LOD_SETTINGS, DEFAULT_LOD
+from services import model_pool, model_jobs, building_model, search_index, floor_ingest, floor_tables, indoor_graph, batch_routes, nearest_amenity, closures, landmark_events
 
 internal_map_bp = Blueprint('internal_map_routes', __name__)
 
 @internal_map_bp.route('/nodes', methods=['GET'])
 def get_nodes():
-    """API to return all nodes from all floors for a specific landmark."""
-    db = SessionLocal()
+    """
+    API to return all nodes from all floors for a specific landmark.
+    Optional filters: ?kind=lift|stairs|entrance|restroom|room and ?name=<node name>;
+    with a filter only the floors with matching nodes are returned.
+    """
     landmark_name = request.args.get('landmark')
     if not landmark_name:
-        db.close()
         return jsonify({"error": "Landmark name is required"}), 400
 
-    # Query all model files for the specified landmark ordered by timestamp descending.
-    model_files = db.query(FileStorage).filter(
-        FileStorage.filename.like("model-%.txt"),
-        FileStorage.landmark == landmark_name
-    ).order_by(FileStorage.timestamp.desc()).all()
-
-    if not model_files:
-        db.close()
+    # Read from the node table (rebuilt from the latest model file of each floor)
+    all_nodes = floor_tables.landmark_nodes(landmark_name, request.args.get('kind'), request.args.get('name'))
+    if all_nodes is None:
         return jsonify({"error": "No data found for the specified landmark"}), 404
+    return jsonify(all_nodes)
+    
+@internal_map_bp.route('/search', methods=['GET'])
+def search():
+    """
+    Autocomplete over landmark names and the room/node names of every floor.
+    Query: ?q=<text>&limit=10&landmark=<name>&type=landmark|node
+    Returns ranked matches; rooms include their landmark, floor and location.
+    """
+    q = request.args.get('q', '')
+    kind = request.args.get('type')
+    if kind not in (None, 'landmark', 'node'):
+        return jsonify({"error": "type must be landmark or node"}), 400
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    results = search_index.search(q, max(limit, 1), request.args.get('landmark'), kind)
+    return jsonify({"query": q, "results": [
+        {"type": entry.kind, "name": entry.name, "landmark": entry.landmark,
+         "floor": entry.floor, "location": list(entry.location)}
+        for entry in results
+    ]})
 
-    all_nodes = {}
+def _stored_path(landmark_name, floor_name, nodes, start_node, end_node):
+    """
+    The generated path between two nodes of a floor (read from the path tables), or the
+    route around the floor's closures when it crosses one; None if there is neither.
+    """
+    if start_node not in nodes or end_node not in nodes:
+        return None
+    return closures.floor_route(landmark_name, floor_name, nodes[start_node], nodes[end_node])
 
-    # For each model file, use only the latest file for each floor.
-    for model_file in model_files:
-        floor_name = model_file.filename.split('-')[1].split('.')[0]
-        if floor_name in all_nodes:
-            continue  # Skip older files for this floor
-        nodes, _ = load_nodes_from_content(model_file.content)
-        all_nodes[floor_name] = nodes
+def _nearest_lift(landmark_name, floor_name, start_node, nodes, nodes_end):
+    """
+    The lift nearest to a node by walking distance (precomputed at model ingest) that also
+    serves the destination floor; the straight-line nearest lift when there is none.
+    """
+    try:
+        nearest = nearest_amenity.nearest_on_floor(landmark_name, floor_name, start_node, "lift")
+    except KeyError:
+        nearest = None
+    if nearest and nearest["node"] in nodes_end:
+        return nearest["node"]
+    return find_nearest_lift(start_node, nodes)
 
-    db.close()
-    return jsonify(all_nodes)
-    
 @internal_map_bp.route('/path', methods=['POST'])
 def get_path():
     """
@@ -62,19 +92,14 @@ def get_path():
     response_data = {}
 
     if start_floor == end_floor:
-        floor_data = load_model_from_db(start_floor, landmark_name)
-        if not floor_data:
+        nodes = floor_tables.floor_nodes(landmark_name, start_floor)
+        if not nodes:
             return jsonify({"error": "No data found for the specified landmark"}), 404
 
-        nodes, paths = floor_data[start_floor]["nodes"], floor_data[start_floor]["paths"]
-        path = run_dijkstra(start_node, end_node, nodes, paths)
-        if not path:
-            path = run_dijkstra(end_node, start_node, nodes, paths)
-            if path:
-                path = path[::-1]
+        path = _stored_path(landmark_name, start_floor, nodes, start_node, end_node)
         if path:
             img_base64 = generate_path_image_from_db(path, nodes, start_floor, landmark_name)
-            response_data["start_end_floor"] = {"image": img_base64, "floor": start_floor, "node": nodes}
+            response_data["start_end_floor"] = {"image": img_base64, "floor": start_floor, "node": nodes, "path": path}
             # if get3d:
             #     # Decode the 2D image from base64 into bytes and generate the 3D model in memory
             #     image_bytes = base64.b64decode(img_base64)
@@ -83,33 +108,22 @@ def get_path():
         else:
             return jsonify({"error": "Path does not exist"}), 404
     else:
-        floor_data_start = load_model_from_db(start_floor, landmark_name)
-        floor_data_end = load_model_from_db(end_floor, landmark_name)
-        if not floor_data_start or not floor_data_end:
+        nodes_start = floor_tables.floor_nodes(landmark_name, start_floor)
+        nodes_end = floor_tables.floor_nodes(landmark_name, end_floor)
+        if not nodes_start or not nodes_end:
             return jsonify({"error": "No data found for the specified landmark"}), 404
 
-        nodes_start, paths_start = floor_data_start[start_floor]["nodes"], floor_data_start[start_floor]["paths"]
-        nodes_end, paths_end = floor_data_end[end_floor]["nodes"], floor_data_end[end_floor]["paths"]
-
-        nearest_lift_start = find_nearest_lift(start_node, nodes_start)
+        nearest_lift_start = _nearest_lift(landmark_name, start_floor, start_node, nodes_start, nodes_end)
         nearest_lift_end = nearest_lift_start  # Assuming same lift serves both floors
 
-        path_to_lift = run_dijkstra(start_node, nearest_lift_start, nodes_start, paths_start)
-        if not path_to_lift:
-            path_to_lift = run_dijkstra(nearest_lift_start, start_node, nodes_start, paths_start)
-            if path_to_lift:
-                path_to_lift = path_to_lift[::-1]
-        path_from_lift = run_dijkstra(nearest_lift_end, end_node, nodes_end, paths_end)
-        if not path_from_lift:
-            path_from_lift = run_dijkstra(end_node, nearest_lift_end, nodes_end, paths_end)
-            if path_from_lift:
-                path_from_lift = path_from_lift[::-1]
+        path_to_lift = _stored_path(landmark_name, start_floor, nodes_start, start_node, nearest_lift_start)
+        path_from_lift = _stored_path(landmark_name, end_floor, nodes_end, nearest_lift_end, end_node)
 
         if path_to_lift and path_from_lift:
             img_base64_start = generate_path_image_from_db(path_to_lift, nodes_start, start_floor, landmark_name)
             img_base64_end = generate_path_image_from_db(path_from_lift, nodes_end, end_floor, landmark_name)
-            response_data["start_floor"] = {"image": img_base64_start, "floor": start_floor, "node": nodes_start}
-            response_data["end_floor"] = {"image": img_base64_end, "floor": end_floor, "node": nodes_end}
+            response_data["start_floor"] = {"image": img_base64_start, "floor": start_floor, "node": nodes_start, "path": path_to_lift}
+            response_data["end_floor"] = {"image": img_base64_end, "floor": end_floor, "node": nodes_end, "path": path_from_lift}
             
             # if get3d:
             #     image_bytes_start = base64.b64decode(img_base64_start)
@@ -123,22 +137,330 @@ def get_path():
 
     return jsonify(response_data)
 
+@internal_map_bp.route('/nearest', methods=['GET'])
+def get_nearest():
+    """
+    API for the nearest lift, stairs, exit, restroom, ... from a node, by walking distance.
+    Query: ?landmark=<name>&floor=<floor>&node=<node>&kind=<kind>&scope=building|floor
+    "building" (default) may lead to another floor by lift or stairs; "floor" stays on
+    the node's floor. Returns the node found, its floor and location, the cost in meters
+    and the route as legs ({"floor", "path"}).
+    """
+    landmark_name = request.args.get('landmark')
+    floor_name = request.args.get('floor')
+    node_name = request.args.get('node')
+    kind = (request.args.get('kind') or '').lower()
+    scope = request.args.get('scope', 'building')
+    if not all((landmark_name, floor_name, node_name, kind)):
+        return jsonify({"error": "landmark, floor, node and kind are required"}), 400
+    if scope not in ('building', 'floor'):
+        return jsonify({"error": "scope must be building or floor"}), 400
+    try:
+        if scope == 'floor':
+            nearest = nearest_amenity.nearest_on_floor(landmark_name, floor_name, node_name, kind)
+            if nearest is not None:
+                nearest["cost"] = round(nearest["cost"] * indoor_graph.INDOOR_CELL_METERS, 2)
+                nearest["legs"] = [{"floor": floor_name, "path": nearest.pop("path")}]
+        else:
+            building = indoor_graph.get_building_graph(landmark_name)
+            if building is None:
+                return jsonify({"error": "No data found for the specified landmark"}), 404
+            nearest = nearest_amenity.nearest_in_building(building, floor_name, node_name, kind)
+    except KeyError:
+        return jsonify({"error": f"Node '{node_name}' not found on floor '{floor_name}'"}), 404
+    if nearest is None:
+        return jsonify({"error": f"No reachable {kind} from '{node_name}'"}), 404
+    nearest.update({"kind": kind, "scope": scope, "unit": "meters", "from": {"node": node_name, "floor": floor_name}})
+    return jsonify(nearest), 200
+
+@internal_map_bp.route('/batch_path', methods=['POST'])
+def get_batch_paths():
+    """
+    API to route many (start, end) node pairs of one landmark in one request.
+    Body: {"landmark": ..., "pairs": [{"start", "start_floor", "end", "end_floor"}, ...],
+           "include_path": true, "images": false}
+    The building graph is loaded once and pairs sharing a start node share one search.
+    Results are streamed as NDJSON, one line per pair: {"index", "start", "start_floor",
+    "end", "end_floor", "cost" (meters), "legs": [{"floor", "path", "image"?}]} or "error".
+    """
+    data = request.get_json(silent=True) or {}
+    landmark_name = data.get('landmark')
+    pairs = data.get('pairs')
+    include_path = bool(data.get('include_path', True))
+    images = bool(data.get('images', False))
+    if not landmark_name:
+        return jsonify({"error": "Landmark name is required"}), 400
+    if not isinstance(pairs, list) or not pairs:
+        return jsonify({"error": "pairs must be a non-empty list"}), 400
+    if len(pairs) > batch_routes.BATCH_MAX_PAIRS:
+        return jsonify({"error": f"At most {batch_routes.BATCH_MAX_PAIRS} pairs are allowed"}), 400
+    building = indoor_graph.get_building_graph(landmark_name)
+    if building is None:
+        return jsonify({"error": "No data found for the specified landmark"}), 404
+
+    def generate():
+        for result in batch_routes.iter_routes(building, pairs, include_path or images):
+            if images:
+                for leg in result.get("legs", []):
+                    leg["image"] = generate_path_image_from_db(
+                        leg["path"], building.nodes[leg["floor"]], leg["floor"], landmark_name)
+                if not include_path:
+                    for leg in result.get("legs", []):
+                        del leg["path"]
+            yield json.dumps(result) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@internal_map_bp.route('/events', methods=['GET'])
+def landmark_event_stream():
+    """
+    Server-sent events of one landmark (?landmark=<name>), so clients refetch only what
+    changed instead of polling /api/nodes. The first event, "versions", has the current
+    version of every floor's model and base map and of the closures; then "model" and
+    "mapbase" ({"landmark", "floor", "version"}, version null when the file was removed)
+    and "closures" ({"landmark", "version", "ids"}) follow each change.
+    """
+    landmark_name = request.args.get('landmark')
+    if not landmark_name:
+        return jsonify({"error": "Landmark name is required"}), 400
+    # Subscribe before the 200 is sent, so a database error is still a proper error response
+    try:
+        subscriber, versions = landmark_events.subscribe(landmark_name)
+    except Exception as e:
+        print("Error subscribing to landmark events:", e)
+        return jsonify({"error": "Failed to read landmark versions"}), 500
+    response = Response(landmark_events.stream(landmark_name, subscriber, versions), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # also when the client is gone before the stream starts
+    response.call_on_close(lambda: landmark_events.unsubscribe(landmark_name, subscriber))
+    return response
+
+
+def _parse_model_options(floor_data, default_lod=DEFAULT_LOD, default_quantize=None):
+    """Read the lod/quantize options of one floor, falling back to the given defaults."""
+    lod = floor_data.get("lod", default_lod)
+    quantize = floor_data.get("quantize", default_quantize)
+    if isinstance(quantize, str):
+        quantize = quantize.lower() in ('1', 'true', 'yes')
+    if lod not in LOD_SETTINGS:
+        raise ValueError(f"Invalid lod '{lod}'. Expected one of: {', '.join(LOD_SETTINGS)}")
+    return lod, quantize
+
+def _pool_busy_response(error):
+    response = jsonify({"error": str(error)})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
 
 @internal_map_bp.route('/get_model', methods=['POST'])
 def get_modelData():
+    """
+    API to generate a GLB model for each floor in the request body.
+    The optional "lod" query parameter (low, medium or high) selects the level of detail,
+    and "quantize" (true/false) overrides whether KHR_mesh_quantization is used.
+    Both can also be given per floor inside the floor data.
+
+    This is a synchronous wrapper around the model job API below: one job is submitted
+    per floor (identical requests reuse finished jobs) and the response waits for all of them.
+    If the worker pool cannot take every floor the request is rejected with 503 and a
+    Retry-After header, and no floor is queued. A floor that overruns its time limit gives 504.
+    """
     data = request.get_json()
     result = {}
 
+    floors = {}
     for key, floor_data in data.items():
         try:
-            floor = floor_data.get("floor")
-            image_base64 = floor_data.get("image")
-            landmark_name = floor_data.get("landmark")
-            image_bytes = base64.b64decode(image_base64)
-            model_data = generate_3d_model_from_bytes(image_bytes, floor, landmark_name)
-            model_bytes = base64.b64encode(model_data).decode("utf-8")
-            result[key] = model_bytes
+            lod, quantize = _parse_model_options(floor_data, request.args.get('lod', DEFAULT_LOD),
+                                                 request.args.get('quantize'))
+        except ValueError as e:
+            return jsonify({"error": f"{str(e)} (key {key})"}), 400
+        try:
+            image_bytes = base64.b64decode(floor_data.get("image"))
         except Exception as e:
             return jsonify({"error": f"Error processing model for key {key}: {str(e)}"}), 500
+        floors[key] = (image_bytes, floor_data.get("floor"), floor_data.get("landmark"), lod, quantize)
+
+    try:
+        jobs = model_jobs.submit_jobs(floors)
+    except model_pool.PoolSaturatedError as e:
+        return _pool_busy_response(e)
+    except Exception as e:
+        return jsonify({"error": f"Error processing model: {str(e)}"}), 500
+
+    for key, job in jobs.items():
+        job = model_jobs.wait_for_job(job)
+        if job.get("timed_out"):
+            return jsonify({"error": f"Timed out generating model for key {key}: {job['error']}"}), 504
+        content = model_jobs.load_result(job["id"]) if job["status"] == "done" else None
+        if content is None:
+            return jsonify({"error": f"Error processing model for key {key}: {job['error'] or 'result not available'}"}), 500
+        result[key] = base64.b64encode(content).decode("utf-8")
+
+    return jsonify(result), 200
+
+@internal_map_bp.route('/model_jobs', methods=['POST'])
+def create_model_job():
+    """
+    API to submit a 3D model job for one floor.
+    Body: {"floor": ..., "image": <base64 PNG>, "landmark": ..., "lod": optional, "quantize": optional}
+    Returns the job id; poll /model_jobs/<job_id> and download /model_jobs/<job_id>/result.
+    """
+    data = request.get_json() or {}
+    if not all(data.get(k) for k in ("floor", "image", "landmark")):
+        return jsonify({"error": "floor, image and landmark are required"}), 400
+    try:
+        lod, quantize = _parse_model_options(data)
+        image_bytes = base64.b64decode(data["image"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        job = model_jobs.submit_job(image_bytes, data["floor"], data["landmark"], lod=lod, quantize=quantize)
+    except model_pool.PoolSaturatedError as e:
+        return _pool_busy_response(e)
+
+    status = model_jobs.job_status(job)
+    status["status_url"] = url_for('.get_model_job', job_id=job["id"])
+    status["result_url"] = url_for('.get_model_job_result', job_id=job["id"])
+    response = jsonify(status)
+    response.headers['Location'] = status["status_url"]
+    return response, (200 if job["status"] == "done" else 202)
+
+@internal_map_bp.route('/model_jobs/<string:job_id>', methods=['GET'])
+def get_model_job(job_id):
+    """
+    API to get the status of a model job.
+    With ?wait=<seconds> the request long-polls until the job finishes (capped server side).
+    """
+    job = model_jobs.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+    if wait > 0:
+        job = model_jobs.wait_for_job(job, min(wait, model_jobs.MODEL_JOB_MAX_WAIT))
+    status = model_jobs.job_status(job)
+    if job["status"] == "done":
+        status["result_url"] = url_for('.get_model_job_result', job_id=job_id)
+    return jsonify(status), 200
+
+@internal_map_bp.route('/model_jobs/<string:job_id>/result', methods=['GET'])
+def get_model_job_result(job_id):
+    """API to download the GLB of a finished model job."""
+    job = model_jobs.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job["status"] == "failed":
+        return jsonify({"error": job["error"]}), 500
+    if job["status"] != "done":
+        return jsonify(model_jobs.job_status(job)), 202
+    content = model_jobs.load_result(job_id)
+    if content is None:
+        return jsonify({"error": "Job not found"}), 404
+    response = Response(content, mimetype="model/gltf-binary")
+    response.headers['Content-Disposition'] = f'inline; filename="floor-{job["floor"]}.glb"'
+    response.headers['ETag'] = f'"{job_id}"'
+    response.headers['Cache-Control'] = 'public, max-age=86400, immutable'
+    return response
+
+@internal_map_bp.route('/building_model', methods=['GET', 'POST'])
+def handle_building_model():
+    """
+    GET: download the precomputed multi-floor building GLB for ?landmark=...
+         (supports If-None-Match). If it has not been built yet, a build is queued
+         and 202 is returned.
+    POST: queue a rebuild. Body: {"landmark": ..., "floor_height": optional,
+          "floor_elevations": optional {floor: elevation}, "lod": optional}
+    """
+    if request.method == 'GET':
+        landmark_name = request.args.get('landmark')
+        if not landmark_name:
+            return jsonify({"error": "Landmark name is required"}), 400
+        model_file = building_model.load_building_model(landmark_name)
+        if model_file:
+            etag = f'"{model_file.id}-{int(model_file.timestamp.timestamp())}"'
+            if request.headers.get('If-None-Match') == etag:
+                return Response(status=304, headers={'ETag': etag})
+            response = Response(model_file.content, mimetype="model/gltf-binary")
+            response.headers['Content-Disposition'] = f'inline; filename="{building_model.BUILDING_MODEL_FILENAME}"'
+            response.headers['ETag'] = etag
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        options = {}
+    else:
+        data = request.get_json() or {}
+        landmark_name = data.get('landmark')
+        if not landmark_name:
+            return jsonify({"error": "Landmark name is required"}), 400
+        lod = data.get('lod', building_model.BUILDING_LOD)
+        if lod not in LOD_SETTINGS:
+            return jsonify({"error": f"Invalid lod '{lod}'. Expected one of: {', '.join(LOD_SETTINGS)}"}), 400
+        try:
+            options = {
+                "floor_height": float(data.get('floor_height', building_model.BUILDING_FLOOR_HEIGHT)),
+                "elevations": {str(k): float(v) for k, v in (data.get('floor_elevations') or {}).items()},
+                "lod": lod,
+            }
+        except (TypeError, ValueError):
+            return jsonify({"error": "floor_height and floor_elevations must be numbers"}), 400
+
+    try:
+        future = building_model.queue_building_build(landmark_name, **options)
+    except model_pool.PoolSaturatedError as e:
+        return _pool_busy_response(e)
+    if future is None:
+        return jsonify({"error": "No data found for the specified landmark"}), 404
+    return jsonify({"status": "building", "landmark": landmark_name}), 202
+
+@internal_map_bp.route('/floor_layer', methods=['GET'])
+def get_floor_layer():
+    """
+    API to download the static 3D layer (walls and floor slab) of one floor, built when
+    its base map was uploaded with build_3d (or INGEST_BUILD_3D=1).
+    Query: ?landmark=<name>&floor=<floor>. Supports If-None-Match.
+    """
+    landmark_name = request.args.get('landmark')
+    floor_name = request.args.get('floor')
+    if not landmark_name or not floor_name:
+        return jsonify({"error": "landmark and floor are required"}), 400
+    content = floor_ingest.load_artifact(landmark_name, floor_name, floor_ingest.LAYER_ARTIFACT)
+    if content is None:
+        return jsonify({"error": "No 3D layer for this floor; upload its base map with build_3d"}), 404
+    etag = f'"{hashlib.sha1(content).hexdigest()}"'
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status=304, headers={'ETag': etag})
+    response = Response(content, mimetype="model/gltf-binary")
+    response.headers['Content-Disposition'] = f'inline; filename="floor-{floor_name}.glb"'
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@internal_map_bp.route('/route_model', methods=['POST'])
+def get_route_model():
+    """
+    API to get a small GLB with just the route overlay for a building model.
+    Body: {"landmark": ..., "floors": {"<floor>": [[x, y], ...]}, "floor_height": optional,
+           "floor_elevations": optional, "lod": optional}
+    The floor paths are the "path" lists returned by /path. Elevations are computed the
+    same way as for the building model so the overlay lines up with it.
+    """
+    data = request.get_json() or {}
+    landmark_name = data.get('landmark')
+    floor_paths = data.get('floors')
+    if not landmark_name or not isinstance(floor_paths, dict):
+        return jsonify({"error": "landmark and floors are required"}), 400
+    lod = data.get('lod', building_model.BUILDING_LOD)
+    if lod not in LOD_SETTINGS:
+        return jsonify({"error": f"Invalid lod '{lod}'. Expected one of: {', '.join(LOD_SETTINGS)}"}), 400
+    try:
+        floor_paths = {str(floor): [(int(x), int(y)) for x, y in cells] for floor, cells in floor_paths.items()}
+        floor_height = float(data.get('floor_height', building_model.BUILDING_FLOOR_HEIGHT))
+        overrides = {str(k): float(v) for k, v in (data.get('floor_elevations') or {}).items()}
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid floors, floor_height or floor_elevations"}), 400
 
-    return jsonify(result), 200
\ No newline at end of file
+    floor_names = set(building_model.list_floor_names(landmark_name)) | set(floor_paths)
+    elevations = building_model.floor_elevations(floor_names, floor_height, overrides)
+    glb_bytes = building_model.build_route_overlay_glb(floor_paths, elevations, lod=lod)
+    return Response(glb_bytes, mimetype="model/gltf-binary")
@@ -1,10 +1,4 @@
 from flask import Blueprint, render_template, request, jsonify
-import osmnx as ox
-import networkx as nx
-import folium
-from folium import IFrame
-import base64
-import tempfile
 import os
 from sqlalchemy.orm import Session
 from config import SessionLocal
@@ -14,87 +8,199 @@ from sqlalchemy.orm import Session
 from sqlalchemy import update
 from datetime import datetime
 from config import engine
-from folium import Tooltip
+from services import outdoor_graph, landmark_index, route_table, route_geometry, map_assets, journey
 
-ox.config(use_cache=True, log_console=True)
+# folium (and osmnx, inside services.outdoor_graph) are imported on first use rather than
+# here, so importing the blueprint stays fast and does not touch the database.
 
 outer_map_bp = Blueprint("outer_map_bp", __name__)
 
-# Function to fetch landmarks from the database
+# Largest number of sources or targets accepted by /distance_matrix
+DISTANCE_MATRIX_MAX_POINTS = int(os.getenv("DISTANCE_MATRIX_MAX_POINTS", "500"))
+
+# Memory-map the compiled outdoor graphs (see compile_outdoor_graph.py) at startup
+outdoor_graph.load_artifacts()
+
+# Landmarks for the page, from the in-memory landmark directory (kept current by the landmark API)
 def get_landmarks():
-    db: Session = SessionLocal()
-    landmarks = db.query(Landmark).all()
-    db.close()
-    return landmarks
+    return landmark_index.list_landmarks()
+
+def _resolve_points(points):
+    """
+    Coordinates of a list of points. Each point is a landmark name, a
+    {"lat": .., "lon": ..} object or a [lat, lon] pair.
+    Returns [{"name", "lat", "lon"}], raising ValueError for a bad point.
+    """
+    coordinates = landmark_index.get_coordinates()
+    resolved = []
+    for point in points:
+        if isinstance(point, str):
+            if point not in coordinates:
+                raise ValueError(f"Unknown landmark '{point}'")
+            lat, lon = coordinates[point]
+            resolved.append({"name": point, "lat": lat, "lon": lon})
+            continue
+        try:
+            if isinstance(point, dict):
+                lat, lon = float(point["lat"]), float(point["lon"])
+            else:
+                lat, lon = float(point[0]), float(point[1])
+        except (KeyError, IndexError, TypeError, ValueError):
+            raise ValueError(f"Invalid point {point!r}: expected a landmark name, {{'lat', 'lon'}} or [lat, lon]")
+        resolved.append({"name": None, "lat": lat, "lon": lon})
+    return resolved
+
+def _landmark_marker(name, location, color):
+    """Folium marker for a route endpoint; landmarks with a photo get it as their popup."""
+    import folium
+    from folium import IFrame
+
+    popup = name
+    html = map_assets.popup_html(name)
+    if html is not None:
+        width, height = map_assets.POPUP_IMAGE_SIZE
+        popup = folium.Popup(IFrame(html, width=width + 20, height=height + 20), max_width=400)
+    return folium.Marker(location=location, icon=folium.Icon(color=color), popup=popup, tooltip=name)
+
+@outer_map_bp.route('/distance_matrix', methods=['POST'])
+def distance_matrix():
+    """
+    API returning the route cost between every source and every target, without any map.
+    Body: {"sources": [...], "targets": [...] (default: the sources), "mode": "walk",
+    "optimizer": "length" | "time"}. Points are landmark names, {"lat", "lon"} objects or
+    [lat, lon] pairs. Costs are in meters (length) or minutes (time); null means no route.
+    """
+    data = request.get_json(silent=True) or {}
+    mode = data.get("mode", "walk")
+    optimizer = data.get("optimizer", "length")
+    sources = data.get("sources")
+    targets = data.get("targets", sources)
+    if mode not in outdoor_graph.NETWORK_TYPES:
+        return jsonify({"error": f"Invalid mode '{mode}'. Expected one of: {', '.join(outdoor_graph.NETWORK_TYPES)}"}), 400
+    if optimizer not in ("length", "time"):
+        return jsonify({"error": f"Invalid optimizer '{optimizer}'. Expected length or time"}), 400
+    if not isinstance(sources, list) or not isinstance(targets, list) or not sources or not targets:
+        return jsonify({"error": "sources and targets must be non-empty lists"}), 400
+    if max(len(sources), len(targets)) > DISTANCE_MATRIX_MAX_POINTS:
+        return jsonify({"error": f"At most {DISTANCE_MATRIX_MAX_POINTS} sources and targets are allowed"}), 400
+
+    try:
+        source_points = _resolve_points(sources)
+        target_points = _resolve_points(targets)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-landmark = get_landmarks()
+    # One graph covering every point: a single region tile, or adjacent tiles stitched together
+    points = source_points + target_points
+    graph = outdoor_graph.graph_for(mode, [(p["lat"], p["lon"]) for p in points])
+    nodes = graph.nearest_nodes([p["lat"] for p in points], [p["lon"] for p in points])
+    costs = graph.cost_matrix(nodes[:len(source_points)], nodes[len(source_points):], optimizer)
+    matrix = [[round(float(c), 2) if c != float("inf") else None for c in row] for row in costs]
+    for point, node in zip(points, nodes):
+        point["snapped"] = [float(graph.node_lat[node]), float(graph.node_lon[node])]
+    return jsonify({
+        "mode": mode,
+        "optimizer": optimizer,
+        "unit": "meters" if optimizer == "length" else "minutes",
+        "sources": source_points,
+        "targets": target_points,
+        "matrix": matrix
+    }), 200
 
-def get_coordinates(landmark_name):
-    db: Session = SessionLocal()
-    landmark = db.query(Landmark).filter(Landmark.landmark_name == landmark_name).first()
-    db.close()
-    if landmark:
-        return (landmark.latitude, landmark.longitude)
-    return None
+@outer_map_bp.route('/journey', methods=['POST'])
+def journey_route():
+    """
+    API for a room-to-room route across buildings, planned with one search over the
+    outdoor graph joined to the indoor floor graphs at each building's entrances.
+    Body: {"source": ..., "target": ..., "mode": "walk", "optimizer": "length" | "time"}.
+    An endpoint is {"landmark", "floor", "node"} (a room) or a landmark name (outside it).
+    The route comes back as legs: indoor legs per floor (grid path) and outdoor legs
+    (coordinates and encoded polyline), each with its cost.
+    """
+    data = request.get_json(silent=True) or {}
+    mode = data.get("mode", "walk")
+    optimizer = data.get("optimizer", "length")
+    source, target = data.get("source"), data.get("target")
+    if mode not in outdoor_graph.NETWORK_TYPES:
+        return jsonify({"error": f"Invalid mode '{mode}'. Expected one of: {', '.join(outdoor_graph.NETWORK_TYPES)}"}), 400
+    if optimizer not in ("length", "time"):
+        return jsonify({"error": f"Invalid optimizer '{optimizer}'. Expected length or time"}), 400
+    for endpoint in (source, target):
+        if not isinstance(endpoint, (str, dict)) or (isinstance(endpoint, dict) and not
+                                                     all(k in endpoint for k in ("landmark", "floor", "node"))):
+            return jsonify({"error": "source and target must be landmark names or {landmark, floor, node} objects"}), 400
+    try:
+        result = journey.plan_journey(source, target, mode, optimizer)
+    except journey.JourneyError as e:
+        return jsonify({"error": str(e)}), 404
+    result.update({"mode": mode, "optimizer": optimizer})
+    return jsonify(result), 200
 
 @outer_map_bp.route('/distance', methods=['POST', 'GET'])
 def distance():
     if request.method == 'POST':
-        data = request.json
+        data = request.get_json(silent=True) or {}
+        missing = [key for key in ('source', 'target', 'optimizer', 'mode') if not data.get(key)]
+        if missing:
+            return jsonify({"error": f"Missing required fields: {', '.join(missing)}"}), 400
         source = data['source']
         target = data['target']
-        optim = data['optimizer']
+        optimizer = data['optimizer']
         mode = data['mode']
+        # "html" (default) returns a rendered Folium map; "geojson" and "polyline" only the route
+        response_format = data.get('format', request.args.get('format', 'html'))
+        if not isinstance(source, str) or not isinstance(target, str):
+            return jsonify({"error": "source and target must be landmark names"}), 400
+        if mode not in outdoor_graph.NETWORK_TYPES:
+            return jsonify({"error": f"Invalid mode '{mode}'. Expected one of: {', '.join(outdoor_graph.NETWORK_TYPES)}"}), 400
+        if optimizer not in ("length", "time"):
+            return jsonify({"error": f"Invalid optimizer '{optimizer}'. Expected length or time"}), 400
+        if response_format not in route_geometry.RESPONSE_FORMATS:
+            return jsonify({"error": f"Invalid format '{response_format}'. Expected one of: {', '.join(route_geometry.RESPONSE_FORMATS)}"}), 400
 
-        source_coordinates = get_coordinates(source)
-        target_coordinates = get_coordinates(target)
-        # with SessionLocal() as session:
-        #     stmt = (
-        #         update(FileStorage)
-        #         .where(FileStorage.timestamp.is_(None))
-        #         .values(timestamp=datetime.utcnow())
-        #     )
-        #     result = session.execute(stmt)
-        #     print(f"Rows affected: {result.rowcount}")
-        #     session.flush() 
-        #     session.commit()
-        
-        start_latlng = (source_coordinates[0],source_coordinates[1])
-        end_latlng = (target_coordinates[0],target_coordinates[1])
-        optimizer = optim
-        graph = ox.graph.graph_from_bbox(12.8303, 12.8169, 80.0563, 80.0363, network_type=mode)
-        # find the nearest node to the start location
-        orig_node = ox.distance.nearest_nodes(graph, start_latlng[1], start_latlng[0])
-        # find the nearest node to the end location
-        dest_node = ox.distance.nearest_nodes(graph, end_latlng[1], end_latlng[0])
+        coordinates = landmark_index.get_coordinates()
+        # Route on the region tile holding both landmarks (tiles are stitched when they differ)
+        graph = outdoor_graph.graph_for(mode, [coordinates[n] for n in (source, target) if n in coordinates])
+        # Landmarks are snapped to graph nodes once per mode and tile, and cached (see services/landmark_index.py)
+        source_snap = landmark_index.snap(source, mode, graph)
+        target_snap = landmark_index.snap(target, mode, graph)
+        if source_snap is None or target_snap is None:
+            missing = source if source_snap is None else target
+            return jsonify({"error": f"Unknown landmark '{missing}'"}), 404
+        orig_node = source_snap[2]
+        dest_node = target_snap[2]
         
         # Get updated lat/lon for matched nodes
-        orig_x, orig_y = graph.nodes[orig_node]['x'], graph.nodes[orig_node]['y']
-        dest_x, dest_y = graph.nodes[dest_node]['x'], graph.nodes[dest_node]['y']
-        
-        start_latlng = (orig_y, orig_x)
-        end_latlng = (dest_y, dest_x)
-
-        #  find the shortest path
-        shortest_route = nx.shortest_path(graph,
-                                          orig_node,
-                                          dest_node,
-                                          weight=optimizer)
-        le=nx.shortest_path_length(graph,orig_node,dest_node, method='dijkstra',weight=optimizer)
-        edges = list(zip(shortest_route[:-1], shortest_route[1:]))
-        m = folium.Map(location=[start_latlng[0], start_latlng[1]], zoom_start=8)
-        
+        start_latlng = (float(graph.node_lat[orig_node]), float(graph.node_lon[orig_node]))
+        end_latlng = (float(graph.node_lat[dest_node]), float(graph.node_lon[dest_node]))
+
+        #  find the shortest path: unrolled from the precomputed landmark route table,
+        #  or one bidirectional A* search for weights without a table
+        table = route_table.get_table(mode, optimizer, graph)
+        if table is not None:
+            try:
+                shortest_route, le = table.route(source, target)
+                settled = 0
+            except KeyError:
+                table = None  # a landmark newer than the table: search instead
+        if table is None:
+            shortest_route, le, settled = graph.astar(orig_node, dest_node, optimizer)
+        if shortest_route is None:
+            return jsonify({"error": f"No {mode} route between {source} and {target}"}), 404
+        route_coordinates = route_geometry.route_coordinates(graph, shortest_route)
         
         polyLinePopupContent = ''
         
+        # Distance and ETA along the chosen route
+        route_length = graph.path_weight(shortest_route, 'length')
+        route_time = graph.path_weight(shortest_route, 'time')
+        
         if optimizer=='time':
-            Info='It will take you '+str(le)+' minutes'
-            polyLinePopupContent = str(le) + ' minutes'
-        elif optimizer=='length':
-            Info='The distance between your source and target is '+str(le)+' meters'
-            polyLinePopupContent = str(le) + ' meters'
+            Info='It will take you '+str(round(route_time, 1))+' minutes ('+str(round(route_length))+' meters)'
+            polyLinePopupContent = str(round(route_time, 1)) + ' minutes'
         else:
-            Info='Please select your source and target'
+            Info='The distance between your source and target is '+str(round(route_length, 1))+' meters (about '+str(round(route_time, 1))+' minutes)'
+            polyLinePopupContent = str(round(route_length, 1)) + ' meters'
             
         if mode == 'walk':
             polyLinePopupContent = '&#x1F6B6; ' + polyLinePopupContent  # 🚶 Walking
@@ -104,125 +210,44 @@ def distance():
             polyLinePopupContent = '&#x1F697; ' + polyLinePopupContent  # 🚗 Car
 
 
-        
-        # Plot the route with hover popups
-        for u, v in edges:
-    
-            # Get coordinates of edge
-            u_lat, u_lon = graph.nodes[u]['y'], graph.nodes[u]['x']
-            v_lat, v_lon = graph.nodes[v]['y'], graph.nodes[v]['x']
-            
-            # Get weight (distance/time)
-            edge_data = graph.get_edge_data(u, v)[0]  # First edge data (multi-edge case)
-            weight = edge_data.get(optimizer, "Unknown")  # Get distance/time
-            
-            # Create polyline with tooltip (hover effect)
-            folium.PolyLine(
-                [[u_lat, u_lon], [v_lat, v_lon]],
-                color="blue",
-                weight=5
-            ).add_to(m).add_child(folium.Tooltip(f'{polyLinePopupContent}'))
+        if response_format != 'html':
+            # Compact response for clients drawing the route on their own (persistent) map
+            result = {
+                'info': Info,
+                'distance': round(route_length, 1),
+                'duration': round(route_time, 1),
+                'start': {'name': source, 'lat': start_latlng[0], 'lon': start_latlng[1]},
+                'end': {'name': target, 'lat': end_latlng[0], 'lon': end_latlng[1]},
+                'settled_nodes': settled
+            }
+            if response_format == 'geojson':
+                result['route'] = route_geometry.route_geojson(route_coordinates, {
+                    'mode': mode, 'optimizer': optimizer,
+                    'distance': result['distance'], 'duration': result['duration']
+                })
+            else:
+                result['polyline'] = route_geometry.encode_polyline(route_coordinates)
+            return jsonify(result)
+
+        import folium
+        m = folium.Map(location=[start_latlng[0], start_latlng[1]], zoom_start=8)
+        # Plot the route as one polyline with a hover tooltip
+        folium.PolyLine(
+            [list(point) for point in route_coordinates],
+            color="blue",
+            weight=5
+        ).add_to(m).add_child(folium.Tooltip(f'{polyLinePopupContent}'))
 
-            
         shortest_route_map = m
-        # Add Marker
-        if source == 'Tech Park':
-            encoded = base64.b64encode(open('static/img/techpark.jpg', 'rb').read())
-            html = '''
-            <div class="row">
-            <div class="columntpr"><img src="data:image/png;base64,{}" width="250" height="200"></div>
-            </div>'''.format
-            iframe = IFrame(html(encoded.decode('UTF-8')), width=250, height=200)
-            popup = folium.Popup(iframe, max_width=400)
-            start_marker = folium.Marker(location=start_latlng, icon=folium.Icon(color='green'), popup=popup,
-                                         tooltip=source)
-            print(start_marker)
-        elif source == 'BIO-Tech Block':
-            encoded = base64.b64encode(open('static/img/BioTech.jpg', 'rb').read())
-            html = '''
-            <div class="row">
-            <div class="columntpr"><img src="data:image/png;base64,{}" width="250" height="200"></div>
-            </div>'''.format
-            iframe = IFrame(html(encoded.decode('UTF-8')), width=250, height=200)
-            popup = folium.Popup(iframe, max_width=400)
-            # start_latlng = (start_latlng[0], start_latlng[1])
-            start_marker = folium.Marker(location=start_latlng, icon=folium.Icon(color='green'), popup=popup,
-                                         tooltip=source)
-        elif source == 'SRM University Building':
-            encoded = base64.b64encode(open('static/img/ub.jpg', 'rb').read())
-            html = '''
-            <div class="row">
-            <div class="columntpr"><img src="data:image/png;base64,{}" width="250" height="200"></div>
-            </div>'''.format
-            iframe = IFrame(html(encoded.decode('UTF-8')), width=250, height=200)
-            popup = folium.Popup(iframe, max_width=400)
-            # start_latlng = (start_latlng[0], start_latlng[1])
-            start_marker = folium.Marker(location=start_latlng, icon=folium.Icon(color='green'), popup=popup,
-                                         tooltip=source)
-        else:
-            print(source)
-            # start_latlng = (start_latlng[0], start_latlng[1])
-            start_marker = folium.Marker(location=start_latlng, icon=folium.Icon(color='green'), popup=source,
-                                         tooltip=source)
-        if target == 'Tech Park':
-            # Encode the image in Base64
-            with open('static/img/techpark.jpg', 'rb') as image_file:
-                encoded_t = base64.b64encode(image_file.read()).decode('UTF-8')
-            
-            # Create the HTML to embed the image
-            html_t = f'<img src="data:image/jpeg;base64,{encoded_t}" width="250" height="200">'
-            
-            # Embed the HTML in an IFrame
-            iframe_t = IFrame(html_t, width=320, height=240)  # Add some padding for better appearance
-            
-            # Create a Popup using the IFrame
-            popup_t = folium.Popup(iframe_t, max_width=320)
-            
-            # Define the marker location and popup
-            end_marker = folium.Marker(
-                location=end_latlng,
-                icon=folium.Icon(color='red'),
-                popup=popup_t,
-                tooltip=target
-            )
-            
-        elif target == 'BIO-Tech Block':
-            encoded_t = base64.b64encode(open('static/img/BioTech.jpg', 'rb').read())
-            html_t = '<img src="data:image/png;base64,{}">'.format
-            iframe_t = IFrame(html_t(encoded_t.decode('UTF-8')), width=250, height=200)
-            popup_t = folium.Popup(iframe_t, max_width=400)
-            # end_latlng = (end_latlng[0], end_latlng[1])
-            end_marker = folium.Marker(location=end_latlng, icon=folium.Icon(color='red'), popup=popup_t,
-                                       tooltip=target)
-        elif target == 'SRM University Building':
-            encoded_t = base64.b64encode(open('static/img/ub.jpg', 'rb').read())
-            html_t = '<img src="data:image/png;base64,{}" width="250" height="200" >'.format
-            iframe_t = IFrame(html_t(encoded_t.decode('UTF-8')), width=250, height=200)
-            popup_t = folium.Popup(iframe_t, max_width=400)
-            # end_latlng = (end_latlng[0], end_latlng[1])
-            end_marker = folium.Marker(location=end_latlng, icon=folium.Icon(color='red'), popup=popup_t,
-                                       tooltip=target)
-        else:
-            # end_latlng = (end_latlng[0], end_latlng[1])
-            end_marker = folium.Marker(location=end_latlng, icon=folium.Icon(color='red'), popup=target,
-                                       tooltip=target)
-        # add the circle marker to the map
+        # Add start and end markers, with a photo popup for landmarks that have one
+        start_marker = _landmark_marker(source, start_latlng, 'green')
+        end_marker = _landmark_marker(target, end_latlng, 'red')
         start_marker.add_to(shortest_route_map)
         end_marker.add_to(shortest_route_map)
-        print(shortest_route_map)
-        shortest_route_map.save('static/DestinationMap.html')
-          # Save the map to a temporary HTML file
-        tmp_html = tempfile.NamedTemporaryFile(suffix='.html', delete=False)
-        shortest_route_map.save(tmp_html.name)
-        tmp_html.close()
-
-        # Read the content of the HTML file
-        with open(tmp_html.name, 'r') as file:
-            html_content = file.read()
-
-        # Remove the temporary HTML file after reading its content
-        os.unlink(tmp_html.name)
-         # Return the HTML content as JSON response
-        return jsonify({'html_content': html_content, 'info': Info})
+        # Render the map to a string in memory (nothing is written to disk)
+        html_content = shortest_route_map.get_root().render()
+        return jsonify({'html_content': html_content, 'info': Info,
+                        'distance': round(route_length, 1), 'duration': round(route_time, 1),
+                        'settled_nodes': settled})
         # return render_template('distance.html', landmarks=landmark,final_map='static/Destination_map.html',modes=['walk','bike','drive'],optims=['length','time'],Info=Info)
-    return render_template('distance.html',landmarks=landmark,final_map='static/DestinationMap.html',modes=['walk','bike','drive'],optims=['length','time'],Info='Please select your source and target')
\ No newline at end of file
+    return render_template('distance.html',landmarks=get_landmarks(),final_map='static/DestinationMap.html',modes=['walk','bike','drive'],optims=['length','time'],Info='Please select your source and target')
\ No newline at end of file
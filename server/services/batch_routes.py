@@ -0,0 +1,94 @@
+import os
+import numpy as np
+from services import indoor_graph, closures
+
+# --- Batch route configuration ---
+BATCH_MAX_PAIRS = int(os.getenv("BATCH_MAX_PAIRS", "10000"))            # pairs accepted per request
+BATCH_SOURCES_PER_SEARCH = int(os.getenv("BATCH_SOURCES_PER_SEARCH", "32"))  # sources solved per Dijkstra call
+
+
+def _legs(building, tree, root, target):
+    """Walk a shortest-path tree back from target to root and split the cells into floor legs."""
+    vertices = [target]
+    while vertices[-1] != root:
+        vertices.append(int(tree[vertices[-1]]))
+    legs = []
+    for vertex in reversed(vertices):
+        floor, x, y = building.vertices[vertex]
+        if not legs or legs[-1]["floor"] != floor:
+            legs.append({"floor": floor, "path": []})
+        legs[-1]["path"].append([x, y])
+    return legs
+
+def _pair_fields(pair):
+    """The start/end fields of a pair as echoed in its result line (floors as strings when valid)."""
+    fields = {key: pair.get(key) if isinstance(pair, dict) else None
+              for key in ("start", "start_floor", "end", "end_floor")}
+    for key in ("start_floor", "end_floor"):
+        if isinstance(fields[key], (str, int)) and not isinstance(fields[key], bool):
+            fields[key] = str(fields[key])
+    return fields
+
+def _pair_error(pair):
+    """Why a pair cannot be routed as given, or None if its fields are well-formed."""
+    if not isinstance(pair, dict) or not all(key in pair for key in ("start", "start_floor", "end", "end_floor")):
+        return "Each pair needs start, start_floor, end and end_floor"
+    if not isinstance(pair["start"], str) or not isinstance(pair["end"], str):
+        return "start and end must be node names (strings)"
+    if any(isinstance(pair[key], bool) or not isinstance(pair[key], (str, int)) for key in ("start_floor", "end_floor")):
+        return "start_floor and end_floor must be strings or integers"
+    return None
+
+def group_pairs(building, pairs):
+    """
+    Resolve pairs to building vertices and group them by source vertex.
+    Returns ({source_vertex: [(index, pair, target_vertex)]}, [(index, pair, error)]).
+    """
+    groups, errors = {}, []
+    for index, pair in enumerate(pairs):
+        error = _pair_error(pair)
+        if error is not None:
+            errors.append((index, pair, error))
+            continue
+        start = (str(pair["start_floor"]), pair["start"])
+        end = (str(pair["end_floor"]), pair["end"])
+        source = building.node_vertex(*start)
+        target = building.node_vertex(*end)
+        if source is None or target is None:
+            floor, name = start if source is None else end
+            errors.append((index, pair, f"Node '{name}' not found on floor '{floor}'"))
+            continue
+        groups.setdefault(source, []).append((index, pair, target))
+    return groups, errors
+
+def iter_routes(building, pairs, include_path=True):
+    """
+    Yield one result per pair: {"index", "start", "start_floor", "end", "end_floor", "cost"}
+    plus "legs" ([{"floor", "path"}]) when include_path, or "error" (cost None).
+    Pairs are grouped by start node and each group is answered from one shortest-path
+    tree; up to BATCH_SOURCES_PER_SEARCH trees are computed per scipy call. Results come
+    out grouped by start node, so they are not in request order ("index" maps them back).
+    Routes avoid the closures active when the batch starts.
+    """
+    from scipy.sparse.csgraph import dijkstra
+
+    csr = closures.building_csr(building)
+    groups, errors = group_pairs(building, pairs)
+    for index, pair, error in errors:
+        yield {"index": index, **_pair_fields(pair), "cost": None, "error": error}
+
+    sources = list(groups)
+    for chunk_start in range(0, len(sources), BATCH_SOURCES_PER_SEARCH):
+        chunk = sources[chunk_start:chunk_start + BATCH_SOURCES_PER_SEARCH]
+        dist, predecessors = dijkstra(csr, directed=True, indices=chunk, return_predecessors=True)
+        for row, source in enumerate(chunk):
+            for index, pair, target in groups[source]:
+                result = {"index": index, **_pair_fields(pair)}
+                cost = float(dist[row, target])
+                if not np.isfinite(cost):
+                    result.update({"cost": None, "error": "Path does not exist"})
+                else:
+                    result["cost"] = round(cost, 2)
+                    if include_path:
+                        result["legs"] = _legs(building, predecessors[row], source, target)
+                yield result
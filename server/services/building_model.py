@@ -0,0 +1,299 @@
+import io
+import json
+import os
+import threading
+from datetime import datetime
+import numpy as np
+from config import SessionLocal
+from services.models import FileStorage, BuildingModel
+from services import model_pool
+from services.model_settings import LOD_SETTINGS
+from services.utils import GRID_SIZE, CANVAS_WIDTH, CANVAS_HEIGHT, X_OFFSET, Y_OFFSET
+from services.floor_files import FLOOR_FILE_PATTERN, floor_sort_key
+
+# The geometry stack (trimesh, shapely, OpenCV via services.model_generation) is imported
+# inside the functions that build meshes, so importing this module stays cheap.
+
+# --- Building model configuration ---
+BUILDING_FLOOR_HEIGHT = float(os.getenv("BUILDING_FLOOR_HEIGHT", "60"))   # vertical distance between stacked floors
+BUILDING_LOD = os.getenv("BUILDING_LOD", "medium")
+BUILDING_MODEL_FILENAME = "building.glb"
+ROUTE_WIDTH = 6.0   # width of the route ribbon in pixels
+
+# landmark -> Future of the building build currently queued or running for it
+_pending_builds = {}
+# landmarks whose floor files changed after their pending build read them
+_stale_builds = set()
+# landmark -> build options last requested for it and not yet saved with a model
+_build_options = {}
+_pending_lock = threading.Lock()
+
+def floor_elevations(floor_names, floor_height=BUILDING_FLOOR_HEIGHT, overrides=None):
+    """
+    Map each floor name to its elevation: floors are stacked in sorted order,
+    floor_height apart, unless an explicit elevation is given in overrides.
+    """
+    overrides = overrides or {}
+    elevations = {}
+    for index, floor_name in enumerate(sorted(floor_names, key=floor_sort_key)):
+        elevations[floor_name] = float(overrides.get(floor_name, index * floor_height))
+    return elevations
+
+def _floor_node_name(floor_name):
+    return f"floor-{floor_name}"
+
+def _add_to_floor(scene, floor_node, mesh, name):
+    scene.add_geometry(mesh, node_name=f"{floor_node}-{name}", geom_name=f"{floor_node}-{name}",
+                       parent_node_name=floor_node)
+
+def _add_floor_node(scene, floor_node, elevation):
+    import trimesh
+    scene.graph.update(frame_from=scene.graph.base_frame, frame_to=floor_node,
+                       matrix=trimesh.transformations.translation_matrix((0, elevation, 0)))
+
+def _load_base_map(image_bytes):
+    """
+    Resize a raw base map to the canvas used for path images, so pixel coordinates
+    line up with the node grid, and return it as an OpenCV BGR array.
+    """
+    from PIL import Image
+    base_map = Image.open(io.BytesIO(image_bytes)).convert("RGB").resize((CANVAS_WIDTH, CANVAS_HEIGHT))
+    return np.array(base_map)[:, :, ::-1].copy()
+
+def list_floor_names(landmark_name):
+    """Return the floor names that have a model or base map file for the landmark."""
+    db = SessionLocal()
+    try:
+        filenames = db.query(FileStorage.filename).filter(
+            FileStorage.landmark == landmark_name
+        ).distinct().all()
+    finally:
+        db.close()
+    floors = set()
+    for (filename,) in filenames:
+        match = FLOOR_FILE_PATTERN.match(filename)
+        if match:
+            floors.add(match.group(2))
+    return sorted(floors, key=floor_sort_key)
+
+def load_building_sources(landmark_name):
+    """
+    Fetch the latest base map and model file of every floor of a landmark.
+    Returns {floor_name: (base_map_bytes or None, nodes)}.
+    """
+    from services.model_generation import load_nodes_from_content
+
+    db = SessionLocal()
+    try:
+        # pick the latest version of each file by its metadata, then load only those contents
+        versions = db.query(FileStorage.id, FileStorage.filename).filter(
+            FileStorage.landmark == landmark_name,
+            FileStorage.filename.like("mapbase-%.png") | FileStorage.filename.like("model-%.txt")
+        ).order_by(FileStorage.timestamp.desc()).all()
+        latest = {}
+        for file_id, filename in versions:
+            match = FLOOR_FILE_PATTERN.match(filename)
+            if match:
+                latest.setdefault((match.group(1), match.group(2)), file_id)
+        contents = dict(db.query(FileStorage.id, FileStorage.content).filter(
+            FileStorage.id.in_(list(latest.values()))).all()) if latest else {}
+        base_maps, nodes = {}, {}
+        for (kind, floor_name), file_id in latest.items():
+            if kind == "mapbase":
+                base_maps[floor_name] = contents[file_id]
+            else:
+                nodes[floor_name], _ = load_nodes_from_content(contents[file_id])
+    finally:
+        db.close()
+    return {floor_name: (base_maps.get(floor_name), nodes.get(floor_name, {}))
+            for floor_name in set(base_maps) | set(nodes)}
+
+def build_building_glb(floors, floor_height=BUILDING_FLOOR_HEIGHT, elevations=None, lod=BUILDING_LOD, quantize=None):
+    """
+    Build one GLB containing every floor of a building, stacked vertically.
+    floors maps floor_name -> (base_map_bytes, nodes). Each floor is a named node
+    ("floor-<name>") holding its walls, floor slab and text labels, translated to its
+    elevation. Route overlays are not included; see build_route_overlay_glb.
+    This does no database access, so it can run inside a worker process.
+    """
+    import trimesh
+    from services.model_generation import (
+        SWAP_YZ, extract_wall_geometry, finish_wall_geometry, extrude_wall_meshes,
+        create_floor_slab, create_label_meshes, quantize_glb
+    )
+
+    settings = LOD_SETTINGS[lod]
+    if quantize is None:
+        quantize = settings["quantize"]
+    elevations = floor_elevations(list(floors), floor_height, elevations)
+
+    scene = trimesh.Scene()
+    for floor_name in sorted(floors, key=floor_sort_key):
+        image_bytes, nodes = floors[floor_name]
+        floor_node = _floor_node_name(floor_name)
+        _add_floor_node(scene, floor_node, elevations[floor_name])
+
+        black_geometry = None
+        if image_bytes is not None:
+            try:
+                black_geometry = finish_wall_geometry(extract_wall_geometry(_load_base_map(image_bytes)), settings)
+            except RuntimeError as e:
+                print(f"Skipping walls for floor {floor_name}: {e}")
+
+        if black_geometry is not None and not black_geometry.is_empty:
+            for index, mesh in enumerate(extrude_wall_meshes(black_geometry)):
+                mesh.apply_transform(SWAP_YZ)
+                _add_to_floor(scene, floor_node, mesh, f"wall-{index}")
+            _add_to_floor(scene, floor_node, create_floor_slab(black_geometry), "slab")
+        for index, mesh in enumerate(create_label_meshes(nodes, floor_name, settings)):
+            _add_to_floor(scene, floor_node, mesh, f"label-{index}")
+
+    glb_bytes = scene.export(file_type='glb')
+    if quantize:
+        glb_bytes = quantize_glb(glb_bytes)
+    return glb_bytes
+
+def build_route_overlay_glb(floor_paths, elevations, lod="medium", quantize=None):
+    """
+    Build a small GLB with only the route for each floor: a blue ribbon along the path
+    cells plus a green start and red end marker, placed at the floor's elevation so it
+    lines up with the building model. floor_paths maps floor_name -> [(x, y), ...] in
+    grid cells, as returned by /api/path.
+    """
+    import trimesh
+    from shapely.geometry import LineString, Point
+    from services.model_generation import SWAP_YZ, create_rope_meshes, quantize_glb
+
+    settings = LOD_SETTINGS[lod]
+    if quantize is None:
+        quantize = settings["quantize"]
+
+    scene = trimesh.Scene()
+    for floor_name, cells in floor_paths.items():
+        if not cells:
+            continue
+        points = [((x * GRID_SIZE) + X_OFFSET, (y * GRID_SIZE) + Y_OFFSET) for x, y in cells]
+        shape = LineString(points) if len(points) > 1 else Point(points[0])
+        ribbon = shape.buffer(ROUTE_WIDTH / 2.0, settings["buffer_resolution"])
+        polygons = list(ribbon.geoms) if ribbon.geom_type == "MultiPolygon" else [ribbon]
+
+        route_node = f"route-{floor_name}"
+        _add_floor_node(scene, route_node, elevations.get(floor_name, 0.0))
+        for index, mesh in enumerate(create_rope_meshes(polygons)):
+            mesh.apply_transform(SWAP_YZ)
+            _add_to_floor(scene, route_node, mesh, f"path-{index}")
+
+        sphere_radius = 4.0
+        for name, point, color in (("start", points[0], [0, 200, 0, 255]), ("end", points[-1], [255, 0, 0, 255])):
+            marker = trimesh.creation.icosphere(subdivisions=settings["sphere_subdivisions"], radius=sphere_radius)
+            marker.apply_translation((point[0], sphere_radius, point[1]))
+            marker.visual.face_colors = color
+            _add_to_floor(scene, route_node, marker, name)
+
+    glb_bytes = scene.export(file_type='glb')
+    if quantize:
+        glb_bytes = quantize_glb(glb_bytes)
+    return glb_bytes
+
+def load_building_model(landmark_name):
+    """Return the stored BuildingModel record for a landmark, or None."""
+    db = SessionLocal()
+    try:
+        return db.query(BuildingModel).filter(BuildingModel.landmark == landmark_name).first()
+    finally:
+        db.close()
+
+def save_building_model(landmark_name, glb_bytes, options=None):
+    """
+    Store a building GLB for a landmark, replacing any previous version. options are the
+    floor_height/elevations/lod it was built with, reused by later rebuilds.
+    """
+    db = SessionLocal()
+    try:
+        db.query(BuildingModel).filter(BuildingModel.landmark == landmark_name).delete(synchronize_session=False)
+        # building models used to be kept in file_storage, where they cluttered the admin file list
+        db.query(FileStorage).filter(
+            FileStorage.filename == BUILDING_MODEL_FILENAME,
+            FileStorage.landmark == landmark_name
+        ).delete(synchronize_session=False)
+        db.add(BuildingModel(landmark=landmark_name, content=glb_bytes, timestamp=datetime.utcnow(),
+                             options=json.dumps(options) if options is not None else None))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def _stored_options(landmark_name):
+    """
+    The build options of a landmark: the last ones requested in this process, else the
+    ones its stored model was built with, else the defaults. Call with _pending_lock held.
+    """
+    options = _build_options.get(landmark_name)
+    if options is not None:
+        return options
+    options = {"floor_height": BUILDING_FLOOR_HEIGHT, "elevations": None, "lod": BUILDING_LOD}
+    db = SessionLocal()
+    try:
+        saved = db.query(BuildingModel.options).filter(BuildingModel.landmark == landmark_name).scalar()
+    finally:
+        db.close()
+    if saved:
+        options.update(json.loads(saved))
+    return options
+
+def _on_build_done(landmark_name, options, future):
+    with _pending_lock:
+        if _pending_builds.get(landmark_name) is future:
+            del _pending_builds[landmark_name]
+        rebuild = landmark_name in _stale_builds
+        _stale_builds.discard(landmark_name)
+    if future.cancelled() or future.exception() is not None:
+        print(f"Building model for '{landmark_name}' failed: {future.exception() if not future.cancelled() else 'cancelled'}")
+    else:
+        try:
+            save_building_model(landmark_name, future.result(), options)
+            print(f"Building model for '{landmark_name}' updated")
+        except Exception as e:
+            print(f"Error saving building model for '{landmark_name}':", e)
+        else:
+            # the saved row now carries these options, and other workers read them from there
+            with _pending_lock:
+                if _build_options.get(landmark_name) is options:
+                    del _build_options[landmark_name]
+    if rebuild:
+        try:
+            # with the latest requested options, not necessarily the ones just built
+            queue_building_build(landmark_name)
+        except Exception as e:
+            print(f"Error queueing building model build for '{landmark_name}':", e)
+
+def queue_building_build(landmark_name, floor_height=None, elevations=None, lod=None):
+    """
+    Rebuild a landmark's building model in the background on the model worker pool.
+    Options left as None keep the landmark's stored value (see _stored_options); given
+    ones replace it, so the latest request wins. Returns the pending Future, or None when
+    the landmark has no floor files. While a build is pending it is returned and the
+    landmark is built once more after it, since its floor files or options may have
+    changed after the pending build read them.
+    Raises model_pool.PoolSaturatedError when the pool is full.
+    """
+    # The lock is held from the check to the submission so concurrent uploads queue one build
+    with _pending_lock:
+        options = dict(_stored_options(landmark_name))
+        requested = {"floor_height": floor_height, "elevations": elevations, "lod": lod}
+        options.update({key: value for key, value in requested.items() if value is not None})
+        _build_options[landmark_name] = options
+        pending = _pending_builds.get(landmark_name)
+        if pending is not None and not pending.done():
+            _stale_builds.add(landmark_name)
+            return pending
+        floors = load_building_sources(landmark_name)
+        if not floors:
+            return None
+        future = model_pool.submit(build_building_glb, floors, options["floor_height"], options["elevations"],
+                                   options["lod"], timeout=model_pool.MODEL_TASK_TIMEOUT * len(floors))
+        _pending_builds[landmark_name] = future
+    future.add_done_callback(lambda f: _on_build_done(landmark_name, options, f))
+    return future
@@ -0,0 +1,362 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+import numpy as np
+from config import SessionLocal
+from services.models import Closure
+from services import floor_ingest, floor_tables
+
+# --- Closure configuration ---
+CLOSURE_POLL_SECONDS = float(os.getenv("CLOSURE_POLL_SECONDS", "2"))          # re-read closures made by other workers
+DETOUR_CACHE_SIZE = int(os.getenv("DETOUR_CACHE_SIZE", "2048"))               # cached routes around closures
+
+# landmark -> {"items": {id: ClosedArea}, "loaded": monotonic time, "version": int}
+_landmarks = {}
+# (landmark, floor, stored path cells) -> (detour cells or None, ids of the closures it avoids)
+_detours = OrderedDict()
+# landmark -> (BuildingGraph, closure ids, CSR graph of the building with those closures masked out)
+_masked = {}
+_lock = threading.Lock()
+
+
+class ClosureError(ValueError):
+    """Raised for a closure request that cannot be stored."""
+
+
+class ClosedArea:
+    """
+    An active closure of one floor: blocked grid cells, blocked steps between two
+    neighbouring cells, and blocked rectangular zones (x1, y1, x2, y2, inclusive).
+    """
+
+    def __init__(self, id, landmark, floor, cells, edges, zones, reason=None, created_at=None, expires_at=None):
+        self.id = id
+        self.landmark = landmark
+        self.floor = floor
+        self.cells = frozenset(tuple(cell) for cell in cells)
+        self.edges = frozenset(frozenset((tuple(a), tuple(b))) for a, b in edges)
+        self.zones = tuple(tuple(zone) for zone in zones)
+        self.reason = reason
+        self.created_at = created_at
+        self.expires_at = expires_at
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row.id, row.landmark, row.floor, json.loads(row.cells), json.loads(row.edges),
+                   json.loads(row.zones), row.reason, row.created_at, row.expires_at)
+
+    def blocks_cell(self, cell):
+        x, y = cell
+        return (x, y) in self.cells or any(x1 <= x <= x2 and y1 <= y <= y2 for x1, y1, x2, y2 in self.zones)
+
+    def blocks_path(self, cells):
+        """True if a path (list of cells) enters a closed cell or takes a closed step."""
+        if any(self.blocks_cell(cell) for cell in cells):
+            return True
+        return bool(self.edges) and any(frozenset((tuple(a), tuple(b))) in self.edges
+                                        for a, b in zip(cells[:-1], cells[1:]))
+
+    def to_dict(self):
+        return {
+            "id": self.id, "landmark": self.landmark, "floor": self.floor,
+            "cells": sorted([list(cell) for cell in self.cells]),
+            "edges": sorted([sorted(list(cell) for cell in edge) for edge in self.edges]),
+            "zones": [list(zone) for zone in self.zones],
+            "reason": self.reason,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+        }
+
+
+def _cell(value, what):
+    try:
+        x, y = (int(v) for v in value)
+    except (TypeError, ValueError):
+        raise ClosureError(f"{what} must be an [x, y] grid cell")
+    if not (0 <= x < floor_ingest.GRID_COLUMNS and 0 <= y < floor_ingest.GRID_ROWS):
+        raise ClosureError(f"{what} ({x}, {y}) is outside the {floor_ingest.GRID_COLUMNS}x{floor_ingest.GRID_ROWS} grid")
+    return [x, y]
+
+def parse_geometry(data):
+    """
+    (cells, edges, zones) of a closure request: "cells": [[x, y]], "edges": [[[x1, y1], [x2, y2]]]
+    (neighbouring cells) and "zones": [[x1, y1, x2, y2]] or [{"x1", "y1", "x2", "y2"}].
+    Raises ClosureError when nothing is closed or a value is invalid.
+    """
+    cells = [_cell(cell, "cell") for cell in data.get("cells") or []]
+    edges = []
+    for edge in data.get("edges") or []:
+        if not isinstance(edge, (list, tuple)) or len(edge) != 2:
+            raise ClosureError("edge must be a pair of cells [[x1, y1], [x2, y2]]")
+        a, b = _cell(edge[0], "edge cell"), _cell(edge[1], "edge cell")
+        if max(abs(a[0] - b[0]), abs(a[1] - b[1])) != 1:
+            raise ClosureError(f"edge {a} -> {b} does not join neighbouring cells")
+        edges.append([a, b])
+    zones = []
+    for zone in data.get("zones") or []:
+        if isinstance(zone, dict):
+            zone = [zone.get(key) for key in ("x1", "y1", "x2", "y2")]
+        if not isinstance(zone, (list, tuple)) or len(zone) != 4:
+            raise ClosureError("zone must be [x1, y1, x2, y2]")
+        (x1, y1), (x2, y2) = _cell(zone[:2], "zone corner"), _cell(zone[2:], "zone corner")
+        zones.append([min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)])
+    if not cells and not edges and not zones:
+        raise ClosureError("A closure needs at least one of cells, edges or zones")
+    return cells, edges, zones
+
+def parse_expiry(data):
+    """expires_at of a closure request ("expires_at" ISO time or "ttl" seconds), or None."""
+    if data.get("ttl") is not None:
+        try:
+            ttl = float(data["ttl"])
+        except (TypeError, ValueError):
+            raise ClosureError("ttl must be a number of seconds")
+        if ttl <= 0:
+            raise ClosureError("ttl must be positive")
+        return datetime.utcfromtimestamp(time.time() + ttl)
+    if data.get("expires_at"):
+        try:
+            expires_at = datetime.fromisoformat(str(data["expires_at"]).replace("Z", "+00:00"))
+        except ValueError:
+            raise ClosureError("expires_at must be an ISO 8601 time")
+        if expires_at.tzinfo is not None:
+            expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+        if expires_at <= datetime.utcnow():
+            raise ClosureError("expires_at is in the past")
+        return expires_at
+    return None
+
+def _load(landmark_name):
+    """{id: ClosedArea} of the unexpired closures of a landmark, from the database."""
+    db = SessionLocal()
+    try:
+        rows = db.query(Closure).filter(Closure.landmark == landmark_name).filter(
+            (Closure.expires_at.is_(None)) | (Closure.expires_at > datetime.utcnow())).all()
+        return {row.id: ClosedArea.from_row(row) for row in rows}
+    finally:
+        db.close()
+
+def _apply(landmark_name, state, items):
+    """
+    Make `items` the active closures of a landmark (caller holds _lock). Cached detours
+    are dropped only where they cross a new closure or were routed around a lifted one.
+    """
+    old = state["items"]
+    added = [area for id, area in items.items() if id not in old]
+    removed = {id for id in old if id not in items}
+    state["items"] = items
+    if not added and not removed:
+        return 0
+    state["version"] += 1
+    dropped = 0
+    for key, (cells, avoided) in list(_detours.items()):
+        if key[0] != landmark_name:
+            continue
+        if avoided & removed or (cells and any(area.floor == key[1] and area.blocks_path(cells) for area in added)):
+            del _detours[key]
+            dropped += 1
+    print(f"Closures of '{landmark_name}': {len(added)} added, {len(removed)} lifted, "
+          f"{len(items)} active; {dropped} cached detours dropped")
+    return dropped
+
+def _state(landmark_name, reload=False):
+    """The closure state of a landmark, re-read when older than CLOSURE_POLL_SECONDS; expired closures are lifted."""
+    now = time.monotonic()
+    with _lock:
+        state = _landmarks.get(landmark_name)
+        if state is not None and not reload and now - state["loaded"] < CLOSURE_POLL_SECONDS:
+            utcnow = datetime.utcnow()
+            if any(area.expires_at and area.expires_at <= utcnow for area in state["items"].values()):
+                _apply(landmark_name, state, {id: area for id, area in state["items"].items()
+                                              if area.expires_at is None or area.expires_at > utcnow})
+            return state
+    items = _load(landmark_name)
+    with _lock:
+        state = _landmarks.setdefault(landmark_name, {"items": {}, "loaded": now, "version": 0})
+        state["loaded"] = now
+        state["dropped"] = _apply(landmark_name, state, items)
+        return state
+
+def active(landmark_name, floor_name=None):
+    """The active closures of a landmark (or of one of its floors), as ClosedArea objects."""
+    areas = list(_state(landmark_name)["items"].values())
+    return areas if floor_name is None else [area for area in areas if area.floor == floor_name]
+
+def closed_ids(landmark_name):
+    """Ids of the active closures of a landmark; changes whenever the closures do."""
+    return tuple(sorted(_state(landmark_name)["items"]))
+
+def list_closures(landmark_name=None):
+    """The unexpired closures of one landmark, or of every landmark, as ClosedArea objects."""
+    if landmark_name is not None:
+        return active(landmark_name)
+    db = SessionLocal()
+    try:
+        rows = db.query(Closure).filter(
+            (Closure.expires_at.is_(None)) | (Closure.expires_at > datetime.utcnow())).order_by(Closure.id).all()
+        return [ClosedArea.from_row(row) for row in rows]
+    finally:
+        db.close()
+
+def add_closure(landmark_name, floor_name, cells, edges, zones, reason=None, expires_at=None):
+    """Store a closure and apply it at once. Returns (ClosedArea, number of cached detours dropped)."""
+    db = SessionLocal()
+    try:
+        row = Closure(landmark=landmark_name, floor=floor_name, cells=json.dumps(cells), edges=json.dumps(edges),
+                      zones=json.dumps(zones), reason=reason, expires_at=expires_at)
+        db.add(row)
+        db.commit()
+        area = ClosedArea.from_row(row)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return area, _state(landmark_name, reload=True)["dropped"]
+
+def remove_closure(closure_id):
+    """Delete a closure and lift it at once. Returns its landmark, or None if there is no such closure."""
+    db = SessionLocal()
+    try:
+        row = db.query(Closure).get(closure_id)
+        if row is None:
+            return None
+        landmark_name = row.landmark
+        db.delete(row)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    _state(landmark_name, reload=True)
+    return landmark_name
+
+def _vertex_mask(areas, floors, xs, ys):
+    """Boolean mask of the vertices (floor labels, x, y arrays) inside a closed cell or zone."""
+    blocked = np.zeros(len(xs), dtype=bool)
+    keys = xs.astype(np.int64) * floor_ingest.GRID_ROWS + ys
+    for area in areas:
+        on_floor = floors == area.floor if floors is not None else np.ones(len(xs), dtype=bool)
+        if area.cells:
+            blocked |= on_floor & np.isin(keys, [x * floor_ingest.GRID_ROWS + y for x, y in area.cells])
+        for x1, y1, x2, y2 in area.zones:
+            blocked |= on_floor & (xs >= x1) & (xs <= x2) & (ys >= y1) & (ys <= y2)
+    return blocked
+
+def _masked_csr(csr, blocked, closed_edges):
+    """
+    Copy of a CSR graph whose edges into or out of blocked vertices, and the closed
+    (u, v) vertex pairs, weigh inf (never taken by Dijkstra). Only the weights are
+    copied; the index arrays are shared with the compiled graph.
+    """
+    from scipy.sparse import csr_matrix
+
+    count = csr.shape[0]
+    rows = np.repeat(np.arange(count, dtype=np.int64), np.diff(csr.indptr))
+    mask = blocked[rows] | blocked[csr.indices]
+    if closed_edges:
+        pairs = [u * count + v for u, v in closed_edges] + [v * count + u for u, v in closed_edges]
+        mask |= np.isin(rows * count + csr.indices, pairs)
+    weights = csr.data.copy()
+    weights[mask] = np.inf
+    return csr_matrix((weights, csr.indices, csr.indptr), shape=csr.shape)
+
+def building_csr(building):
+    """
+    The CSR graph of a BuildingGraph with the active closures of its landmark masked out.
+    The masked copy is kept until the closures change or the building graph is rebuilt.
+    """
+    ids = closed_ids(building.landmark)
+    if not ids:
+        return building.csr
+    with _lock:
+        cached = _masked.get(building.landmark)
+    if cached is not None and cached[0] is building and cached[1] == ids:
+        return cached[2]
+    areas = active(building.landmark)
+    floors = np.array([floor for floor, _, _ in building.vertices])
+    xs = np.array([x for _, x, _ in building.vertices])
+    ys = np.array([y for _, _, y in building.vertices])
+    closed_edges = []
+    for area in areas:
+        for edge in area.edges:
+            a, b = (building.find_vertex(area.floor, cell) for cell in edge)
+            if a is not None and b is not None:
+                closed_edges.append((a, b))
+    csr = _masked_csr(building.csr, _vertex_mask(areas, floors, xs, ys), closed_edges)
+    with _lock:
+        _masked[building.landmark] = (building, ids, csr)
+    return csr
+
+def floor_csr(landmark_name, floor_name, graph):
+    """The CSR graph of a FloorGraph with the active closures of the floor masked out."""
+    areas = active(landmark_name, floor_name)
+    if not areas:
+        return graph.csr()
+    index = {tuple(cell): v for v, cell in enumerate(graph.cells.tolist())}
+    closed_edges = []
+    for area in areas:
+        for edge in area.edges:
+            a, b = (index.get(cell) for cell in edge)
+            if a is not None and b is not None:
+                closed_edges.append((a, b))
+    blocked = _vertex_mask(areas, None, graph.cells[:, 0], graph.cells[:, 1])
+    return _masked_csr(graph.csr(), blocked, closed_edges)
+
+def _detour(landmark_name, floor_name, start, end):
+    """Shortest open route (list of cells) between two cells of a floor, or None."""
+    from scipy.sparse.csgraph import dijkstra
+
+    graph = floor_ingest.load_floor_graph(landmark_name, floor_name)
+    if graph is None:
+        return None
+    index = {tuple(cell): v for v, cell in enumerate(graph.cells.tolist())}
+    source, target = index.get(tuple(start)), index.get(tuple(end))
+    if source is None or target is None:
+        return None
+    dist, pred = dijkstra(floor_csr(landmark_name, floor_name, graph), directed=False,
+                          indices=source, return_predecessors=True)
+    if not np.isfinite(dist[target]):
+        return None
+    vertices = [target]
+    while vertices[-1] != source:
+        vertices.append(int(pred[vertices[-1]]))
+    return [tuple(int(v) for v in graph.cells[vertex]) for vertex in reversed(vertices)]
+
+def floor_route(landmark_name, floor_name, start, end):
+    """
+    The generated path of a floor from cell `start` to cell `end` (see floor_tables.stored_path)
+    or, when it crosses an active closure, the shortest route around the closures over the
+    floor's graph (cached until a closure on it changes). None when there is neither.
+    """
+    path = floor_tables.stored_path(landmark_name, floor_name, start, end)
+    if path is None:
+        return None
+    areas = active(landmark_name, floor_name)
+    if not any(area.blocks_path(path) for area in areas):
+        return path
+    key = (landmark_name, floor_name, tuple(path))
+    with _lock:
+        if key in _detours:
+            _detours.move_to_end(key)
+            return _detours[key][0]
+    state = _state(landmark_name)
+    current = state["version"]
+    detour = _detour(landmark_name, floor_name, start, end)
+    with _lock:
+        # not cached if the closures changed while it was being computed
+        if state["version"] == current:
+            _detours[key] = (detour, frozenset(area.id for area in areas))
+            while len(_detours) > DETOUR_CACHE_SIZE:
+                _detours.popitem(last=False)
+    return detour
+
+def invalidate_routes(landmark_name, floor_name=None):
+    """Forget the cached detours of a landmark (or one floor), e.g. when a model file changes."""
+    with _lock:
+        for key in [key for key in _detours if key[0] == landmark_name and floor_name in (None, key[1])]:
+            del _detours[key]
@@ -0,0 +1,70 @@
+import os
+import re
+import time
+import threading
+from sqlalchemy import func
+from config import SessionLocal
+from services.models import FileStorage
+
+# Floor files stored in file_storage: model-<floor>.txt (nodes and paths) and
+# mapbase-<floor>.png (base map). Kept apart from the 3D building code so the routing,
+# search and event modules can recognise them without importing it.
+FLOOR_FILE_PATTERN = re.compile(r"^(model|mapbase)-(.+)\.(txt|png)$")
+
+FLOOR_FILE_POLL_SECONDS = float(os.getenv("FLOOR_FILE_POLL_SECONDS", "5"))   # notice model files changed by other workers
+
+
+def floor_sort_key(floor_name):
+    """Sort floors numerically when their names are numbers, otherwise by name."""
+    try:
+        return (0, float(floor_name), "")
+    except ValueError:
+        return (1, 0.0, floor_name)
+
+def model_file_versions():
+    """
+    {(landmark, floor): version} of every stored model file. The version combines the
+    time of the latest upload with the number and newest id of the floor's records, so
+    it changes when a model is uploaded, replaced, renamed, moved or deleted.
+    """
+    db = SessionLocal()
+    try:
+        rows = db.query(FileStorage.landmark, FileStorage.filename, func.max(FileStorage.timestamp),
+                        func.count(FileStorage.id), func.max(FileStorage.id)).filter(
+            FileStorage.filename.like("model-%.txt")
+        ).group_by(FileStorage.landmark, FileStorage.filename).all()
+    finally:
+        db.close()
+    versions = {}
+    for landmark, filename, timestamp, count, newest_id in rows:
+        match = FLOOR_FILE_PATTERN.match(filename)
+        if match:
+            versions[(landmark, match.group(2))] = (timestamp.isoformat() if timestamp else None, count, newest_id)
+    return versions
+
+
+class ModelFileWatch:
+    """
+    Tells a worker's cache which floors other workers changed: changed() re-reads
+    model_file_versions() at most every FLOOR_FILE_POLL_SECONDS and returns the
+    (landmark, floor) pairs whose version differs from the previous read. The first
+    call only records the versions, so call it before loading what it guards.
+    """
+
+    def __init__(self):
+        self._versions = None
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def changed(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._checked is not None and now - self._checked < FLOOR_FILE_POLL_SECONDS:
+                return []
+            self._checked = now
+        versions = model_file_versions()
+        with self._lock:
+            previous, self._versions = self._versions, versions
+        if previous is None:
+            return []
+        return [key for key in previous.keys() | versions.keys() if previous.get(key) != versions.get(key)]
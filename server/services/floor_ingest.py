@@ -0,0 +1,410 @@
+import io
+import os
+import re
+import time
+from datetime import datetime
+import numpy as np
+from config import SessionLocal
+from services.models import FileStorage, FloorArtifact
+from services import model_pool, floor_tables
+from services.utils import GRID_SIZE, CANVAS_WIDTH, CANVAS_HEIGHT, parse_model_content
+from services.floor_files import FLOOR_FILE_PATTERN
+
+# --- Ingest configuration ---
+# Build the static 3D layer (walls and floor slab GLB) of a floor when its base map is
+# uploaded. It takes seconds per floor, so it is off unless enabled here or per upload.
+INGEST_BUILD_3D = os.getenv("INGEST_BUILD_3D", "0") == "1"
+GRID_COLUMNS = CANVAS_WIDTH // GRID_SIZE
+GRID_ROWS = CANVAS_HEIGHT // GRID_SIZE
+
+# Artifact kinds, and the source file kind each is derived from
+GRAPH_ARTIFACT = "graph"     # compiled floor graph (.npz), from model-<floor>.txt
+CANVAS_ARTIFACT = "canvas"   # base map resized to the path image canvas (.png), from mapbase-<floor>.png
+LAYER_ARTIFACT = "layer"     # static 3D layer (.glb), from mapbase-<floor>.png
+NEAREST_ARTIFACT = "nearest" # nearest node of each kind from every cell (.npz), from model-<floor>.txt
+ARTIFACT_SOURCES = {GRAPH_ARTIFACT: "model", CANVAS_ARTIFACT: "mapbase", LAYER_ARTIFACT: "mapbase",
+                    NEAREST_ARTIFACT: "model"}
+SOURCE_FILENAMES = {"model": "model-{}.txt", "mapbase": "mapbase-{}.png"}
+
+# A path line's list of cells, "[(x, y), (x, y), ...]"
+_CELL = r"\(\s*-?\d+\s*,\s*-?\d+\s*\)"
+PATH_PATTERN = re.compile(rf"\[\s*(?:{_CELL}\s*(?:,\s*{_CELL}\s*)*,?\s*)?\]")
+NUMBER_PATTERN = re.compile(r"-?\d+")
+
+
+class IngestError(ValueError):
+    """Raised for an uploaded floor file that cannot be used; `errors` lists every problem found."""
+
+    def __init__(self, filename, errors):
+        super().__init__(f"Invalid {filename}: {errors[0]}" + (f" (and {len(errors) - 1} more)" if len(errors) > 1 else ""))
+        self.errors = errors
+
+
+class FloorGraph:
+    """
+    Compiled graph of one floor, built once when its model file is uploaded:
+      - cells: (V, 2) int array of the grid cells on any path or node
+      - edges: (E, 2) vertex pairs of neighbouring path cells, with lengths in cells
+      - nodes: {node_name: (x, y)} and node_vertex: {node_name: vertex}
+      - paths: the generated paths as lists of (x, y) cells, as in the model file
+    """
+
+    def __init__(self, cells, edges, lengths, node_names, node_vertices, path_offsets, path_vertices):
+        self.cells = cells
+        self.edges = edges
+        self.lengths = lengths
+        self.node_vertex = dict(zip(node_names, (int(v) for v in node_vertices)))
+        self.nodes = {name: (int(cells[v][0]), int(cells[v][1])) for name, v in self.node_vertex.items()}
+        self.path_offsets = path_offsets
+        self.path_vertices = path_vertices
+        self._csr = None
+
+    @property
+    def vertex_count(self):
+        return len(self.cells)
+
+    @property
+    def paths(self):
+        cells = [tuple(cell) for cell in self.cells.tolist()]
+        return [[cells[v] for v in self.path_vertices[start:end]]
+                for start, end in zip(self.path_offsets[:-1], self.path_offsets[1:])]
+
+    def csr(self):
+        """Symmetric scipy CSR matrix of edge lengths in cells (built on first use)."""
+        if self._csr is None:
+            from scipy.sparse import coo_matrix
+            rows = np.concatenate([self.edges[:, 0], self.edges[:, 1]])
+            cols = np.concatenate([self.edges[:, 1], self.edges[:, 0]])
+            weights = np.concatenate([self.lengths, self.lengths])
+            self._csr = coo_matrix((weights, (rows, cols)), shape=(self.vertex_count, self.vertex_count)).tocsr()
+        return self._csr
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, cells=self.cells, edges=self.edges, lengths=self.lengths,
+                            node_names=np.array(list(self.node_vertex), dtype=str),
+                            node_vertices=np.array(list(self.node_vertex.values()), dtype=np.int32),
+                            path_offsets=self.path_offsets, path_vertices=self.path_vertices)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, content):
+        arrays = np.load(io.BytesIO(content), allow_pickle=False)
+        return cls(arrays["cells"], arrays["edges"], arrays["lengths"], arrays["node_names"].tolist(),
+                   arrays["node_vertices"], arrays["path_offsets"], arrays["path_vertices"])
+
+
+def _read_text(content):
+    return content.decode("utf-8") if isinstance(content, bytes) else content
+
+def _on_grid(cell):
+    return 0 <= cell[0] < GRID_COLUMNS and 0 <= cell[1] < GRID_ROWS
+
+def validate_model(content):
+    """
+    Parse a model file strictly. Returns (nodes, paths, warnings); raises IngestError
+    listing every malformed line and every node or path cell outside the grid.
+    """
+    try:
+        lines = _read_text(content).splitlines()
+    except UnicodeDecodeError:
+        raise IngestError("model file", ["File is not UTF-8 text"])
+    nodes, paths, errors, warnings = {}, [], [], []
+    section = None
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if "Start and Goal Nodes" in line:
+            section = "nodes"
+            continue
+        elif "Generated Paths" in line:
+            section = "paths"
+            continue
+        if not line:
+            continue
+        if section == "nodes":
+            try:
+                node_info = line.split(", Location: ")
+                node_name = node_info[0].split(": ")[1]
+                location = tuple(map(int, node_info[1].strip("()").split(", ")))
+                if len(location) != 2 or not node_name:
+                    raise ValueError
+            except (IndexError, ValueError):
+                errors.append(f"Line {number}: expected 'Node: <name>, Location: (x, y)'")
+                continue
+            if not _on_grid(location):
+                errors.append(f"Line {number}: node '{node_name}' at {location} is outside the {GRID_COLUMNS}x{GRID_ROWS} grid")
+                continue
+            if node_name in nodes:
+                warnings.append(f"Line {number}: node '{node_name}' is listed again; this location replaces {nodes[node_name]}")
+            nodes[node_name] = location
+        elif section == "paths":
+            cells = line.split(": ", 1)[1].strip() if ": " in line else ""
+            if not PATH_PATTERN.fullmatch(cells) or cells.replace(" ", "") == "[]":
+                errors.append(f"Line {number}: expected 'Path: [(x, y), ...]'")
+                continue
+            numbers = list(map(int, NUMBER_PATTERN.findall(cells)))
+            path = list(zip(numbers[0::2], numbers[1::2]))
+            if not all(_on_grid(cell) for cell in path):
+                errors.append(f"Line {number}: path leaves the {GRID_COLUMNS}x{GRID_ROWS} grid")
+                continue
+            paths.append(path)
+        else:
+            errors.append(f"Line {number}: text before the 'Start and Goal Nodes:' section")
+    if not nodes and not errors:
+        errors.append("No nodes found (missing 'Start and Goal Nodes:' section)")
+    if errors:
+        raise IngestError("model file", errors)
+
+    cells = set(nodes.values())
+    ends = {cell for path in paths for cell in (path[0], path[-1])}
+    if not paths:
+        warnings.append("No generated paths; routes on this floor will not be found")
+    loose = [path for path in paths if path[0] not in cells or path[-1] not in cells]
+    if loose:
+        warnings.append(f"{len(loose)} paths do not start and end on nodes (e.g. {loose[0][0]} to {loose[0][-1]})")
+    unreached = sorted(name for name, cell in nodes.items() if cell not in ends)
+    if paths and unreached:
+        warnings.append(f"Nodes not reached by any path: {', '.join(unreached)}")
+    return nodes, paths, warnings
+
+def validate_base_map(content):
+    """Decode a base map image. Returns (image, warnings); raises IngestError if it is not an image."""
+    from PIL import Image
+    try:
+        image = Image.open(io.BytesIO(content))
+        image.load()
+    except Exception as e:
+        raise IngestError("base map", [f"Cannot decode image: {e}"])
+    warnings = []
+    width, height = image.size
+    if abs(width / height - CANVAS_WIDTH / CANVAS_HEIGHT) > 0.05:
+        warnings.append(f"Image is {width}x{height}; it is stretched to {CANVAS_WIDTH}x{CANVAS_HEIGHT} and the node grid may not line up")
+    return image, warnings
+
+def validate(filename, content):
+    """Validate an uploaded floor file before it is stored. Other files are not checked."""
+    match = FLOOR_FILE_PATTERN.match(filename or "")
+    if not match:
+        return []
+    if match.group(1) == "model":
+        return validate_model(content)[2]
+    return validate_base_map(content)[1]
+
+def compile_floor_graph(nodes, paths):
+    """Compile the nodes and paths of a floor into a FloorGraph."""
+    index = {}
+
+    def vertex(cell):
+        return index.setdefault(cell, len(index))
+
+    node_vertices = [vertex(cell) for cell in nodes.values()]
+    path_vertices = [vertex(cell) for path in paths for cell in path]
+    path_offsets = np.cumsum([0] + [len(path) for path in paths]).astype(np.int32)
+    cells = np.array(list(index), dtype=np.int32).reshape(-1, 2)
+
+    # Neighbouring cells along any path, each undirected pair once
+    sequence = np.array(path_vertices, dtype=np.int32)
+    consecutive = np.ones(len(sequence), dtype=bool)
+    consecutive[path_offsets[1:-1] - 1] = False   # no edge from the end of a path to the next path
+    pairs = np.stack([sequence[:-1], sequence[1:]], axis=1)[consecutive[:-1]] if len(sequence) > 1 else np.empty((0, 2), np.int32)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    edges = np.unique(np.sort(pairs, axis=1), axis=0).astype(np.int32).reshape(-1, 2)
+    delta = cells[edges[:, 0]] - cells[edges[:, 1]]
+    lengths = np.hypot(delta[:, 0], delta[:, 1]).astype(np.float32)
+    return FloorGraph(cells, edges, lengths, list(nodes), np.array(node_vertices, dtype=np.int32),
+                      path_offsets, sequence)
+
+def resize_base_map(image):
+    """The base map resized to the canvas of the path images, as PNG bytes."""
+    buffer = io.BytesIO()
+    image.convert("RGB").resize((CANVAS_WIDTH, CANVAS_HEIGHT)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+def submit_floor_layer(floor_name, image_bytes):
+    """
+    Start building the static 3D layer of a floor (walls and slab, no labels) on the model
+    worker pool. Returns the Future; raises model_pool.PoolSaturatedError when the pool is full.
+    """
+    from services.building_model import BUILDING_LOD, build_building_glb
+    timeout = model_pool.MODEL_TASK_TIMEOUT
+    return model_pool.submit(build_building_glb, {floor_name: (image_bytes, {})}, lod=BUILDING_LOD, timeout=timeout)
+
+def build_floor_layer(floor_name, image_bytes):
+    """The static 3D layer of a floor, waiting for the model worker pool."""
+    return model_pool.wait_result(submit_floor_layer(floor_name, image_bytes))
+
+def _on_layer_done(source, floor_name, started, future):
+    """Store a 3D layer built in the background for the file version it was built from."""
+    landmark_name = source[0]
+    if future.cancelled() or future.exception() is not None:
+        print(f"3D layer of '{landmark_name}' floor {floor_name} not built: "
+              f"{future.exception() if not future.cancelled() else 'cancelled'}")
+        return
+    try:
+        seconds = round(time.perf_counter() - started, 4)
+        _store_artifacts(source, floor_name, {LAYER_ARTIFACT: (future.result(), seconds)})
+        print(f"3D layer of '{landmark_name}' floor {floor_name} stored ({seconds:.2f}s)")
+    except Exception as e:
+        print(f"Error storing 3D layer of '{landmark_name}' floor {floor_name}:", e)
+
+def _store_artifacts(source, floor_name, artifacts):
+    """
+    Replace the stored artifacts of these kinds for the floor with the new versions.
+    source is the (landmark, id, timestamp) of the file version they were built from.
+    """
+    landmark_name, source_id, source_timestamp = source
+    db = SessionLocal()
+    try:
+        db.query(FloorArtifact).filter(
+            FloorArtifact.landmark == landmark_name,
+            FloorArtifact.floor == floor_name,
+            FloorArtifact.kind.in_(list(artifacts))
+        ).delete(synchronize_session=False)
+        for kind, (content, seconds) in artifacts.items():
+            db.add(FloorArtifact(landmark=landmark_name, floor=floor_name, kind=kind,
+                                 source_id=source_id, source_timestamp=source_timestamp,
+                                 content=content, build_seconds=seconds, timestamp=datetime.utcnow()))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def ingest(file_rec, build_3d=None, wait_3d=False):
+    """
+    Build and store the derived artifacts of an uploaded floor file:
+      - model-<floor>.txt: validated, compiled into a FloorGraph, written to the
+        floor/node/path/edge tables (see services/floor_tables.py), and the nearest lift,
+        stairs, exit, ... of every cell precomputed (see services/nearest_amenity.py)
+      - mapbase-<floor>.png: validated and resized to the canvas; optionally the static
+        3D layer is built too (build_3d, default INGEST_BUILD_3D), in the background on
+        the model worker pool and stored when it is done, or waited for with wait_3d
+    Artifacts are keyed to the file's id and timestamp, so readers only use them while
+    that version is the latest. Returns a report with the timing of every step.
+    """
+    kind, floor_name, _ = FLOOR_FILE_PATTERN.match(file_rec.filename).groups()
+    build_3d = INGEST_BUILD_3D if build_3d is None else build_3d
+    report = {"landmark": file_rec.landmark, "floor": floor_name, "file": file_rec.filename,
+              "version": file_rec.id, "steps": {}, "warnings": []}
+    artifacts = {}
+    source = (file_rec.landmark, file_rec.id, file_rec.timestamp)
+    total = time.perf_counter()
+
+    def step(name, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        report["steps"][name] = round(time.perf_counter() - start, 4)
+        return result
+
+    if kind == "model":
+        nodes, paths, report["warnings"] = step("validate", validate_model, file_rec.content)
+        graph = step(GRAPH_ARTIFACT, compile_floor_graph, nodes, paths)
+        artifacts[GRAPH_ARTIFACT] = (graph.to_bytes(), report["steps"][GRAPH_ARTIFACT])
+        report["graph"] = {"nodes": len(nodes), "paths": len(paths), "cells": graph.vertex_count, "edges": len(graph.edges)}
+        step("tables", floor_tables.save_floor, file_rec.landmark, floor_name, file_rec.id, file_rec.timestamp, nodes, paths)
+        from services import nearest_amenity
+        nearest = step(NEAREST_ARTIFACT, nearest_amenity.floor_table, graph)
+        artifacts[NEAREST_ARTIFACT] = (nearest.to_bytes(), report["steps"][NEAREST_ARTIFACT])
+    else:
+        image, report["warnings"] = step("validate", validate_base_map, file_rec.content)
+        artifacts[CANVAS_ARTIFACT] = (step(CANVAS_ARTIFACT, resize_base_map, image), report["steps"][CANVAS_ARTIFACT])
+        if build_3d:
+            try:
+                if wait_3d:
+                    layer = step(LAYER_ARTIFACT, build_floor_layer, floor_name, file_rec.content)
+                    artifacts[LAYER_ARTIFACT] = (layer, report["steps"][LAYER_ARTIFACT])
+                else:
+                    started = time.perf_counter()
+                    future = submit_floor_layer(floor_name, file_rec.content)
+                    future.add_done_callback(lambda f: _on_layer_done(source, floor_name, started, f))
+                    report["queued"] = [LAYER_ARTIFACT]
+            except model_pool.PoolSaturatedError:
+                report["warnings"].append("Worker pool busy; 3D layer not built")
+            except Exception as e:
+                report["warnings"].append(f"3D layer not built: {e}")
+
+    step("store", _store_artifacts, source, floor_name, artifacts)
+    report["artifacts"] = {name: len(content) for name, (content, _) in artifacts.items()}
+    report["seconds"] = round(time.perf_counter() - total, 4)
+    print(f"Ingested {file_rec.filename} for '{file_rec.landmark}' in {report['seconds']:.3f}s: {report['steps']}")
+    return report
+
+def load_artifact(landmark_name, floor_name, kind):
+    """
+    Content of a floor artifact built from the latest version of its source file,
+    or None when there is none (older uploads, or a failed build).
+    """
+    db = SessionLocal()
+    try:
+        source = db.query(FileStorage.id, FileStorage.timestamp).filter(
+            FileStorage.filename == SOURCE_FILENAMES[ARTIFACT_SOURCES[kind]].format(floor_name),
+            FileStorage.landmark == landmark_name
+        ).order_by(FileStorage.timestamp.desc()).first()
+        if source is None:
+            return None
+        artifact = db.query(FloorArtifact.content).filter(
+            FloorArtifact.landmark == landmark_name,
+            FloorArtifact.floor == floor_name,
+            FloorArtifact.kind == kind,
+            FloorArtifact.source_id == source.id,
+            FloorArtifact.source_timestamp == source.timestamp
+        ).first()
+        return artifact.content if artifact else None
+    finally:
+        db.close()
+
+def load_floor_graph(landmark_name, floor_name):
+    """
+    The FloorGraph of a floor: the compiled artifact of the latest model file, or the
+    model file compiled on the spot when it has none. None if the floor has no model.
+    """
+    content = load_artifact(landmark_name, floor_name, GRAPH_ARTIFACT)
+    if content is not None:
+        return FloorGraph.from_bytes(content)
+    db = SessionLocal()
+    try:
+        model_file = db.query(FileStorage).filter(
+            FileStorage.filename == SOURCE_FILENAMES["model"].format(floor_name),
+            FileStorage.landmark == landmark_name
+        ).order_by(FileStorage.timestamp.desc()).first()
+        if model_file is None:
+            return None
+        return compile_floor_graph(*parse_model_content(model_file.content))
+    finally:
+        db.close()
+
+def ingest_all(landmark_name=None, build_3d=None):
+    """
+    Ingest the latest version of every floor file (of one landmark), e.g. for files uploaded
+    before ingest existed. 3D layers are waited for, one floor at a time.
+    """
+    db = SessionLocal()
+    try:
+        # pick the latest version of each file by its metadata, then load only those rows
+        query = db.query(FileStorage.id, FileStorage.landmark, FileStorage.filename).filter(
+            FileStorage.filename.like("model-%.txt") | FileStorage.filename.like("mapbase-%.png"))
+        if landmark_name is not None:
+            query = query.filter(FileStorage.landmark == landmark_name)
+        latest = {}
+        for file_id, landmark, filename in query.order_by(FileStorage.timestamp.desc()).all():
+            if FLOOR_FILE_PATTERN.match(filename):
+                latest.setdefault((landmark, filename), file_id)
+        file_ids = list(latest.values())
+    finally:
+        db.close()
+    reports = []
+    for file_id in file_ids:
+        # one row (and its content) in memory at a time
+        db = SessionLocal()
+        try:
+            file_rec = db.query(FileStorage).get(file_id)
+        finally:
+            db.close()
+        if file_rec is None:
+            continue
+        try:
+            reports.append(ingest(file_rec, build_3d, wait_3d=True))
+        except IngestError as e:
+            print(f"{file_rec.landmark}/{file_rec.filename}: {e}")
+    return reports
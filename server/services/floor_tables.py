@@ -0,0 +1,213 @@
+import re
+import hashlib
+from math import hypot
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from config import SessionLocal
+from services.models import FileStorage, Floor, Node, FloorPath, Edge
+from services.utils import parse_model_content
+from services.floor_files import FLOOR_FILE_PATTERN
+
+# Node kinds. A kind can be given explicitly with a tag at the end of the node name in the
+# model file ("Node: Washroom 2 [restroom], Location: (x, y)"); otherwise it is derived from
+# the name: the first matching pattern wins, and anything else is a "room".
+NODE_KIND_TAG = re.compile(r"\[\s*([A-Za-z][\w-]*)\s*\]\s*$")
+NODE_KIND_PATTERNS = [
+    ("lift", re.compile(r"lift|elevator", re.IGNORECASE)),
+    ("stairs", re.compile(r"stair", re.IGNORECASE)),
+    ("exit", re.compile(r"exit|emergency", re.IGNORECASE)),
+    ("entrance", re.compile(r"entrance|gate", re.IGNORECASE)),
+    ("restroom", re.compile(r"restroom|toilet|washroom|\bwc\b", re.IGNORECASE)),
+]
+DEFAULT_NODE_KIND = "room"
+# Changes whenever the rules above do, so floor rows stored under older rules are rebuilt
+NODE_KINDS_VERSION = hashlib.sha1(repr((NODE_KIND_TAG.pattern, DEFAULT_NODE_KIND, [
+    (kind, pattern.pattern, pattern.flags) for kind, pattern in NODE_KIND_PATTERNS])).encode()).hexdigest()[:12]
+
+
+def node_kind(name):
+    tag = NODE_KIND_TAG.search(name)
+    if tag:
+        return tag.group(1).lower()
+    for kind, pattern in NODE_KIND_PATTERNS:
+        if pattern.search(name):
+            return kind
+    return DEFAULT_NODE_KIND
+
+def compress_path(path):
+    """
+    Split a path into straight runs of equal steps: [(x1, y1, x2, y2, steps)].
+    expand_path(path[0], runs) gives the path back.
+    """
+    runs = []
+    for a, b in zip(path[:-1], path[1:]):
+        step = (b[0] - a[0], b[1] - a[1])
+        if runs and runs[-1][1] == step:
+            runs[-1][2] += 1
+            runs[-1][3] = b
+        else:
+            runs.append([a, step, 1, b])
+    return [(a[0], a[1], end[0], end[1], steps) for a, _, steps, end in runs]
+
+def expand_path(start, runs):
+    """The cells of a path from its start cell and its runs (x1, y1, x2, y2, steps)."""
+    cells = [tuple(start)]
+    for x1, y1, x2, y2, steps in runs:
+        dx, dy = (x2 - x1) // steps, (y2 - y1) // steps
+        cells.extend((x1 + dx * i, y1 + dy * i) for i in range(1, steps + 1))
+    return cells
+
+def _delete_floor(db, floor):
+    for model in (Edge, FloorPath, Node):
+        db.query(model).filter(model.floor_id == floor.id).delete(synchronize_session=False)
+    db.delete(floor)
+
+def _write_floor(db, landmark_name, floor_name, source_id, source_timestamp, nodes, paths):
+    """Replace the rows of a floor with the nodes and paths of one model file version."""
+    floor = db.query(Floor).filter(Floor.landmark == landmark_name, Floor.name == floor_name).first()
+    if floor is not None:
+        _delete_floor(db, floor)
+        db.flush()
+    floor = Floor(landmark=landmark_name, name=floor_name, source_id=source_id, source_timestamp=source_timestamp,
+                  kinds_version=NODE_KINDS_VERSION)
+    db.add(floor)
+    db.flush()
+    if nodes:
+        db.execute(insert(Node), [
+            {"floor_id": floor.id, "name": name, "x": x, "y": y, "kind": node_kind(name)}
+            for name, (x, y) in nodes.items()
+        ])
+    path_rows, edge_rows = [], []
+    for number, path in enumerate(paths):
+        runs = compress_path(path)
+        path_rows.append({"floor_id": floor.id, "number": number,
+                          "start_x": path[0][0], "start_y": path[0][1], "end_x": path[-1][0], "end_y": path[-1][1],
+                          "length": sum(hypot(x2 - x1, y2 - y1) for x1, y1, x2, y2, _ in runs)})
+        edge_rows.extend({"floor_id": floor.id, "path": number, "seq": seq,
+                          "x1": x1, "y1": y1, "x2": x2, "y2": y2, "steps": steps}
+                         for seq, (x1, y1, x2, y2, steps) in enumerate(runs))
+    if path_rows:
+        db.execute(insert(FloorPath), path_rows)
+    if edge_rows:
+        db.execute(insert(Edge), edge_rows)
+    return floor
+
+def save_floor(landmark_name, floor_name, source_id, source_timestamp, nodes, paths):
+    """Store the rows of a floor from a parsed model file (called by the upload ingest)."""
+    db = SessionLocal()
+    try:
+        _write_floor(db, landmark_name, floor_name, source_id, source_timestamp, nodes, paths)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def _current_floors(db, landmark_name, floor_name=None):
+    """
+    {floor_name: Floor} for the model files of a landmark (or one floor), bringing the rows
+    up to date first: floors whose latest model is newer than their rows, or whose node
+    kinds were derived under other rules (NODE_KINDS_VERSION), are rebuilt from it, and
+    floors whose model files are gone are dropped.
+    """
+    query = db.query(FileStorage.id, FileStorage.filename, FileStorage.timestamp).filter(
+        FileStorage.landmark == landmark_name, FileStorage.filename.like("model-%.txt"))
+    if floor_name is not None:
+        query = query.filter(FileStorage.filename == f"model-{floor_name}.txt")
+    latest = {}
+    for source in query.order_by(FileStorage.timestamp.desc()).all():
+        match = FLOOR_FILE_PATTERN.match(source.filename)
+        if match and match.group(2) not in latest:
+            latest[match.group(2)] = source
+
+    floors = db.query(Floor).filter(Floor.landmark == landmark_name)
+    if floor_name is not None:
+        floors = floors.filter(Floor.name == floor_name)
+    floors = {floor.name: floor for floor in floors.all()}
+    stale = [name for name, source in latest.items() if name not in floors or
+             (floors[name].source_id, floors[name].source_timestamp, floors[name].kinds_version) !=
+             (source.id, source.timestamp, NODE_KINDS_VERSION)]
+    removed = [name for name in floors if name not in latest]
+    if not stale and not removed:
+        return floors
+
+    try:
+        for name in removed:
+            _delete_floor(db, floors.pop(name))
+        for name in stale:
+            source = latest[name]
+            content = db.query(FileStorage.content).filter(FileStorage.id == source.id).scalar()
+            nodes, paths = parse_model_content(content)
+            floors[name] = _write_floor(db, landmark_name, name, source.id, source.timestamp, nodes, paths)
+            print(f"Rebuilt navigation rows of floor '{name}' of '{landmark_name}'")
+        db.commit()
+    except IntegrityError:
+        # another request rebuilt the same floor first
+        db.rollback()
+        floors = db.query(Floor).filter(Floor.landmark == landmark_name)
+        if floor_name is not None:
+            floors = floors.filter(Floor.name == floor_name)
+        return {floor.name: floor for floor in floors.all()}
+    return floors
+
+def landmark_nodes(landmark_name, kind=None, name=None):
+    """
+    {floor_name: {node_name: (x, y)}} of a landmark, optionally only nodes of a kind or name
+    (then only floors with such nodes are included). None when the landmark has no model file.
+    """
+    db = SessionLocal()
+    try:
+        floors = _current_floors(db, landmark_name)
+        if not floors:
+            return None
+        query = db.query(Floor.name, Node.name, Node.x, Node.y).join(Node, Node.floor_id == Floor.id).filter(
+            Floor.id.in_([floor.id for floor in floors.values()]))
+        if kind is not None:
+            query = query.filter(Node.kind == kind)
+        if name is not None:
+            query = query.filter(Node.name == name)
+        result = {floor: {} for floor in floors} if kind is None and name is None else {}
+        for floor, node_name, x, y in query.order_by(Node.id).all():
+            result.setdefault(floor, {})[node_name] = (x, y)
+        return result
+    finally:
+        db.close()
+
+def floor_nodes(landmark_name, floor_name):
+    """{node_name: (x, y)} of one floor, or None when the floor has no model file."""
+    db = SessionLocal()
+    try:
+        floor = _current_floors(db, landmark_name, floor_name).get(floor_name)
+        if floor is None:
+            return None
+        rows = db.query(Node.name, Node.x, Node.y).filter(Node.floor_id == floor.id).order_by(Node.id).all()
+        return {name: (x, y) for name, x, y in rows}
+    finally:
+        db.close()
+
+def stored_path(landmark_name, floor_name, start, end):
+    """
+    Cells of the first generated path of a floor from cell `start` to cell `end`, or of one
+    from `end` to `start` reversed. None when the floor has no such path.
+    """
+    db = SessionLocal()
+    try:
+        floor = _current_floors(db, landmark_name, floor_name).get(floor_name)
+        if floor is None:
+            return None
+        for a, b, reverse in ((start, end, False), (end, start, True)):
+            path = db.query(FloorPath).filter(
+                FloorPath.floor_id == floor.id,
+                FloorPath.start_x == a[0], FloorPath.start_y == a[1],
+                FloorPath.end_x == b[0], FloorPath.end_y == b[1]
+            ).order_by(FloorPath.number).first()
+            if path is None:
+                continue
+            runs = db.query(Edge.x1, Edge.y1, Edge.x2, Edge.y2, Edge.steps).filter(
+                Edge.floor_id == floor.id, Edge.path == path.number).order_by(Edge.seq).all()
+            cells = expand_path((path.start_x, path.start_y), runs)
+            return cells[::-1] if reverse else cells
+        return None
+    finally:
+        db.close()
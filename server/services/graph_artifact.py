@@ -0,0 +1,575 @@
+import os
+import re
+import json
+import time
+import shutil
+import math
+import heapq
+import numpy as np
+from services import osmnx_compat
+
+# Directory holding one compiled artifact sub-directory per network type
+OUTDOOR_ARTIFACT_DIR = os.getenv(
+    "OUTDOOR_ARTIFACT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "artifacts", "outdoor")
+)
+ARTIFACT_VERSION = 2
+# Edge weights stored in every artifact: length in meters, time in minutes
+ROUTING_WEIGHTS = ("length", "time")
+EARTH_RADIUS_M = 6371008.8
+NODE_ARRAYS = ("node_osmid", "node_lat", "node_lon")
+EDGE_ARRAYS = ("indptr", "indices")
+
+# Way filters mirroring osmnx's network_type presets, used when building graphs from
+# raw OSM data (a local extract or cached Overpass responses) instead of querying Overpass.
+# Each entry maps a tag to a regex; a way is dropped when the tag's value matches.
+COMMON_EXCLUDE = {"area": "yes", "access": "private"}
+MODE_EXCLUDE = {
+    "drive": {
+        "highway": "abandoned|bridleway|bus_guideway|construction|corridor|cycleway|elevator|escalator|"
+                   "footway|path|pedestrian|planned|platform|proposed|raceway|service|steps|track",
+        "motor_vehicle": "no",
+        "motorcar": "no",
+        "service": "alley|driveway|emergency_access|parking|parking_aisle|private",
+    },
+    "walk": {
+        "highway": "abandoned|bus_guideway|construction|cycleway|motor|planned|platform|proposed|raceway",
+        "foot": "no",
+        "service": "private",
+    },
+    "bike": {
+        "highway": "abandoned|bus_guideway|construction|corridor|elevator|escalator|footway|motor|"
+                   "planned|platform|proposed|raceway|steps",
+        "bicycle": "no",
+        "service": "private",
+    },
+}
+BIDIRECTIONAL_MODES = ("walk",)
+# A shared artifact holds the union of several modes' edges, each tagged with a bitmask
+# of the modes allowed on it (see merge_mode_graphs and CompiledGraph.for_mode).
+SHARED_GRAPH = "shared"
+MODE_BITS = {"walk": 1, "bike": 2, "drive": 4}
+
+
+def _unit_vectors(lat, lon):
+    """3D unit vectors for latitude/longitude in degrees (scalars or arrays)."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+class CompiledGraph:
+    """
+    Array form of an outdoor routing graph:
+      - node_osmid / node_lat / node_lon: one entry per node
+      - indptr / indices: CSR adjacency (edges leaving node i are indices[indptr[i]:indptr[i+1]])
+      - weights: per-edge arrays aligned with indices: weights["length"] in meters and
+        weights["time"] in minutes
+      - mode_mask (shared graphs only): per-edge bitmask of the modes allowed on it
+    Parallel OSM edges are collapsed, keeping the smallest value of each weight.
+    A mode view of a shared graph (for_mode) keeps the shared arrays and only uses the
+    edges whose mask has its bit.
+    """
+
+    def __init__(self, arrays, meta):
+        self.node_osmid = arrays["node_osmid"]
+        self.node_lat = arrays["node_lat"]
+        self.node_lon = arrays["node_lon"]
+        self.indptr = arrays["indptr"]
+        self.indices = arrays["indices"]
+        self.weights = {name: arrays[name] for name in meta.get("weights", ["length"])}
+        self.mode_mask = arrays.get("mode_mask")
+        self.meta = meta
+        self.parent = None      # shared graph this is a mode view of
+        self.mode_bit = None
+        self._allowed = None
+        self._csr = {}
+        self._node_index = None
+        self._kdtree = None
+        self._tree_nodes = None
+        self._adjacency = {}
+        self._speed = {}
+
+    def for_mode(self, mode):
+        """
+        The graph of one network type inside a shared graph: same node and edge arrays
+        (nothing is copied), restricted to the edges whose mode_mask has the mode's bit.
+        """
+        if self.mode_mask is None or mode not in self.meta.get("modes", []):
+            raise ValueError(f"Graph has no '{mode}' edges")
+        arrays = {name: getattr(self, name) for name in NODE_ARRAYS + EDGE_ARRAYS}
+        arrays["mode_mask"] = self.mode_mask
+        weights = [name for name in ROUTING_WEIGHTS if f"{name}_{mode}" in self.weights]
+        arrays.update({name: self.weights[f"{name}_{mode}"] for name in weights})
+        view = CompiledGraph(arrays, dict(self.meta, mode=mode, weights=weights))
+        view.parent, view.mode_bit = self, MODE_BITS[mode]
+        return view
+
+    @property
+    def allowed(self):
+        """Boolean array of the edges this graph may use, or None when it may use all of them."""
+        if self.mode_bit is None:
+            return None
+        if self._allowed is None:
+            self._allowed = (np.asarray(self.mode_mask) & self.mode_bit) != 0
+        return self._allowed
+
+    @property
+    def node_count(self):
+        return len(self.node_osmid)
+
+    @property
+    def edge_count(self):
+        return len(self.indices) if self.allowed is None else int(np.count_nonzero(self.allowed))
+
+    def _edge_sources(self):
+        return np.repeat(np.arange(self.node_count), np.diff(self.indptr))
+
+    def csr(self, weight):
+        """
+        scipy.sparse CSR matrix for one weight (cached; shares the underlying arrays).
+        A weight the graph does not have counts every edge as 1, like networkx does
+        for a missing edge attribute. In a mode view, edges closed to the mode weigh
+        inf in the mode's own weight arrays, so scipy's searches never take them and
+        the shared memory-mapped arrays are used without a copy.
+        """
+        if weight not in self._csr:
+            from scipy.sparse import csr_matrix
+            data = self.weights.get(weight)
+            if data is None:
+                data = np.ones(len(self.indices), dtype=np.float64)
+                if self.allowed is not None:
+                    data[~self.allowed] = np.inf
+            self._csr[weight] = csr_matrix((data, self.indices, self.indptr),
+                                           shape=(self.node_count, self.node_count))
+        return self._csr[weight]
+
+    @property
+    def kdtree(self):
+        """
+        KD-tree over the nodes as points on the unit sphere, built once per graph.
+        Straight-line (chord) distance there orders nodes exactly like great-circle distance.
+        Mode views only index the nodes their mode's edges touch.
+        """
+        if self._kdtree is None:
+            from scipy.spatial import cKDTree
+            if self.allowed is None:
+                self._kdtree = cKDTree(_unit_vectors(self.node_lat, self.node_lon))
+            else:
+                used = np.zeros(self.node_count, dtype=bool)
+                used[self._edge_sources()[self.allowed]] = True
+                used[np.asarray(self.indices)[self.allowed]] = True
+                self._tree_nodes = np.flatnonzero(used)
+                self._kdtree = cKDTree(_unit_vectors(np.asarray(self.node_lat)[self._tree_nodes],
+                                                     np.asarray(self.node_lon)[self._tree_nodes]))
+        return self._kdtree
+
+    def nearest_node(self, lat, lon):
+        """Array index of the node closest to (lat, lon), by great-circle distance."""
+        return int(self.nearest_nodes([lat], [lon])[0])
+
+    def nearest_nodes(self, lats, lons):
+        """Vectorised nearest_node for arrays of coordinates."""
+        _, indices = self.kdtree.query(_unit_vectors(np.asarray(lats), np.asarray(lons)))
+        if self._tree_nodes is not None:
+            indices = self._tree_nodes[indices]
+        return indices.astype(np.int64)
+
+    def shortest_path(self, source, target, weight):
+        """
+        Dijkstra from source to target (array indices).
+        Returns (list of node indices, total weight), or (None, inf) if target is unreachable.
+        """
+        from scipy.sparse.csgraph import dijkstra
+        dist, predecessors = dijkstra(self.csr(weight), directed=True, indices=source, return_predecessors=True)
+        if not np.isfinite(dist[target]):
+            return None, float("inf")
+        path = [target]
+        while path[-1] != source:
+            path.append(int(predecessors[path[-1]]))
+        path.reverse()
+        return path, float(dist[target])
+
+    def cost_matrix(self, sources, targets, weight):
+        """
+        Shortest-path costs from every source node to every target node (array indices),
+        with one multi-source Dijkstra over the distinct sources. Returns a
+        len(sources) x len(targets) array with inf where there is no route.
+        """
+        from scipy.sparse.csgraph import dijkstra
+        unique, rows = np.unique(np.asarray(sources, dtype=np.int64), return_inverse=True)
+        dist = dijkstra(self.csr(weight), directed=True, indices=unique)
+        return dist[np.ix_(rows, np.asarray(targets, dtype=np.int64))]
+
+    def _lists(self, weight, reverse=False):
+        """
+        (indptr, indices, weights) as Python lists for the search loop, forward or reversed.
+        Mode views apply their mask here, so astar only walks the mode's edges.
+        """
+        key = (weight, reverse)
+        if key not in self._adjacency:
+            matrix = self.csr(weight)
+            if self.allowed is not None:
+                from scipy.sparse import csr_matrix
+                indptr = np.zeros(self.node_count + 1, dtype=np.int64)
+                np.cumsum(np.bincount(self._edge_sources()[self.allowed], minlength=self.node_count), out=indptr[1:])
+                matrix = csr_matrix((np.asarray(matrix.data)[self.allowed], np.asarray(matrix.indices)[self.allowed],
+                                     indptr), shape=matrix.shape)
+            if reverse:
+                matrix = matrix.transpose().tocsr()
+            self._adjacency[key] = (matrix.indptr.tolist(), matrix.indices.tolist(), matrix.data.tolist())
+        return self._adjacency[key]
+
+    def _radians(self):
+        """Node latitudes, longitudes (radians) and cos(latitude) as Python lists."""
+        if self.parent is not None:
+            return self.parent._radians()
+        if "radians" not in self._adjacency:
+            lat = np.radians(np.asarray(self.node_lat))
+            self._adjacency["radians"] = (lat.tolist(), np.radians(np.asarray(self.node_lon)).tolist(),
+                                          np.cos(lat).tolist())
+        return self._adjacency["radians"]
+
+    def heuristic_scale(self, weight):
+        """
+        Factor turning a great-circle distance in meters into a lower bound of `weight`:
+        1 for length, 1 / (fastest edge speed) for time, 0 (no heuristic) otherwise.
+        """
+        if weight not in self._speed:
+            if weight == "length":
+                self._speed[weight] = 1.0
+            elif weight == "time" and "time" in self.weights:
+                minutes = np.asarray(self.weights["time"])
+                usable = np.isfinite(minutes) & (minutes > 0)
+                speeds = np.asarray(self.weights["length"])[usable] / minutes[usable]
+                self._speed[weight] = 1.0 / speeds.max() if len(speeds) else 0.0
+            else:
+                self._speed[weight] = 0.0
+        return self._speed[weight]
+
+    def astar(self, source, target, weight):
+        """
+        Bidirectional A* between two node indices with a haversine heuristic, using the
+        average of the forward and backward potentials so both searches stay consistent.
+        Returns (list of node indices or None, total weight, number of settled nodes).
+        """
+        if source == target:
+            return [source], 0.0, 1
+        scale = self.heuristic_scale(weight)
+        lat, lon, cos_lat = self._radians()
+        potentials = {}
+
+        def great_circle(u, v):
+            a = (math.sin((lat[v] - lat[u]) / 2) ** 2
+                 + cos_lat[u] * cos_lat[v] * math.sin((lon[v] - lon[u]) / 2) ** 2)
+            return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+        def potential(v):
+            # forward potential; the backward search uses its negation
+            if v not in potentials:
+                potentials[v] = 0.0 if not scale else scale * (great_circle(v, target) - great_circle(source, v)) / 2
+            return potentials[v]
+
+        graphs = (self._lists(weight), self._lists(weight, reverse=True))
+        dist = ({source: 0.0}, {target: 0.0})
+        parent = ({source: None}, {target: None})
+        settled = (set(), set())
+        heaps = ([(potential(source), source)], [(-potential(target), target)])
+        best, meeting = float("inf"), None
+
+        while heaps[0] and heaps[1]:
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            sign = 1.0 if side == 0 else -1.0
+            _, u = heapq.heappop(heaps[side])
+            if u in settled[side]:
+                continue
+            settled[side].add(u)
+            indptr, indices, data = graphs[side]
+            for position in range(indptr[u], indptr[u + 1]):
+                v = indices[position]
+                candidate = dist[side][u] + data[position]
+                if candidate < dist[side].get(v, float("inf")):
+                    dist[side][v] = candidate
+                    parent[side][v] = u
+                    heapq.heappush(heaps[side], (candidate + sign * potential(v), v))
+                    if v in dist[1 - side] and candidate + dist[1 - side][v] < best:
+                        best, meeting = candidate + dist[1 - side][v], v
+
+        settled_count = len(settled[0]) + len(settled[1])
+        if meeting is None:
+            return None, float("inf"), settled_count
+        path = [meeting]
+        while parent[0][path[-1]] is not None:
+            path.append(parent[0][path[-1]])
+        path.reverse()
+        while parent[1][path[-1]] is not None:
+            path.append(parent[1][path[-1]])
+        return path, best, settled_count
+
+    def node_index(self, osmid):
+        """Array index of an OSM node id."""
+        if self.parent is not None:
+            return self.parent.node_index(osmid)
+        if self._node_index is None:
+            self._node_index = {int(n): i for i, n in enumerate(self.node_osmid)}
+        return self._node_index[int(osmid)]
+
+    def edge_weight(self, u, v, weight):
+        """Weight of the edge u -> v (array indices), or None if there is no such edge."""
+        start, end = self.indptr[u], self.indptr[u + 1]
+        hits = start + np.nonzero(self.indices[start:end] == v)[0]
+        if self.allowed is not None:
+            hits = hits[self.allowed[hits]]
+        if not len(hits):
+            return None
+        return float(np.min(np.asarray(self.weights[weight])[hits]))
+
+    def path_weight(self, path, weight):
+        """Sum of one weight along a path of node indices."""
+        return sum(self.edge_weight(u, v, weight) for u, v in zip(path[:-1], path[1:]))
+
+
+def compile_graph(graph, mode, bbox, source, weights=ROUTING_WEIGHTS, region=None):
+    """
+    Convert an osmnx MultiDiGraph into a CompiledGraph (of one region tile, when given).
+    """
+    osmids = np.fromiter(graph.nodes, dtype=np.int64, count=len(graph))
+    index = {int(n): i for i, n in enumerate(osmids)}
+    lat = np.array([graph.nodes[n]["y"] for n in graph.nodes], dtype=np.float64)
+    lon = np.array([graph.nodes[n]["x"] for n in graph.nodes], dtype=np.float64)
+
+    # Collapse parallel edges and self loops, keeping the smallest value per weight.
+    best = {}
+    for u, v, data in graph.edges(data=True):
+        if u == v:
+            continue
+        key = (index[u], index[v])
+        values = [float(data.get(w, np.inf)) for w in weights]
+        if key in best:
+            values = [min(a, b) for a, b in zip(values, best[key])]
+        best[key] = values
+
+    pairs = sorted(best)
+    sources = np.array([u for u, _ in pairs], dtype=np.int64)
+    indices = np.array([v for _, v in pairs], dtype=np.int32)
+    indptr = np.zeros(len(osmids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=len(osmids)), out=indptr[1:])
+
+    arrays = {"node_osmid": osmids, "node_lat": lat, "node_lon": lon, "indptr": indptr, "indices": indices}
+    for position, name in enumerate(weights):
+        arrays[name] = np.array([best[key][position] for key in pairs], dtype=np.float64)
+
+    meta = {
+        "version": ARTIFACT_VERSION,
+        "mode": mode,
+        "bbox": list(bbox),
+        "source": source,
+        "weights": list(weights),
+        "node_count": int(len(osmids)),
+        "edge_count": int(len(indices)),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    if region is not None:
+        meta["region"] = region
+    return CompiledGraph(arrays, meta)
+
+
+def stitch_graphs(graphs):
+    """
+    Merge the compiled graphs of adjacent region tiles into one CompiledGraph.
+    Nodes are matched by OSM id, so roads crossing a tile border join up wherever the
+    tiles share nodes (tiles are truncated by edge, so a border road is in both).
+    Edges present in several tiles are kept once, with the smallest value of each weight.
+    Tiles that are mode views of shared graphs only contribute their mode's edges.
+    """
+    weights = [w for w in graphs[0].weights if all(w in g.weights for g in graphs)]
+    osmids = np.concatenate([g.node_osmid for g in graphs])
+    unique, first, inverse = np.unique(osmids, return_index=True, return_inverse=True)
+    lat = np.concatenate([g.node_lat for g in graphs])[first]
+    lon = np.concatenate([g.node_lon for g in graphs])[first]
+
+    sources, targets, values, offset = [], [], {w: [] for w in weights}, 0
+    for g in graphs:
+        keep = slice(None) if g.allowed is None else g.allowed
+        local = inverse[offset:offset + g.node_count]
+        sources.append(local[g._edge_sources()][keep])
+        targets.append(local[np.asarray(g.indices)][keep])
+        for w in weights:
+            values[w].append(np.asarray(g.weights[w])[keep])
+        offset += g.node_count
+    sources, targets = np.concatenate(sources), np.concatenate(targets)
+    values = {w: np.concatenate(arrays) for w, arrays in values.items()}
+
+    # Sort by (source, target) and keep the minimum of each run of duplicate edges
+    order = np.lexsort((targets, sources))
+    sources, targets = sources[order], targets[order]
+    starts = np.flatnonzero(np.r_[True, (np.diff(sources) != 0) | (np.diff(targets) != 0)])
+    arrays = {
+        "node_osmid": unique, "node_lat": lat, "node_lon": lon,
+        "indices": targets[starts].astype(np.int32),
+        "indptr": np.zeros(len(unique) + 1, dtype=np.int64),
+    }
+    np.cumsum(np.bincount(sources[starts], minlength=len(unique)), out=arrays["indptr"][1:])
+    for w in weights:
+        arrays[w] = np.minimum.reduceat(values[w][order], starts)
+
+    boxes = [g.meta["bbox"] for g in graphs]
+    meta = dict({k: v for k, v in graphs[0].meta.items() if k != "modes"},
+                region="+".join(g.meta.get("region", "") for g in graphs),
+                bbox=[max(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), min(b[3] for b in boxes)],
+                source="stitched", weights=weights,
+                node_count=int(len(unique)), edge_count=int(len(starts)))
+    return CompiledGraph(arrays, meta)
+
+
+def merge_mode_graphs(graphs):
+    """
+    Merge {mode: CompiledGraph} of the same area into one shared graph: the union of
+    their nodes and edges, a mode_mask bit per mode allowed on each edge, and per-mode
+    weight arrays ("length_<mode>", "time_<mode>") holding inf where the mode is not allowed.
+    """
+    modes = list(graphs)
+    weights = [w for w in ROUTING_WEIGHTS if all(w in g.weights for g in graphs.values())]
+    osmids = np.unique(np.concatenate([g.node_osmid for g in graphs.values()]))
+    lat, lon = np.empty(len(osmids)), np.empty(len(osmids))
+    entries = {}   # (source, target) -> [mode bits, {(weight, mode): value}]
+    for mode, g in graphs.items():
+        local = np.searchsorted(osmids, g.node_osmid)
+        lat[local], lon[local] = g.node_lat, g.node_lon
+        values = [np.asarray(g.weights[w]).tolist() for w in weights]
+        for position, (u, v) in enumerate(zip(local[g._edge_sources()].tolist(), local[np.asarray(g.indices)].tolist())):
+            entry = entries.setdefault((u, v), [0, {}])
+            entry[0] |= MODE_BITS[mode]
+            for w, column in zip(weights, values):
+                entry[1][(w, mode)] = column[position]
+
+    keys = sorted(entries)
+    indptr = np.zeros(len(osmids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(np.array([k[0] for k in keys], dtype=np.int64), minlength=len(osmids)), out=indptr[1:])
+    arrays = {
+        "node_osmid": osmids, "node_lat": lat, "node_lon": lon, "indptr": indptr,
+        "indices": np.array([k[1] for k in keys], dtype=np.int32),
+        "mode_mask": np.array([entries[k][0] for k in keys], dtype=np.uint8),
+    }
+    for mode in modes:
+        for w in weights:
+            arrays[f"{w}_{mode}"] = np.array([entries[k][1].get((w, mode), np.inf) for k in keys], dtype=np.float64)
+
+    first = graphs[modes[0]].meta
+    meta = {
+        "version": ARTIFACT_VERSION,
+        "mode": SHARED_GRAPH,
+        "modes": modes,
+        "bbox": first["bbox"],
+        "source": first["source"],
+        "weights": [f"{w}_{mode}" for mode in modes for w in weights],
+        "node_count": int(len(osmids)),
+        "edge_count": int(len(keys)),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    if "region" in first:
+        meta["region"] = first["region"]
+    return CompiledGraph(arrays, meta)
+
+
+def artifact_path(mode, base_dir=OUTDOOR_ARTIFACT_DIR, region=None):
+    """<base_dir>/<mode> for the default region, <base_dir>/regions/<region>/<mode> for other tiles."""
+    if region is None:
+        return os.path.join(base_dir, mode)
+    return os.path.join(base_dir, "regions", region, mode)
+
+
+def save_artifact(compiled, directory):
+    """
+    Write a CompiledGraph as one .npy file per array plus meta.json.
+    The directory is written next to the target and swapped in, so readers never
+    see a half-written artifact.
+    """
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    staging = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    arrays = {"node_osmid": compiled.node_osmid, "node_lat": compiled.node_lat, "node_lon": compiled.node_lon,
+              "indptr": compiled.indptr, "indices": compiled.indices, **compiled.weights}
+    if compiled.mode_mask is not None:
+        arrays["mode_mask"] = compiled.mode_mask
+    for name, array in arrays.items():
+        np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(staging, "meta.json"), "w") as file:
+        json.dump(compiled.meta, file, indent=2)
+
+    previous = f"{directory}.old-{os.getpid()}"
+    if os.path.exists(directory):
+        os.replace(directory, previous)
+    os.replace(staging, directory)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def load_artifact(directory, mmap=True):
+    """
+    Load a compiled graph artifact. With mmap=True the arrays are memory-mapped
+    read-only, so loading is near-instant and pages are shared between workers.
+    Returns None if the directory has no artifact.
+    """
+    meta_path = os.path.join(directory, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as file:
+        meta = json.load(file)
+    if meta.get("version") != ARTIFACT_VERSION:
+        print(f"Ignoring outdoor graph artifact {directory}: version {meta.get('version')} != {ARTIFACT_VERSION}")
+        return None
+    arrays = {}
+    names = NODE_ARRAYS + EDGE_ARRAYS + tuple(meta.get("weights", ["length"]))
+    for name in names + (("mode_mask",) if meta.get("modes") else ()):
+        arrays[name] = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None)
+    return CompiledGraph(arrays, meta)
+
+
+def _way_allowed(tags, mode):
+    if "highway" not in tags:
+        return False
+    for excludes in (COMMON_EXCLUDE, MODE_EXCLUDE[mode]):
+        for tag, pattern in excludes.items():
+            if tag in tags and re.search(pattern, tags[tag]):
+                return False
+    return True
+
+
+def load_osm_elements(osm_file=None, cache_dir=None):
+    """
+    Read raw OSM elements either from a local .osm XML extract or from the Overpass
+    JSON responses cached by osmnx (server/cache). Elements are de-duplicated.
+    """
+    responses = []
+    if osm_file:
+        responses.append({"elements": osmnx_compat.read_osm_file(osm_file)})
+    if cache_dir:
+        for filename in sorted(os.listdir(cache_dir)):
+            if filename.endswith(".json"):
+                with open(os.path.join(cache_dir, filename)) as file:
+                    response = json.load(file)
+                if isinstance(response, dict) and "elements" in response:
+                    responses.append(response)
+    elements = {}
+    for response in responses:
+        for element in response["elements"]:
+            elements[(element["type"], element["id"])] = element
+    return list(elements.values())
+
+
+def graph_from_osm_elements(elements, mode, bbox):
+    """
+    Build an osmnx graph for one network type from raw OSM elements, following the
+    same steps as ox.graph_from_bbox: filter ways, build, truncate, simplify and keep
+    the largest connected component.
+    """
+    ways = [e for e in elements if e["type"] == "way" and _way_allowed(e.get("tags", {}), mode)]
+    used = {node for way in ways for node in way.get("nodes", [])}
+    nodes = [e for e in elements if e["type"] == "node" and e["id"] in used]
+    graph = osmnx_compat.graph_from_elements(nodes, ways, bidirectional=mode in BIDIRECTIONAL_MODES)
+    graph = osmnx_compat.truncate_bbox(graph, bbox)
+    graph = osmnx_compat.simplify(graph)
+    return osmnx_compat.largest_component(graph)
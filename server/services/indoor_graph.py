@@ -0,0 +1,170 @@
+import os
+import re
+import time
+import threading
+from config import SessionLocal
+from services.models import FileStorage
+from services import floor_ingest
+from services.floor_files import FLOOR_FILE_PATTERN, ModelFileWatch, floor_sort_key
+
+# --- Indoor graph configuration ---
+INDOOR_CELL_METERS = float(os.getenv("INDOOR_CELL_METERS", "0.5"))              # size of one path grid cell
+INDOOR_FLOOR_CHANGE_METERS = float(os.getenv("INDOOR_FLOOR_CHANGE_METERS", "8"))  # cost of one floor by lift/stairs
+# Nodes whose name matches ENTRANCE_NODE_PATTERN join the building to the outdoor graph.
+# Buildings without such a node use the lifts and stairs of their lowest floor instead.
+ENTRANCE_NODE_PATTERN = re.compile(os.getenv("ENTRANCE_NODE_PATTERN", r"entrance|exit|gate"), re.IGNORECASE)
+CONNECTOR_NODE_PATTERN = re.compile(r"lift|stairs", re.IGNORECASE)
+
+# landmark -> BuildingGraph, dropped by invalidate() when a floor file changes here, or
+# when _watch notices that another worker changed one
+_buildings = {}
+_generation = 0   # bumped by invalidate(), so a graph loaded meanwhile is not cached
+_watch = ModelFileWatch()
+_lock = threading.Lock()
+
+
+class BuildingGraph:
+    """
+    Walkable graph of one building, built from the compiled graphs of its floors
+    (see services/floor_ingest.py), i.e. the cells of every generated path:
+      - vertices: (floor, x, y) grid cells; vertex(floor, cell) gives the index
+        (find_vertex(floor, cell) None for a cell off the paths)
+      - csr: scipy CSR matrix of edge lengths in meters (consecutive path cells, plus
+        lifts and stairs with the same name on neighbouring floors)
+      - nodes: {floor: {node_name: (x, y)}}
+      - entrances: [(floor, node_name)] joined to the outdoor graph
+    """
+
+    def __init__(self, landmark, floors):
+        from scipy.sparse import coo_matrix
+
+        self.landmark = landmark
+        self.nodes = {floor: graph.nodes for floor, graph in floors.items()}
+        self.vertices = []
+        self._index = {}
+        rows, cols, lengths = [], [], []
+
+        def add_edge(u, v, length):
+            rows.extend((u, v))
+            cols.extend((v, u))
+            lengths.extend((length, length))
+
+        for floor, graph in floors.items():
+            # A floor graph's cells are unique, so they take consecutive vertex indices
+            offset = len(self.vertices)
+            for cell in graph.cells.tolist():
+                self._add_vertex(floor, cell)
+            edges = graph.edges + offset
+            meters = (graph.lengths * INDOOR_CELL_METERS).tolist()
+            rows.extend(edges[:, 0].tolist() + edges[:, 1].tolist())
+            cols.extend(edges[:, 1].tolist() + edges[:, 0].tolist())
+            lengths.extend(meters + meters)
+
+        # Lifts and stairs with the same name link consecutive floors (floors without a
+        # model file in between, e.g. 3 -> 6, cost one floor change per storey)
+        ordered = sorted(self.nodes, key=floor_sort_key)
+        for lower, upper in zip(ordered[:-1], ordered[1:]):
+            lower_key, upper_key = floor_sort_key(lower), floor_sort_key(upper)
+            storeys = max(1.0, upper_key[1] - lower_key[1]) if lower_key[0] == upper_key[0] == 0 else 1.0
+            upper_connectors = {_normalise(name): cell for name, cell in self.nodes[upper].items()
+                                if CONNECTOR_NODE_PATTERN.search(name)}
+            for name, cell in self.nodes[lower].items():
+                match = upper_connectors.get(_normalise(name))
+                if match is not None:
+                    add_edge(self.vertex(lower, cell), self.vertex(upper, match), INDOOR_FLOOR_CHANGE_METERS * storeys)
+
+        count = len(self.vertices)
+        # duplicate edges are summed by tocsr(), so keep only the shortest of each pair first
+        shortest = {}
+        for u, v, length in zip(rows, cols, lengths):
+            if length < shortest.get((u, v), float("inf")):
+                shortest[(u, v)] = length
+        pairs = list(shortest)
+        self.csr = coo_matrix(([shortest[p] for p in pairs], ([p[0] for p in pairs], [p[1] for p in pairs])),
+                              shape=(count, count)).tocsr()
+
+        self.entrances = [(floor, name) for floor in ordered for name in self.nodes[floor]
+                          if ENTRANCE_NODE_PATTERN.search(name)]
+        if not self.entrances and ordered:
+            self.entrances = [(ordered[0], name) for name in self.nodes[ordered[0]]
+                              if CONNECTOR_NODE_PATTERN.search(name)]
+
+    def _add_vertex(self, floor, cell):
+        key = (floor, int(cell[0]), int(cell[1]))
+        index = self._index.get(key)
+        if index is None:
+            index = self._index[key] = len(self.vertices)
+            self.vertices.append(key)
+        return index
+
+    @property
+    def vertex_count(self):
+        return len(self.vertices)
+
+    def vertex(self, floor, cell):
+        """Vertex index of a grid cell on a floor."""
+        return self._index[(floor, int(cell[0]), int(cell[1]))]
+
+    def find_vertex(self, floor, cell):
+        """Vertex index of a grid cell on a floor, or None if no path crosses it."""
+        return self._index.get((floor, int(cell[0]), int(cell[1])))
+
+    def node_vertex(self, floor, node_name):
+        """Vertex index of a named node, or None if the floor has no such node."""
+        cell = self.nodes.get(floor, {}).get(node_name)
+        return None if cell is None else self.vertex(floor, cell)
+
+
+def _normalise(name):
+    return " ".join(name.lower().split())
+
+def load_building_graph(landmark_name):
+    """Build the BuildingGraph of a landmark from the compiled graph of each floor's latest model, or None."""
+    db = SessionLocal()
+    try:
+        filenames = db.query(FileStorage.filename).filter(
+            FileStorage.filename.like("model-%.txt"),
+            FileStorage.landmark == landmark_name
+        ).distinct().all()
+    finally:
+        db.close()
+    floors = {}
+    for (filename,) in filenames:
+        match = FLOOR_FILE_PATTERN.match(filename)
+        if match:
+            graph = floor_ingest.load_floor_graph(landmark_name, match.group(2))
+            if graph is not None:
+                floors[match.group(2)] = graph
+    if not floors:
+        return None
+    start = time.perf_counter()
+    graph = BuildingGraph(landmark_name, floors)
+    print(f"Built indoor graph for '{landmark_name}' ({graph.vertex_count} cells, {len(floors)} floors) "
+          f"in {time.perf_counter() - start:.2f}s")
+    return graph
+
+def get_building_graph(landmark_name):
+    """
+    Return the cached BuildingGraph of a landmark (None if it has no model files; that is
+    not cached, so the first upload of a landmark is picked up by the next call).
+    """
+    for landmark, _ in _watch.changed():
+        invalidate(landmark)
+    if landmark_name in _buildings:
+        return _buildings[landmark_name]
+    generation = _generation
+    graph = load_building_graph(landmark_name)
+    with _lock:
+        if graph is not None and generation == _generation:
+            _buildings[landmark_name] = graph
+    return graph
+
+def invalidate(landmark_name=None):
+    """Forget the cached graph of one landmark (or of every landmark)."""
+    global _generation
+    with _lock:
+        _generation += 1
+        if landmark_name is None:
+            _buildings.clear()
+        else:
+            _buildings.pop(landmark_name, None)
@@ -0,0 +1,207 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from services import outdoor_graph, landmark_index, indoor_graph, closures
+from services.graph_artifact import EARTH_RADIUS_M
+from services.route_geometry import encode_polyline
+
+# Speed used for every indoor leg, whatever the outdoor mode (meters per minute)
+INDOOR_WALK_SPEED = outdoor_graph.MODE_SPEEDS["walk"] * 1000.0 / 60.0
+STITCH_CACHE_SIZE = int(os.getenv("STITCH_CACHE_SIZE", "16"))   # stitched graphs kept in memory
+
+# (mode, optimizer, outdoor graph, buildings, snaps, closures) -> _StitchedGraph, least recently used first
+_stitched = OrderedDict()
+_lock = threading.Lock()
+
+
+class JourneyError(ValueError):
+    """Raised for journey endpoints that do not exist or cannot be joined."""
+
+
+def _haversine_m(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return float(2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a)))
+
+
+class _StitchedGraph:
+    """
+    The outdoor graph plus the indoor graphs of the buildings on the journey, as one
+    block-diagonal CSR matrix. Each building's entrances are joined to the outdoor node
+    its landmark is snapped to, weighted by the straight-line distance between the two.
+    Indoor maps are grid images without geographic coordinates, so every entrance of a
+    building is taken to be at the landmark's coordinates: the connector weight is the
+    same for all of them, and the choice between entrances is made by the indoor leg.
+    Vertex v belongs to the block whose [offset, offset + size) range contains it.
+    """
+
+    def __init__(self, outdoor, mode, optimizer, buildings):
+        from scipy.sparse import block_diag, coo_matrix
+
+        self.outdoor = outdoor
+        self.buildings = buildings
+        self.optimizer = optimizer
+        snapped = landmark_index.get_table(mode, outdoor)
+        # meters -> weight unit (minutes at walking speed for the time optimizer)
+        indoor_scale = 1.0 / INDOOR_WALK_SPEED if optimizer == "time" else 1.0
+
+        blocks = [outdoor.csr(optimizer)]
+        self.offsets = {}
+        offset = outdoor.node_count
+        for landmark, building in buildings.items():
+            blocks.append(closures.building_csr(building) * indoor_scale)
+            self.offsets[landmark] = offset
+            offset += building.vertex_count
+
+        rows, cols, weights = [], [], []
+        self.entry_nodes = {}
+        for landmark, building in buildings.items():
+            if landmark not in snapped:
+                raise JourneyError(f"Landmark '{landmark}' has no coordinates")
+            lat, lon, node = snapped[landmark]
+            self.entry_nodes[landmark] = node
+            connector = _haversine_m(lat, lon, outdoor.node_lat[node], outdoor.node_lon[node]) * indoor_scale
+            for floor, name in building.entrances:
+                vertex = self.offsets[landmark] + building.node_vertex(floor, name)
+                rows.extend((vertex, node))
+                cols.extend((node, vertex))
+                weights.extend((connector, connector))
+
+        matrix = block_diag(blocks, format="csr")
+        links = coo_matrix((weights, (rows, cols)), shape=matrix.shape).tocsr()
+        self.matrix = (matrix + links).tocsr()
+
+    def locate(self, vertex):
+        """Return ("outdoor", node) or (landmark, (floor, x, y)) for a stitched vertex."""
+        if vertex < self.outdoor.node_count:
+            return "outdoor", vertex
+        for landmark, offset in self.offsets.items():
+            building = self.buildings[landmark]
+            if offset <= vertex < offset + building.vertex_count:
+                return landmark, building.vertices[vertex - offset]
+        raise IndexError(vertex)
+
+
+def _get_stitched(outdoor, mode, optimizer, buildings):
+    """
+    The cached _StitchedGraph of an outdoor graph and a set of buildings. It is rebuilt
+    when a building graph is replaced (a floor file changed), a landmark is snapped to a
+    different node, or the active closures of a building change.
+    """
+    snapped = landmark_index.get_table(mode, outdoor)
+    # The cached graph holds the outdoor and building graphs, so their ids stay unique while it is kept
+    key = (mode, optimizer, id(outdoor), tuple(
+        (landmark, id(buildings[landmark]), snapped.get(landmark), closures.closed_ids(landmark))
+        for landmark in sorted(buildings)))
+    with _lock:
+        stitched = _stitched.get(key)
+        if stitched is not None:
+            _stitched.move_to_end(key)
+            return stitched
+    stitched = _StitchedGraph(outdoor, mode, optimizer, buildings)
+    with _lock:
+        _stitched[key] = stitched
+        while len(_stitched) > STITCH_CACHE_SIZE:
+            _stitched.popitem(last=False)
+    return stitched
+
+
+def _endpoint_vertex(stitched, endpoint, mode):
+    """Stitched vertex of an endpoint: a landmark name, or {"landmark", "floor", "node"}."""
+    if isinstance(endpoint, str):
+        snapped = landmark_index.snap(endpoint, mode, stitched.outdoor)
+        if snapped is None:
+            raise JourneyError(f"Unknown landmark '{endpoint}'")
+        return snapped[2]
+    landmark = endpoint.get("landmark")
+    building = stitched.buildings.get(landmark)
+    if building is None:
+        raise JourneyError(f"Landmark '{landmark}' has no indoor map")
+    floor, node = str(endpoint.get("floor")), endpoint.get("node")
+    vertex = building.node_vertex(floor, node)
+    if vertex is None:
+        raise JourneyError(f"Node '{node}' not found on floor '{floor}' of '{landmark}'")
+    return stitched.offsets[landmark] + vertex
+
+def _split_legs(stitched, path, mode):
+    """Cut a stitched path into indoor legs (one per building floor) and outdoor legs."""
+    legs = []
+    for vertex in path:
+        where, position = stitched.locate(vertex)
+        if where == "outdoor":
+            key = ("outdoor", None)
+            point = (float(stitched.outdoor.node_lat[position]), float(stitched.outdoor.node_lon[position]))
+        else:
+            key = (where, position[0])
+            point = (position[1], position[2])
+        if not legs or legs[-1]["key"] != key:
+            legs.append({"key": key, "vertices": [], "points": []})
+        legs[-1]["vertices"].append(vertex)
+        legs[-1]["points"].append(point)
+
+    result = []
+    for index, leg in enumerate(legs):
+        # Each leg's cost includes the connection to the next leg (a floor change or a doorway).
+        vertices = leg["vertices"] + (legs[index + 1]["vertices"][:1] if index + 1 < len(legs) else [])
+        cost = sum(float(stitched.matrix[u, v]) for u, v in zip(vertices[:-1], vertices[1:]))
+        if leg["key"][0] == "outdoor":
+            result.append({
+                "type": "outdoor",
+                "mode": mode,
+                "coordinates": [list(p) for p in leg["points"]],
+                "polyline": encode_polyline(leg["points"]),
+                "cost": round(cost, 2)
+            })
+        else:
+            result.append({
+                "type": "indoor",
+                "landmark": leg["key"][0],
+                "floor": leg["key"][1],
+                "path": [list(p) for p in leg["points"]],
+                "cost": round(cost, 2)
+            })
+    return result
+
+def plan_journey(source, target, mode="walk", optimizer="length"):
+    """
+    Plan a route from a room in one building to a room in another (or to/from a landmark's
+    outdoor location) with a single shortest-path search over the outdoor graph stitched
+    to the indoor graphs of both buildings. Endpoints are landmark names (outdoor) or
+    {"landmark", "floor", "node"} dictionaries (indoor).
+    Returns {"cost", "unit", "legs"}; raises JourneyError for bad endpoints or no route.
+    """
+    from scipy.sparse.csgraph import dijkstra
+
+    if optimizer not in ("length", "time"):
+        raise JourneyError(f"Invalid optimizer '{optimizer}'. Expected length or time")
+    coordinates = landmark_index.get_coordinates()
+    landmarks = [endpoint if isinstance(endpoint, str) else endpoint.get("landmark") for endpoint in (source, target)]
+    # The region tile(s) holding both landmarks (see outdoor_graph.graph_for)
+    outdoor = outdoor_graph.graph_for(mode, [coordinates[name] for name in landmarks if name in coordinates])
+    buildings = {}
+    for endpoint in (source, target):
+        if isinstance(endpoint, dict):
+            landmark = endpoint.get("landmark")
+            building = indoor_graph.get_building_graph(landmark)
+            if building is None:
+                raise JourneyError(f"Landmark '{landmark}' has no indoor map")
+            if not building.entrances:
+                raise JourneyError(f"Landmark '{landmark}' has no entrance node")
+            buildings[landmark] = building
+
+    stitched = _get_stitched(outdoor, mode, optimizer, buildings)
+    start = _endpoint_vertex(stitched, source, mode)
+    goal = _endpoint_vertex(stitched, target, mode)
+    dist, predecessors = dijkstra(stitched.matrix, directed=True, indices=start, return_predecessors=True)
+    if not np.isfinite(dist[goal]):
+        raise JourneyError("No route between the source and target")
+    path = [goal]
+    while path[-1] != start:
+        path.append(int(predecessors[path[-1]]))
+    path.reverse()
+    return {
+        "cost": round(float(dist[goal]), 2),
+        "unit": "meters" if optimizer == "length" else "minutes",
+        "legs": _split_legs(stitched, path, mode)
+    }
@@ -0,0 +1,157 @@
+import os
+import json
+import queue
+import hashlib
+import threading
+from sqlalchemy import func, or_
+from config import SessionLocal
+from services.models import FileStorage
+from services import closures
+from services.floor_files import FLOOR_FILE_PATTERN
+
+# --- Landmark event configuration ---
+EVENTS_POLL_SECONDS = float(os.getenv("EVENTS_POLL_SECONDS", "2"))            # version checks for watched landmarks
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))  # comment line sent to idle clients
+EVENTS_CLIENT_QUEUE = int(os.getenv("EVENTS_CLIENT_QUEUE", "64"))             # events buffered for a slow client
+EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", "3000"))                   # client reconnect delay
+
+# landmark -> set of subscribers, and the versions last published for it
+_subscribers = {}
+_versions = {}
+_lock = threading.Lock()
+_wake = threading.Event()
+_thread = None
+
+
+class _Subscriber:
+    """One connected client: a bounded queue of events, dropped when it overflows."""
+
+    def __init__(self):
+        self.queue = queue.Queue(EVENTS_CLIENT_QUEUE)
+        self.dropped = False
+
+
+def _versions_of(landmarks):
+    """
+    {landmark: {"models": {floor: version}, "mapbases": {floor: version},
+                "closures": {"version", "ids"}}}.
+    A floor file's version is the time of its latest upload; the closures version is a
+    hash of the ids of the active closures (None when there are none).
+    """
+    result = {landmark: {"models": {}, "mapbases": {}} for landmark in landmarks}
+    db = SessionLocal()
+    try:
+        rows = db.query(FileStorage.landmark, FileStorage.filename, func.max(FileStorage.timestamp)).filter(
+            FileStorage.landmark.in_(list(landmarks)),
+            or_(FileStorage.filename.like("model-%.txt"), FileStorage.filename.like("mapbase-%.png"))
+        ).group_by(FileStorage.landmark, FileStorage.filename).all()
+    finally:
+        db.close()
+    for landmark, filename, timestamp in rows:
+        match = FLOOR_FILE_PATTERN.match(filename)
+        if match and timestamp is not None:
+            result[landmark][match.group(1) + "s"][match.group(2)] = timestamp.isoformat()
+    for landmark in landmarks:
+        ids = closures.closed_ids(landmark)
+        version = hashlib.sha1(",".join(map(str, ids)).encode()).hexdigest()[:12] if ids else None
+        result[landmark]["closures"] = {"version": version, "ids": list(ids)}
+    return result
+
+def _changes(landmark, old, new):
+    """(event, data) pairs for every version that differs between two snapshots of a landmark."""
+    events = []
+    for kind, event in (("models", "model"), ("mapbases", "mapbase")):
+        for floor in sorted(set(old[kind]) | set(new[kind])):
+            if old[kind].get(floor) != new[kind].get(floor):
+                events.append((event, {"landmark": landmark, "floor": floor, "version": new[kind].get(floor)}))
+    if old["closures"]["version"] != new["closures"]["version"]:
+        events.append(("closures", {"landmark": landmark, **new["closures"]}))
+    return events
+
+def _format(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _publish(landmark, messages):
+    """Queue messages for every subscriber of a landmark; subscribers that cannot keep up are dropped."""
+    with _lock:
+        subscribers = list(_subscribers.get(landmark, ()))
+    for subscriber in subscribers:
+        for message in messages:
+            try:
+                subscriber.queue.put_nowait(message)
+            except queue.Full:
+                subscriber.dropped = True
+                unsubscribe(landmark, subscriber)
+                break
+
+def _run():
+    """The worker's broadcaster: compares the versions of watched landmarks and fans out changes."""
+    while True:
+        _wake.wait(EVENTS_POLL_SECONDS)
+        _wake.clear()
+        with _lock:
+            landmarks = list(_subscribers)
+        if not landmarks:
+            continue
+        try:
+            current = _versions_of(landmarks)
+        except Exception as e:
+            print("Error checking landmark versions:", e)
+            continue
+        for landmark, versions in current.items():
+            with _lock:
+                previous = _versions.get(landmark)
+                _versions[landmark] = versions
+            if previous is None:
+                continue
+            events = _changes(landmark, previous, versions)
+            if events:
+                print(f"Publishing {len(events)} version change(s) of '{landmark}'")
+                _publish(landmark, [_format(event, data) for event, data in events])
+
+def _start():
+    global _thread
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, name="landmark-events", daemon=True)
+            _thread.start()
+
+def notify():
+    """Check versions now instead of at the next poll (called after uploads and closure changes)."""
+    _wake.set()
+
+def subscribe(landmark_name):
+    """Register a client of a landmark. Returns (subscriber, current versions of the landmark)."""
+    _start()
+    subscriber = _Subscriber()
+    versions = _versions_of([landmark_name])[landmark_name]
+    with _lock:
+        _subscribers.setdefault(landmark_name, set()).add(subscriber)
+        _versions.setdefault(landmark_name, versions)
+    return subscriber, versions
+
+def unsubscribe(landmark_name, subscriber):
+    with _lock:
+        subscribers = _subscribers.get(landmark_name)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del _subscribers[landmark_name]
+                _versions.pop(landmark_name, None)
+
+def stream(landmark_name, subscriber, versions):
+    """
+    Server-sent events of one landmark for a subscriber and the versions returned by
+    subscribe(): a "versions" snapshot first, then "model", "mapbase" and "closures"
+    events as versions change, and a keepalive comment while idle. Ends when the client
+    cannot keep up; the client then reconnects and compares the new snapshot with what it has.
+    """
+    try:
+        yield f"retry: {EVENTS_RETRY_MS}\n" + _format("versions", {"landmark": landmark_name, **versions})
+        while not subscriber.dropped:
+            try:
+                yield subscriber.queue.get(timeout=EVENTS_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+    finally:
+        unsubscribe(landmark_name, subscriber)
@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import namedtuple
+from config import SessionLocal
+from services.models import Landmark
+from services import outdoor_graph
+
+LandmarkRecord = namedtuple("LandmarkRecord", ["id", "landmark_name", "latitude", "longitude"])
+
+# --- Landmark directory configuration ---
+LANDMARK_POLL_SECONDS = float(os.getenv("LANDMARK_POLL_SECONDS", "5"))   # re-read landmarks changed by other workers
+
+# Landmark directory, loaded from the database, kept up to date by the landmark API of
+# this worker (put/remove) and re-read every LANDMARK_POLL_SECONDS for the others:
+#   {"records": {id: LandmarkRecord}, "coordinates": {name: (lat, lon)}, "etag": str, "loaded": monotonic time}
+# Each change builds a new snapshot, so readers never see a half-updated one.
+_directory = None
+_generation = 0   # bumped by every change, so a directory read meanwhile is not kept
+# (network_type, region) -> (CompiledGraph the table was built for, {landmark_name: (lat, lon, node index)})
+_snapped = {}
+_lock = threading.Lock()
+
+def _snapshot(records):
+    records = dict(sorted(records.items()))  # ids are strings (the landmarks.id column)
+    body = json.dumps([list(record) for record in records.values()], sort_keys=True)
+    return {
+        "records": records,
+        "coordinates": {r.landmark_name: (r.latitude, r.longitude) for r in records.values()},
+        # derived from the content, so every worker gives the same ETag for the same directory
+        "etag": '"' + hashlib.sha1(body.encode("utf-8")).hexdigest()[:16] + '"',
+        "loaded": time.monotonic(),
+    }
+
+def _load_records():
+    db = SessionLocal()
+    try:
+        return {lm.id: LandmarkRecord(lm.id, lm.landmark_name, lm.latitude, lm.longitude)
+                for lm in db.query(Landmark).all()}
+    finally:
+        db.close()
+
+def get_directory():
+    """
+    Return the current directory snapshot (see above), loading it on first use and
+    re-reading it once it is older than LANDMARK_POLL_SECONDS. The snapping tables
+    are only dropped when the re-read directory differs.
+    """
+    global _directory
+    directory = _directory
+    if directory is not None and time.monotonic() - directory["loaded"] < LANDMARK_POLL_SECONDS:
+        return directory
+    generation = _generation
+    fresh = _snapshot(_load_records())
+    with _lock:
+        if generation != _generation:
+            return _directory if _directory is not None else fresh
+        if _directory is None or _directory["etag"] != fresh["etag"]:
+            _snapped.clear()
+        _directory = fresh
+    return fresh
+
+def list_landmarks():
+    """Every landmark as a LandmarkRecord, ordered by id."""
+    return list(get_directory()["records"].values())
+
+def get_coordinates():
+    """Return {landmark_name: (lat, lon)} for every landmark."""
+    return get_directory()["coordinates"]
+
+def get_table(mode, graph=None):
+    """
+    Return {landmark_name: (lat, lon, node index)} for a network type, where node is
+    the landmark snapped to the nearest node of the mode's compiled graph (or of
+    `graph`, e.g. another region tile, so callers holding a graph get indices that match it).
+    The table is rebuilt when the landmarks change or the graph is refreshed or evicted.
+    """
+    graph = outdoor_graph.get_compiled(mode) if graph is None else graph
+    key = (mode, graph.meta.get("region"))
+    entry = _snapped.get(key)
+    if entry is not None and entry[0] is graph:
+        return entry[1]
+
+    coordinates = get_coordinates()
+    names = list(coordinates)
+    table = {}
+    if names:
+        nodes = graph.nearest_nodes([coordinates[n][0] for n in names], [coordinates[n][1] for n in names])
+        table = {name: (coordinates[name][0], coordinates[name][1], int(node)) for name, node in zip(names, nodes)}
+    with _lock:
+        for stale in [k for k, (g, _) in _snapped.items() if not outdoor_graph.is_resident(g)]:
+            del _snapped[stale]
+        if _directory is not None and _directory["coordinates"] is coordinates and outdoor_graph.is_resident(graph):
+            _snapped[key] = (graph, table)
+    return table
+
+def snap(landmark_name, mode, graph=None):
+    """Return (lat, lon, node index) of a landmark in a network type's graph, or None if unknown."""
+    return get_table(mode, graph).get(landmark_name)
+
+def _replace(change):
+    """Apply change(records) to a copy of the loaded directory and drop the snapping tables."""
+    global _directory, _generation
+    with _lock:
+        _generation += 1
+        if _directory is not None:
+            records = dict(_directory["records"])
+            change(records)
+            _directory = _snapshot(records)
+        _snapped.clear()
+
+def put(record):
+    """Write-through after a landmark was created or updated in the database."""
+    _replace(lambda records: records.__setitem__(record.id, record))
+
+def remove(landmark_id):
+    """Write-through after a landmark was deleted from the database."""
+    _replace(lambda records: records.pop(landmark_id, None))
+
+def invalidate():
+    """Drop the directory and snapping tables, e.g. after the landmarks table was changed by SQL."""
+    global _directory, _generation
+    with _lock:
+        _generation += 1
+        _directory = None
+        _snapped.clear()
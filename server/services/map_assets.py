@@ -0,0 +1,57 @@
+import io
+import os
+import base64
+import threading
+from PIL import Image
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "img")
+
+# Landmark -> photo shown in its marker popup on the outdoor route map
+LANDMARK_IMAGES = {
+    "Tech Park": "techpark.jpg",
+    "BIO-Tech Block": "BioTech.jpg",
+    "SRM University Building": "ub.jpg",
+}
+POPUP_IMAGE_SIZE = (250, 200)   # size the photo is displayed at in the popup
+THUMBNAIL_SCALE = 2             # thumbnails keep 2x the display size for high-DPI screens
+THUMBNAIL_QUALITY = 75
+
+# landmark name -> base64 JPEG thumbnail, encoded once per process
+_thumbnails = {}
+_thumbnails_lock = threading.Lock()
+
+def encode_thumbnail(path):
+    """Downscale an image to fit the popup (keeping its aspect ratio) and return it as base64 JPEG."""
+    image = Image.open(path).convert("RGB")
+    image.thumbnail((POPUP_IMAGE_SIZE[0] * THUMBNAIL_SCALE, POPUP_IMAGE_SIZE[1] * THUMBNAIL_SCALE))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+def landmark_thumbnail(landmark_name):
+    """Return the base64 JPEG thumbnail of a landmark's photo, or None if it has none."""
+    filename = LANDMARK_IMAGES.get(landmark_name)
+    if filename is None:
+        return None
+    thumbnail = _thumbnails.get(landmark_name)
+    if thumbnail is None:
+        with _thumbnails_lock:
+            thumbnail = _thumbnails.get(landmark_name)
+            if thumbnail is None:
+                thumbnail = encode_thumbnail(os.path.join(IMAGE_DIR, filename))
+                _thumbnails[landmark_name] = thumbnail
+    return thumbnail
+
+def popup_html(landmark_name):
+    """HTML of a landmark's popup (its photo), or None if it has no photo."""
+    thumbnail = landmark_thumbnail(landmark_name)
+    if thumbnail is None:
+        return None
+    width, height = POPUP_IMAGE_SIZE
+    return (f'<img src="data:image/jpeg;base64,{thumbnail}" width="{width}" height="{height}" '
+            f'style="object-fit: cover">')
+
+def prewarm():
+    """Encode every landmark thumbnail ahead of the first request."""
+    for landmark_name in LANDMARK_IMAGES:
+        landmark_thumbnail(landmark_name)
@@ -1,4 +1,6 @@
 import sys
+import json
+import struct
 import cv2
 import numpy as np
 import trimesh
@@ -11,6 +13,8 @@ import trimesh.visual.material
 from matplotlib.textpath import TextPath
 from config import SessionLocal
 from services.models import FileStorage
+# LOD presets are kept in a light module so routes can validate them without loading OpenCV/trimesh
+from services.model_settings import LOD_SETTINGS, DEFAULT_LOD
 
 # --- Global Constants (used for scaling and offset) ---
 GRID_SIZE = 10      # Each cell is 10x10 pixels
@@ -48,12 +52,12 @@ def build_black_geometry(contours, hierarchy):
             geometry = traverse_contour(i, 0, geometry)
     return geometry
 
-def create_reverse_teardrop_polygon(circle_radius, tip_offset):
+def create_reverse_teardrop_polygon(circle_radius, tip_offset, num_points=50):
     """
     Create a 2D polygon that approximates a reverse teardrop shape.
     This is used for creating markers (for connected yellow points).
+    num_points controls how many points make up the arc.
     """
-    num_points = 50
     angles = np.linspace(0, np.pi, num_points)
     top_arc = [(circle_radius * np.cos(a), circle_radius * np.sin(a)) for a in angles]
     tip = (0, -tip_offset)
@@ -64,13 +68,14 @@ def create_reverse_teardrop_polygon(circle_radius, tip_offset):
 # 2. Updated function to create a text mesh that preserves holes correctly
 # --------------------------------------------------------------------
 
-def create_text_mesh(text, font="DejaVu Sans", size=16, depth=1.0, scale=1.0):
+def create_text_mesh(text, font="DejaVu Sans", size=16, depth=1.0, scale=1.0, tolerance=0.0):
     """
     Create a 3D mesh from text by:
       1. Using matplotlib's TextPath to create a 2D outline.
       2. Converting the outline to shapely polygons while preserving holes.
       3. Extruding the polygon(s) into 3D with the given depth.
       4. Scaling the result.
+    A non-zero tolerance simplifies the glyph outlines before extrusion.
     """
     try:
         text_path = TextPath((0, 0), text, size=size, prop=dict(family=font))
@@ -114,6 +119,8 @@ def create_text_mesh(text, font="DejaVu Sans", size=16, depth=1.0, scale=1.0):
         polys_with_holes.append(Polygon(outer.tolist(), holes))
 
     combined = shapely.ops.unary_union(polys_with_holes)
+    if tolerance > 0:
+        combined = combined.simplify(tolerance, preserve_topology=True)
 
     try:
         if combined.geom_type == 'MultiPolygon':
@@ -136,7 +143,7 @@ def create_text_mesh(text, font="DejaVu Sans", size=16, depth=1.0, scale=1.0):
     mesh.apply_scale(scale)
     return mesh
 
-def create_text_label_final(text, node_location, scale=1.0, height_offset=10.0):
+def create_text_label_final(text, node_location, scale=1.0, height_offset=10.0, tolerance=0.0):
     """
     Create a 3D text label for a node.
     
@@ -147,7 +154,7 @@ def create_text_label_final(text, node_location, scale=1.0, height_offset=10.0):
     The label is then placed at vertical height (final_y = height_offset) in the final coordinate system.
     (No additional rotation is applied.)
     """
-    text_mesh = create_text_mesh(text, size=16, depth=2.0, scale=1.0)
+    text_mesh = create_text_mesh(text, size=16, depth=2.0, scale=1.0, tolerance=tolerance)
     if text_mesh is None:
         print(f"Error creating text mesh for '{text}'")
         return None
@@ -173,6 +180,123 @@ def create_text_label_final(text, node_location, scale=1.0, height_offset=10.0):
     return text_mesh
 
 
+# --------------------------------------------------------------------
+# 2b. Building blocks shared by the per-floor, building and route models
+# --------------------------------------------------------------------
+
+# Swap Y and Z axes: (X remains, original Z becomes Y, original Y becomes Z)
+SWAP_YZ = np.array([
+    [1, 0, 0, 0],
+    [0, 0, 1, 0],
+    [0, 1, 0, 0],
+    [0, 0, 0, 1]
+])
+WALL_HEIGHT = 40.0
+
+def decode_image(image_bytes):
+    """Decode PNG/JPEG bytes into an OpenCV BGR image."""
+    image_data = np.frombuffer(image_bytes, np.uint8)
+    image = cv2.imdecode(image_data, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode image from bytes.")
+    return image
+
+def extract_wall_geometry(image):
+    """
+    Threshold the dark wall pixels of a floorplan image and return them as a
+    Shapely (Multi)Polygon in image pixel coordinates.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    _, wall_mask = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
+    kernel = np.ones((3, 3), np.uint8)
+    wall_mask = cv2.morphologyEx(wall_mask, cv2.MORPH_CLOSE, kernel, iterations=1)
+    contours, hierarchy = cv2.findContours(wall_mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    if hierarchy is None:
+        raise RuntimeError("No contours found for walls. Check threshold or image content.")
+    black_geometry = build_black_geometry(contours, hierarchy)
+    if black_geometry.is_empty:
+        raise RuntimeError("Black geometry is empty; check your threshold or image content.")
+    return black_geometry
+
+def finish_wall_geometry(black_geometry, settings):
+    """
+    Round the wall corners and simplify the outlines according to the LOD settings.
+    """
+    corner_radius = 9.0
+    resolution = settings["buffer_resolution"]
+    black_geometry = black_geometry.buffer(corner_radius, resolution, join_style=1).buffer(-corner_radius, resolution, join_style=1)
+
+    tolerance = settings["simplify_tolerance"]
+    if tolerance > 0:
+        black_geometry = black_geometry.simplify(tolerance, preserve_topology=True)
+    return black_geometry
+
+def extrude_wall_meshes(black_geometry, wall_height=WALL_HEIGHT):
+    """Extrude the wall polygons into meshes with the translucent wall material."""
+    wall_meshes = []
+    if black_geometry.geom_type == "Polygon":
+        wall_meshes.append(trimesh.creation.extrude_polygon(black_geometry, height=wall_height))
+    elif black_geometry.geom_type == "MultiPolygon":
+        for poly in black_geometry.geoms:
+            wall_meshes.append(trimesh.creation.extrude_polygon(poly, height=wall_height))
+    
+    wall_material = trimesh.visual.material.PBRMaterial(
+        baseColorFactor=[1.0, 1.0, 1.0, 0.8]
+    )
+    for mesh in wall_meshes:
+        mesh.visual.material = wall_material
+    return wall_meshes
+
+def create_rope_meshes(path_polygons, rope_height=2.0):
+    """Extrude the route polygons into thin blue "rope" meshes."""
+    path_meshes = []
+    for path_poly in path_polygons:
+        rope_mesh = trimesh.creation.extrude_polygon(path_poly, height=rope_height)
+        rope_mesh.visual.face_colors = [0, 0, 255, 255]
+        rope_mesh.apply_translation((0, 0, 0.1))
+        path_meshes.append(rope_mesh)
+    return path_meshes
+
+def create_floor_slab(black_geometry, floor_thickness=1.0):
+    """
+    Build the translucent floor box under the walls. The box is placed directly in
+    the final (Y-up) coordinate system with its top face at height 0.
+    """
+    min_x, min_y, max_x, max_y = black_geometry.bounds
+    floor_width = max_x - min_x
+    floor_depth = max_y - min_y
+    floor_mesh = trimesh.creation.box(extents=[floor_width, floor_thickness, floor_depth])
+    center_x = (min_x + max_x) / 2.0
+    center_z = (min_y + max_y) / 2.0
+    floor_mesh.apply_translation([center_x, -floor_thickness/2, center_z])
+    floor_material = trimesh.visual.material.PBRMaterial(
+        baseColorFactor=[200/255, 200/255, 200/255, 0.3],
+        alphaMode='BLEND'
+    )
+    floor_mesh.visual.material = floor_material
+    return floor_mesh
+
+def create_label_meshes(nodes, floor_name, settings, with_floor_name=True):
+    """
+    Build the 3D text labels for every node and (optionally) the floor name label,
+    in the final (Y-up) coordinate system.
+    """
+    label_meshes = []
+    for node_name, location in nodes.items():
+        text_mesh = create_text_label_final(node_name, location, scale=1.0, height_offset=10.0,
+                                            tolerance=settings["text_tolerance"])
+        if text_mesh is not None:
+            label_meshes.append(text_mesh)
+
+    if with_floor_name:
+        floorName = "Floor " + floor_name
+        # Create a floor name label at the right front corner
+        floor_label = create_text_label_final(floorName, (20, 0), scale=5.0, height_offset=30.0,
+                                              tolerance=settings["text_tolerance"])
+        if floor_label:
+            label_meshes.append(floor_label)
+    return label_meshes
+
 # --------------------------------------------------------------------
 # 3. Parsing node data from model file content (text file)
 # --------------------------------------------------------------------
@@ -217,7 +341,26 @@ def load_nodes_from_content(content):
 # 4. Main function to generate a 3D model (GLB bytes) from image bytes and DB model file
 # --------------------------------------------------------------------
 
-def generate_3d_model_from_bytes(image_bytes, floor_name, landmark_name):
+def load_floor_nodes(floor_name, landmark_name):
+    """
+    Fetch the node names and locations from the latest text model file for the
+    specified floor and landmark. Returns an empty dictionary if there is no model file.
+    """
+    db = SessionLocal()
+    try:
+        model_filename = f"model-{floor_name}.txt"
+        model_file = db.query(FileStorage).filter(
+            FileStorage.filename == model_filename,
+            FileStorage.landmark == landmark_name
+        ).order_by(FileStorage.timestamp.desc()).first()
+        if not model_file:
+            return {}
+        nodes, _ = load_nodes_from_content(model_file.content)
+        return nodes
+    finally:
+        db.close()
+
+def generate_3d_model_from_bytes(image_bytes, floor_name, landmark_name, lod=DEFAULT_LOD, quantize=None):
     """
     Given image data (as bytes, e.g., the generated 2D path image), the floor name, 
     and landmark identifier, generate a 3D model (as GLB bytes) that includes walls, 
@@ -225,26 +368,31 @@ def generate_3d_model_from_bytes(image_bytes, floor_name, landmark_name):
     
     The function fetches the latest text model file for the specified floor and landmark
     from the database.
+
+    lod selects one of the LOD_SETTINGS presets ("low", "medium" or "high").
+    quantize overrides the preset's KHR_mesh_quantization choice when not None.
     """
-    # Decode the image from bytes
-    image_data = np.frombuffer(image_bytes, np.uint8)
-    image = cv2.imdecode(image_data, cv2.IMREAD_COLOR)
-    if image is None:
-        raise ValueError("Could not decode image from bytes.")
+    nodes = load_floor_nodes(floor_name, landmark_name)
+    return build_floor_glb(image_bytes, floor_name, nodes, lod=lod, quantize=quantize)
+
+def build_floor_glb(image_bytes, floor_name, nodes, lod=DEFAULT_LOD, quantize=None):
+    """
+    Build the GLB bytes for one floor from the image bytes and an already loaded
+    node dictionary ({name: (x, y)}). This does no database access, so it can run
+    inside a worker process (see services.model_pool).
+    """
+    if lod not in LOD_SETTINGS:
+        raise ValueError(f"Unknown lod '{lod}'. Expected one of: {', '.join(LOD_SETTINGS)}")
+    settings = LOD_SETTINGS[lod]
+    if quantize is None:
+        quantize = settings["quantize"]
+
+    image = decode_image(image_bytes)
 
     # -------------------------
     # 1. Build wall geometry
     # -------------------------
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    _, wall_mask = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
-    kernel = np.ones((3, 3), np.uint8)
-    wall_mask = cv2.morphologyEx(wall_mask, cv2.MORPH_CLOSE, kernel, iterations=1)
-    contours, hierarchy = cv2.findContours(wall_mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-    if hierarchy is None:
-        raise RuntimeError("No contours found for walls. Check threshold or image content.")
-    black_geometry = build_black_geometry(contours, hierarchy)
-    if black_geometry.is_empty:
-        raise RuntimeError("Black geometry is empty; check your threshold or image content.")
+    black_geometry = extract_wall_geometry(image)
     
     # -------------------------
     # 2. Detect yellow points (room dots)
@@ -301,38 +449,23 @@ def generate_3d_model_from_bytes(image_bytes, floor_name, landmark_name):
         expanded_poly = path_poly.buffer(expand_distance)
         black_geometry = black_geometry.difference(expanded_poly)
         
-    corner_radius = 9.0
-    black_geometry = black_geometry.buffer(corner_radius, join_style=1).buffer(-corner_radius, join_style=1)
+    black_geometry = finish_wall_geometry(black_geometry, settings)
+
+    tolerance = settings["simplify_tolerance"]
+    if tolerance > 0:
+        path_polygons = [poly.simplify(tolerance, preserve_topology=True) for poly in path_polygons]
+        path_polygons = [poly for poly in path_polygons if poly.is_valid and not poly.is_empty]
     
     # -------------------------
     # 5. Extrude walls, paths, and markers
     # -------------------------
-    wall_height = 40.0
-    wall_meshes = []
-    if black_geometry.geom_type == "Polygon":
-        wall_meshes.append(trimesh.creation.extrude_polygon(black_geometry, height=wall_height))
-    elif black_geometry.geom_type == "MultiPolygon":
-        for poly in black_geometry.geoms:
-            wall_meshes.append(trimesh.creation.extrude_polygon(poly, height=wall_height))
-    
-    wall_material = trimesh.visual.material.PBRMaterial(
-        baseColorFactor=[1.0, 1.0, 1.0, 0.8]
-    )
-    for mesh in wall_meshes:
-        mesh.visual.material = wall_material
-
-    path_meshes = []
-    rope_height = 2.0
-    for path_poly in path_polygons:
-        rope_mesh = trimesh.creation.extrude_polygon(path_poly, height=rope_height)
-        rope_mesh.visual.face_colors = [0, 0, 255, 255]
-        rope_mesh.apply_translation((0, 0, 0.1))
-        path_meshes.append(rope_mesh)
+    wall_meshes = extrude_wall_meshes(black_geometry)
+    path_meshes = create_rope_meshes(path_polygons)
 
     room_markers = []
     sphere_radius = 4.0
     for pt in regular_yellow:
-        sphere_mesh = trimesh.creation.icosphere(subdivisions=2, radius=sphere_radius)
+        sphere_mesh = trimesh.creation.icosphere(subdivisions=settings["sphere_subdivisions"], radius=sphere_radius)
         sphere_mesh.apply_translation((pt[0], pt[1], sphere_radius))
         sphere_mesh.visual.face_colors = [255, 255, 0, 255]
         room_markers.append(sphere_mesh)
@@ -340,7 +473,7 @@ def generate_3d_model_from_bytes(image_bytes, floor_name, landmark_name):
     circle_radius = 8.0
     tip_offset = 12.0
     for pt in connected_yellow:
-        marker_polygon = create_reverse_teardrop_polygon(circle_radius, tip_offset)
+        marker_polygon = create_reverse_teardrop_polygon(circle_radius, tip_offset, settings["teardrop_points"])
         marker_mesh = trimesh.creation.extrude_polygon(marker_polygon, height=10.0)
         pivot = np.array([0, -tip_offset, 0])
         T1 = trimesh.transformations.translation_matrix(-pivot)
@@ -368,14 +501,7 @@ def generate_3d_model_from_bytes(image_bytes, floor_name, landmark_name):
         
 
 
-    # Swap Y and Z axes: (X remains, original Z becomes Y, original Y becomes Z)
-    swap_yz = np.array([
-        [1, 0, 0, 0],
-        [0, 0, 1, 0],
-        [0, 1, 0, 0],
-        [0, 0, 0, 1]
-    ])
-    scene.apply_transform(swap_yz)
+    scene.apply_transform(SWAP_YZ)
     
     bounds_scene = scene.bounds
     min_y_scene = bounds_scene[0][1]
@@ -386,52 +512,242 @@ def generate_3d_model_from_bytes(image_bytes, floor_name, landmark_name):
     # -------------------------
     # 6. Build floor mesh
     # -------------------------
-    min_x, min_y, max_x, max_y = black_geometry.bounds
-    floor_width = max_x - min_x
-    floor_depth = max_y - min_y
-    floor_thickness = 1.0  # Adjust as needed.
-    floor_mesh = trimesh.creation.box(extents=[floor_width, floor_thickness, floor_depth])
-    center_x = (min_x + max_x) / 2.0
-    center_z = (min_y + max_y) / 2.0
-    floor_mesh.apply_translation([center_x, -floor_thickness/2, center_z])
-    floor_material = trimesh.visual.material.PBRMaterial(
-        baseColorFactor=[200/255, 200/255, 200/255, 0.3],
-        alphaMode='BLEND'
-    )
-    floor_mesh.visual.material = floor_material
-    scene.add_geometry(floor_mesh)
+    scene.add_geometry(create_floor_slab(black_geometry))
 
     # -------------------------
-    # 8. Retrieve text model file from DB and add text labels
-    # -------------------------
-    db = SessionLocal()
-    model_filename = f"model-{floor_name}.txt"
-    model_file = db.query(FileStorage).filter(
-        FileStorage.filename == model_filename,
-        FileStorage.landmark == landmark_name
-    ).order_by(FileStorage.timestamp.desc()).first()
-    if model_file:
-        nodes, _ = load_nodes_from_content(model_file.content)
-        for node_name, location in nodes.items():
-            text_mesh = create_text_label_final(node_name, location, scale=1.0, height_offset=10.0)
-            if text_mesh is not None:
-                scene.add_geometry(text_mesh)
-    db.close()
-    
-    
-    # -------------------------
-    # 8. Add Floor Name Label
+    # 8. Add text labels for the floor's nodes and the floor name
     # -------------------------
-    if not black_geometry.is_empty:
-        floorName = "Floor " + floor_name
-        # Create a floor name label at the right front corner
-        floor_label = create_text_label_final(floorName, (20, 0), scale=5.0, height_offset=30.0)
-        if floor_label:
-            scene.add_geometry(floor_label)  # Add label to the scene
-            
+    for label_mesh in create_label_meshes(nodes, floor_name, settings, with_floor_name=not black_geometry.is_empty):
+        scene.add_geometry(label_mesh)
             
     # -------------------------
     # 9. Export scene as GLB bytes and return them
     # -------------------------
     glb_bytes = scene.export(file_type='glb')
+    if quantize:
+        glb_bytes = quantize_glb(glb_bytes)
     return glb_bytes
+
+
+# --------------------------------------------------------------------
+# 5. KHR_mesh_quantization post-processing of exported GLB bytes
+# --------------------------------------------------------------------
+
+GLB_MAGIC = 0x46546C67
+GLB_CHUNK_JSON = 0x4E4F534A
+GLB_CHUNK_BIN = 0x004E4942
+COMPONENT_BYTE = 5120
+COMPONENT_SHORT = 5122
+COMPONENT_UNSIGNED_SHORT = 5123
+COMPONENT_UNSIGNED_INT = 5125
+COMPONENT_FLOAT = 5126
+INT16_MAX = 32767
+INT8_MAX = 127
+
+def read_glb(glb_bytes):
+    """
+    Split GLB bytes into the glTF JSON dictionary and the binary chunk.
+    """
+    magic, version, length = struct.unpack_from("<III", glb_bytes, 0)
+    if magic != GLB_MAGIC or version != 2:
+        raise ValueError("Not a glTF 2.0 binary file.")
+    gltf, binary = None, b""
+    offset = 12
+    while offset < length:
+        chunk_length, chunk_type = struct.unpack_from("<II", glb_bytes, offset)
+        chunk = glb_bytes[offset + 8:offset + 8 + chunk_length]
+        if chunk_type == GLB_CHUNK_JSON:
+            gltf = json.loads(chunk.decode("utf-8"))
+        elif chunk_type == GLB_CHUNK_BIN:
+            binary = bytes(chunk)
+        offset += 8 + chunk_length
+    if gltf is None:
+        raise ValueError("GLB file has no JSON chunk.")
+    return gltf, binary
+
+def write_glb(gltf, binary):
+    """
+    Assemble a glTF JSON dictionary and a binary buffer back into GLB bytes.
+    """
+    json_chunk = json.dumps(gltf, separators=(",", ":")).encode("utf-8")
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    bin_chunk = binary + b"\x00" * (-len(binary) % 4)
+    length = 12 + 8 + len(json_chunk) + (8 + len(bin_chunk) if bin_chunk else 0)
+    parts = [struct.pack("<III", GLB_MAGIC, 2, length),
+             struct.pack("<II", len(json_chunk), GLB_CHUNK_JSON), json_chunk]
+    if bin_chunk:
+        parts += [struct.pack("<II", len(bin_chunk), GLB_CHUNK_BIN), bin_chunk]
+    return b"".join(parts)
+
+def _read_float_vec3(gltf, binary, accessor_index):
+    """
+    Read a tightly packed or strided float32 VEC3 accessor into an (n, 3) array.
+    """
+    accessor = gltf["accessors"][accessor_index]
+    view = gltf["bufferViews"][accessor["bufferView"]]
+    start = view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+    stride = view.get("byteStride", 12)
+    count = accessor["count"]
+    raw = np.frombuffer(binary, dtype=np.uint8, count=stride * (count - 1) + 12 if count else 0, offset=start)
+    rows = np.lib.stride_tricks.as_strided(raw, shape=(count, 12), strides=(stride, 1))
+    return np.ascontiguousarray(rows).view("<f4").reshape(count, 3).astype(np.float64)
+
+def _pack_vec3(values, dtype, stride):
+    """
+    Pack an (n, 3) integer array into rows of `stride` bytes (zero padded).
+    """
+    values = np.asarray(values, dtype=dtype)
+    item = values.dtype.itemsize * 3
+    packed = np.zeros((len(values), stride), dtype=np.uint8)
+    packed[:, :item] = values.reshape(len(values), 3).view(np.uint8).reshape(len(values), item)
+    return packed.tobytes()
+
+def _node_matrix(node):
+    """
+    Return the local 4x4 transform of a glTF node (matrix or TRS form).
+    """
+    if "matrix" in node:
+        return np.array(node["matrix"], dtype=np.float64).reshape(4, 4).T
+    matrix = np.eye(4)
+    if "translation" in node:
+        matrix = matrix.dot(trimesh.transformations.translation_matrix(node["translation"]))
+    if "rotation" in node:
+        x, y, z, w = node["rotation"]
+        matrix = matrix.dot(trimesh.transformations.quaternion_matrix([w, x, y, z]))
+    if "scale" in node:
+        matrix = matrix.dot(np.diag(list(node["scale"]) + [1.0]))
+    return matrix
+
+def quantize_glb(glb_bytes):
+    """
+    Re-encode the mesh attributes of a GLB using KHR_mesh_quantization:
+      - POSITION becomes normalized int16, with one uniform scale/offset per mesh
+        that is folded into the transforms of the nodes using that mesh.
+      - NORMAL becomes normalized int8.
+      - uint32 triangle indices are narrowed to uint16 when every index fits.
+    Meshes whose attribute data is shared with other accessors are left untouched.
+    """
+    gltf, binary = read_glb(glb_bytes)
+    accessors = gltf.get("accessors", [])
+    views = gltf.get("bufferViews", [])
+    if not accessors or not views or len(gltf.get("buffers", [])) != 1:
+        return glb_bytes
+
+    # Count how often each accessor / buffer view is referenced so shared data is skipped.
+    accessor_refs = {}
+    for mesh in gltf.get("meshes", []):
+        for prim in mesh["primitives"]:
+            for index in list(prim["attributes"].values()) + [prim.get("indices")]:
+                if index is not None:
+                    accessor_refs[index] = accessor_refs.get(index, 0) + 1
+    view_refs = {}
+    for accessor in accessors:
+        if "bufferView" in accessor:
+            view_refs[accessor["bufferView"]] = view_refs.get(accessor["bufferView"], 0) + 1
+
+    def quantizable(index):
+        accessor = accessors[index]
+        return (accessor.get("componentType") == COMPONENT_FLOAT and accessor.get("type") == "VEC3"
+                and "sparse" not in accessor and "bufferView" in accessor
+                and accessor_refs.get(index) == 1 and view_refs.get(accessor["bufferView"]) == 1)
+
+    new_views = {}
+    dequantize = {}
+    for mesh_index, mesh in enumerate(gltf.get("meshes", [])):
+        position_indices = [prim["attributes"].get("POSITION") for prim in mesh["primitives"]]
+        if not position_indices or any(i is None or not quantizable(i) for i in position_indices):
+            continue
+        positions = {i: _read_float_vec3(gltf, binary, i) for i in position_indices}
+        stacked = np.vstack(list(positions.values()))
+        if not len(stacked):
+            continue
+        lo, hi = stacked.min(axis=0), stacked.max(axis=0)
+        center = (lo + hi) / 2.0
+        half_extent = float(np.max(hi - lo)) / 2.0 or 1.0
+
+        for index, values in positions.items():
+            q = np.round((values - center) / half_extent * INT16_MAX).clip(-INT16_MAX, INT16_MAX).astype(np.int16)
+            accessor = accessors[index]
+            new_views[accessor["bufferView"]] = (_pack_vec3(q, "<i2", 8), 8)
+            accessor.update(componentType=COMPONENT_SHORT, normalized=True, byteOffset=0,
+                            min=q.min(axis=0).tolist(), max=q.max(axis=0).tolist())
+
+        for prim in mesh["primitives"]:
+            index = prim["attributes"].get("NORMAL")
+            if index is None or not quantizable(index):
+                continue
+            normals = _read_float_vec3(gltf, binary, index)
+            q = np.round(normals * INT8_MAX).clip(-INT8_MAX, INT8_MAX).astype(np.int8)
+            accessor = accessors[index]
+            new_views[accessor["bufferView"]] = (_pack_vec3(q, "<i1", 4), 4)
+            accessor.update(componentType=COMPONENT_BYTE, normalized=True, byteOffset=0)
+            accessor.pop("min", None)
+            accessor.pop("max", None)
+
+        for prim in mesh["primitives"]:
+            index = prim.get("indices")
+            if index is None or accessor_refs.get(index) != 1:
+                continue
+            accessor = accessors[index]
+            view = views[accessor["bufferView"]]
+            if accessor.get("componentType") != COMPONENT_UNSIGNED_INT or view_refs.get(accessor["bufferView"]) != 1:
+                continue
+            start = view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+            values = np.frombuffer(binary, dtype="<u4", count=accessor["count"], offset=start)
+            if len(values) and values.max() < 65535:
+                new_views[accessor["bufferView"]] = (values.astype("<u2").tobytes(), None)
+                accessor.update(componentType=COMPONENT_UNSIGNED_SHORT, byteOffset=0)
+                if "min" in accessor:
+                    accessor["min"] = [int(values.min())]
+                    accessor["max"] = [int(values.max())]
+
+        dequantize[mesh_index] = trimesh.transformations.translation_matrix(center).dot(
+            np.diag([half_extent / INT16_MAX] * 3 + [1.0]))
+
+    if not dequantize:
+        return glb_bytes
+
+    # Fold the dequantization transform into every node that instantiates a quantized mesh.
+    nodes = gltf.setdefault("nodes", [])
+    for node in list(nodes):
+        mesh_index = node.get("mesh")
+        if mesh_index not in dequantize:
+            continue
+        if node.get("children"):
+            # Keep the children's transforms intact by moving the mesh into its own child node.
+            nodes.append({"mesh": node.pop("mesh"),
+                          "matrix": dequantize[mesh_index].T.flatten().tolist()})
+            node["children"].append(len(nodes) - 1)
+            continue
+        matrix = _node_matrix(node).dot(dequantize[mesh_index])
+        for key in ("translation", "rotation", "scale"):
+            node.pop(key, None)
+        node["matrix"] = matrix.T.flatten().tolist()
+
+    # Rebuild the binary buffer with the re-encoded views, keeping view indices stable.
+    chunks = []
+    offset = 0
+    for view_index, view in enumerate(views):
+        if view_index in new_views:
+            data, stride = new_views[view_index]
+            if stride:
+                view["byteStride"] = stride
+        else:
+            start = view.get("byteOffset", 0)
+            data = binary[start:start + view["byteLength"]]
+        padding = -offset % 4
+        chunks.append(b"\x00" * padding)
+        offset += padding
+        view["buffer"] = 0
+        view["byteOffset"] = offset
+        view["byteLength"] = len(data)
+        chunks.append(data)
+        offset += len(data)
+    binary = b"".join(chunks)
+    gltf["buffers"] = [{"byteLength": len(binary)}]
+
+    for key in ("extensionsUsed", "extensionsRequired"):
+        extensions = gltf.setdefault(key, [])
+        if "KHR_mesh_quantization" not in extensions:
+            extensions.append("KHR_mesh_quantization")
+    return write_glb(gltf, binary)
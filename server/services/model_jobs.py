@@ -0,0 +1,250 @@
+import os
+import time
+import hashlib
+import threading
+from sqlalchemy.exc import IntegrityError
+from config import SessionLocal
+from services.models import ModelJob
+from services import model_pool
+from services.model_settings import DEFAULT_LOD
+
+# --- Job store configuration ---
+MODEL_JOB_CACHE_SIZE = int(os.getenv("MODEL_JOB_CACHE_SIZE", "32"))              # finished jobs kept for reuse
+MODEL_JOB_MAX_WAIT = float(os.getenv("MODEL_JOB_MAX_WAIT", "25"))                 # longest long-poll in seconds
+MODEL_JOB_POLL_SECONDS = float(os.getenv("MODEL_JOB_POLL_SECONDS", "0.5"))        # status checks while waiting
+MODEL_JOB_ABANDON_SECONDS = float(os.getenv("MODEL_JOB_ABANDON_SECONDS", "600"))  # unfinished jobs given up as failed
+
+# Jobs are rows of the model_jobs table, so every server worker can answer for them.
+# The worker that queued a job also keeps its pool task and an event set when it finishes:
+# job id -> (PoolTask, threading.Event)
+_local = {}
+_jobs_lock = threading.Lock()
+
+def job_key(image_bytes, floor_name, landmark_name, nodes, lod, quantize):
+    """
+    Hash every input that affects the generated GLB. The hash is used as the job id,
+    so identical requests share one job and its result.
+    """
+    digest = hashlib.sha1()
+    digest.update(image_bytes)
+    for node_name, location in sorted(nodes.items()):
+        digest.update(f"{node_name}:{location[0]},{location[1]};".encode("utf-8"))
+    digest.update(f"|{floor_name}|{landmark_name}|{lod}|{quantize}".encode("utf-8"))
+    return digest.hexdigest()
+
+def _as_dict(row):
+    return {
+        "id": row.id,
+        "status": row.status,
+        "floor": row.floor,
+        "landmark": row.landmark,
+        "lod": row.lod,
+        "created": row.created,
+        "finished": row.finished,
+        "error": row.error,
+        "timed_out": bool(row.timed_out),
+    }
+
+def _abandoned(row):
+    """
+    Whether an unfinished job not queued by this worker is older than
+    MODEL_JOB_ABANDON_SECONDS, e.g. because the worker that queued it was restarted.
+    """
+    return (row.status in ("queued", "running") and row.id not in _local
+            and time.time() - row.created > MODEL_JOB_ABANDON_SECONDS)
+
+def _claim(db, job_id, floor_name, landmark_name, lod):
+    """
+    Store a queued row for a job this worker is about to submit. Returns False when the
+    job is already pending or done (possibly claimed by another worker meanwhile).
+    """
+    row = db.get(ModelJob, job_id)
+    fields = {"status": "queued", "floor": floor_name, "landmark": landmark_name, "lod": lod,
+              "created": time.time(), "finished": None, "error": None, "timed_out": 0, "result": None}
+    if row is None:
+        db.add(ModelJob(id=job_id, **fields))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return False
+        return True
+    if row.status != "failed" and not _abandoned(row):
+        return False
+    # failed jobs are retried; the status check makes concurrent retries claim it once
+    claimed = db.query(ModelJob).filter(ModelJob.id == job_id, ModelJob.status == row.status,
+                                        ModelJob.created == row.created).update(fields, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+def _release(job_ids):
+    """Forget jobs that were claimed but could not be submitted."""
+    db = SessionLocal()
+    try:
+        db.query(ModelJob).filter(ModelJob.id.in_(list(job_ids))).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def _on_done(job_id, future):
+    """Record the outcome of a finished pool task on its job."""
+    fields = {"finished": time.time()}
+    if future.cancelled():
+        fields.update(status="failed", error="Job was cancelled")
+    elif isinstance(future.exception(), model_pool.ModelTaskTimeout):
+        fields.update(status="failed", error=str(future.exception()), timed_out=1)
+    elif future.exception() is not None:
+        fields.update(status="failed", error=str(future.exception()) or type(future.exception()).__name__)
+    else:
+        fields.update(status="done", result=future.result())
+    db = SessionLocal()
+    try:
+        db.query(ModelJob).filter(ModelJob.id == job_id).update(fields, synchronize_session=False)
+        db.commit()
+        _evict_finished(db)
+    except Exception as e:
+        db.rollback()
+        print(f"Error storing model job {job_id}:", e)
+    finally:
+        db.close()
+    with _jobs_lock:
+        _, event = _local.pop(job_id, (None, None))
+    if event is not None:
+        event.set()
+
+def _evict_finished(db):
+    """Drop the oldest finished jobs once more than MODEL_JOB_CACHE_SIZE are kept."""
+    stale = [job_id for (job_id,) in db.query(ModelJob.id).filter(
+        ModelJob.status.in_(["done", "failed"])
+    ).order_by(ModelJob.finished.desc()).offset(MODEL_JOB_CACHE_SIZE).all()]
+    if stale:
+        db.query(ModelJob).filter(ModelJob.id.in_(stale)).delete(synchronize_session=False)
+        db.commit()
+
+def submit_jobs(floors):
+    """
+    Queue 3D model jobs for several floors: {key: (image_bytes, floor_name, landmark_name,
+    lod, quantize)} -> {key: job dictionary}. A job with the same inputs that is already
+    pending or done (on any worker) is reused; failed jobs are retried. The new jobs are
+    admitted to the worker pool all together or not at all: model_pool.PoolSaturatedError
+    is raised and nothing is queued when the pool has no room for every one of them.
+    """
+    # Imported here so the web process only loads the geometry stack once a model is requested
+    from services.model_generation import build_floor_glb, load_floor_nodes
+
+    prepared = {}
+    for key, (image_bytes, floor_name, landmark_name, lod, quantize) in floors.items():
+        nodes = load_floor_nodes(floor_name, landmark_name)
+        job_id = job_key(image_bytes, floor_name, landmark_name, nodes, lod, quantize)
+        prepared[key] = (job_id, image_bytes, floor_name, landmark_name, nodes, lod, quantize)
+
+    # The rows are claimed first, so concurrent requests for the same inputs (in this or
+    # another worker) reuse the job instead of queueing it twice
+    calls = {}
+    db = SessionLocal()
+    try:
+        for job_id, image_bytes, floor_name, landmark_name, nodes, lod, quantize in prepared.values():
+            if job_id not in calls and _claim(db, job_id, floor_name, landmark_name, lod):
+                calls[job_id] = (build_floor_glb, (image_bytes, floor_name, nodes), {"lod": lod, "quantize": quantize})
+    finally:
+        db.close()
+
+    if calls:
+        try:
+            futures = model_pool.submit_many(calls)
+        except Exception:
+            _release(calls)
+            raise
+        with _jobs_lock:
+            for job_id, future in futures.items():
+                _local[job_id] = (future, threading.Event())
+        for job_id, future in futures.items():
+            future.add_done_callback(lambda f, job_id=job_id: _on_done(job_id, f))
+
+    jobs = {}
+    for key, prepared_job in prepared.items():
+        job = get_job(prepared_job[0])
+        if job is None:
+            job = {"id": prepared_job[0], "status": "failed", "floor": prepared_job[2], "landmark": prepared_job[3],
+                   "lod": prepared_job[5], "created": time.time(), "finished": time.time(),
+                   "error": "Job was not queued", "timed_out": False}
+        jobs[key] = job
+    return jobs
+
+def submit_job(image_bytes, floor_name, landmark_name, lod=DEFAULT_LOD, quantize=None):
+    """
+    Queue a 3D model job for one floor and return its job dictionary (see submit_jobs).
+    Raises model_pool.PoolSaturatedError when the worker pool has no room.
+    """
+    return submit_jobs({0: (image_bytes, floor_name, landmark_name, lod, quantize)})[0]
+
+def get_job(job_id):
+    """
+    Return the job dictionary for job_id (or None), without the GLB (see load_result).
+    Jobs that overrun their deadline are failed by the pool's watchdog (see
+    services/model_pool.py); jobs left unfinished by a restarted worker are reported
+    failed after MODEL_JOB_ABANDON_SECONDS.
+    """
+    db = SessionLocal()
+    try:
+        row = db.get(ModelJob, job_id)
+        if row is None:
+            return None
+        with _jobs_lock:
+            future, _ = _local.get(job_id, (None, None))
+        if future is not None and row.status == "queued" and future.running():
+            row.status = "running"
+            db.commit()
+        job = _as_dict(row)
+        if _abandoned(row):
+            job["status"], job["error"] = "failed", "Job was abandoned by the worker that queued it"
+        return job
+    finally:
+        db.close()
+
+def load_result(job_id):
+    """The GLB of a finished job, or None."""
+    db = SessionLocal()
+    try:
+        return db.query(ModelJob.result).filter(ModelJob.id == job_id, ModelJob.status == "done").scalar()
+    finally:
+        db.close()
+
+def wait_for_job(job, timeout=None):
+    """
+    Block until the job finishes or `timeout` seconds pass (None waits until the job
+    finishes or is aborted by its deadline). Returns the (refreshed) job dictionary.
+    Jobs queued by this worker wake the wait as soon as they finish; others are polled
+    every MODEL_JOB_POLL_SECONDS.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while job["status"] in ("queued", "running"):
+        remaining = MODEL_JOB_POLL_SECONDS if deadline is None else deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        with _jobs_lock:
+            _, event = _local.get(job["id"], (None, None))
+        if event is not None:
+            event.wait(min(remaining, MODEL_JOB_POLL_SECONDS))
+        else:
+            time.sleep(min(remaining, MODEL_JOB_POLL_SECONDS))
+        refreshed = get_job(job["id"])
+        if refreshed is None:
+            break
+        job = refreshed
+    return job
+
+def job_status(job):
+    """JSON-serialisable view of a job (without the GLB bytes)."""
+    status = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "floor": job["floor"],
+        "landmark": job["landmark"],
+        "lod": job["lod"],
+        "created": job["created"],
+        "finished": job["finished"],
+    }
+    if job["error"]:
+        status["error"] = job["error"]
+    return status
@@ -0,0 +1,224 @@
+import os
+import signal
+import time
+import threading
+import multiprocessing
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor
+
+# --- Pool configuration (overridable through environment variables) ---
+MODEL_POOL_WORKERS = int(os.getenv("MODEL_POOL_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+MODEL_POOL_QUEUE_DEPTH = int(os.getenv("MODEL_POOL_QUEUE_DEPTH", "8"))   # tasks allowed to wait for a worker
+MODEL_TASK_TIMEOUT = float(os.getenv("MODEL_TASK_TIMEOUT", "30"))        # seconds per task inside the worker
+MODEL_TASK_GRACE = float(os.getenv("MODEL_TASK_GRACE", "5"))             # extra seconds before the worker is killed
+MODEL_RETRY_AFTER = int(os.getenv("MODEL_RETRY_AFTER", "5"))             # Retry-After hint when the pool is full
+MODEL_WATCHDOG_INTERVAL = float(os.getenv("MODEL_WATCHDOG_INTERVAL", "0.5"))  # seconds between deadline checks
+
+# Modules imported once by the fork server so each worker starts with OpenCV/trimesh loaded.
+WORKER_PRELOAD = ["services.model_generation"]
+
+class PoolSaturatedError(RuntimeError):
+    """Raised when the pool has no free slot for a new task."""
+
+    def __init__(self, retry_after=MODEL_RETRY_AFTER):
+        super().__init__("3D model workers are busy, please retry later.")
+        self.retry_after = retry_after
+
+class ModelTaskTimeout(TimeoutError):
+    """Raised when a task runs longer than its time budget."""
+
+class PoolTask(Future):
+    """
+    The Future handed to callers for one call. It follows the worker pool future that
+    currently runs the call, so the call can be moved to a fresh pool when the pool it
+    was on is recycled because of another task.
+    """
+
+    def __init__(self, call, timeout):
+        super().__init__()
+        self.call = call
+        self.timeout = timeout
+        self.inner = None
+        self.executor = None
+        self.started_at = None
+
+    def running(self):
+        inner = self.inner
+        return inner is not None and inner.running()
+
+    def cancel(self):
+        inner = self.inner
+        if inner is not None and not inner.cancel():
+            return False
+        return super().cancel()
+
+# Admission control: running tasks plus queued tasks can never exceed this many slots.
+_slots = threading.BoundedSemaphore(MODEL_POOL_WORKERS + MODEL_POOL_QUEUE_DEPTH)
+_executor = None
+_executor_lock = threading.RLock()
+_tasks = set()      # PoolTasks that are not done yet, checked by the watchdog
+_watchdog = None
+
+def _get_executor():
+    """
+    Return the shared process pool, creating it on first use.
+    The fork server start method is used where available so workers do not inherit
+    the web server's threads or open database connections.
+    """
+    with _executor_lock:
+        return _get_executor_locked()
+
+def _get_executor_locked():
+    global _executor
+    if _executor is not None and getattr(_executor, "_broken", False):
+        _executor = None  # a worker died unexpectedly; the old pool cannot take new tasks
+    if _executor is None:
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(WORKER_PRELOAD)
+        else:
+            context = multiprocessing.get_context()
+        _executor = ProcessPoolExecutor(max_workers=MODEL_POOL_WORKERS, mp_context=context)
+    return _executor
+
+def _settle(task, inner):
+    """Copy the outcome of a pool future to its task, unless the task has moved to another pool since."""
+    if inner is not task.inner:
+        return
+    try:
+        if inner.cancelled():
+            Future.cancel(task)
+        elif inner.exception() is not None:
+            task.set_exception(inner.exception())
+        else:
+            task.set_result(inner.result())
+    except InvalidStateError:
+        pass  # the task was already failed by the watchdog or cancelled
+
+def _dispatch(task, executor):
+    """Run a task's call on a pool (caller holds _executor_lock)."""
+    func, args, kwargs = task.call
+    inner = executor.submit(_run_with_timeout, task.timeout, func, args, kwargs)
+    task.inner, task.executor, task.started_at = inner, executor, None
+    inner.add_done_callback(lambda f: _settle(task, f))
+
+def _recycle_executor(task):
+    """
+    Kill the workers of the pool whose task overran its hard deadline. That task fails
+    with ModelTaskTimeout; every other unfinished task of the pool is resubmitted to a
+    fresh pool (tasks that were running start over).
+    """
+    global _executor
+    with _executor_lock:
+        executor = task.executor
+        if task.done() or executor is None:
+            return
+        if _executor is executor:
+            _executor = None
+        moved = [other for other in _tasks if other is not task and other.executor is executor and not other.done()]
+        if moved:
+            fresh = _get_executor_locked()
+            for other in moved:
+                _dispatch(other, fresh)
+        task.inner = None
+    print(f"Recycling 3D model worker pool after a task exceeded its deadline ({len(moved)} other tasks resubmitted)")
+    try:
+        task.set_exception(ModelTaskTimeout(f"Task exceeded {task.timeout:.0f}s time limit"))
+    except InvalidStateError:
+        pass
+    for process in (getattr(executor, "_processes", None) or {}).values():
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def _watch():
+    """
+    Watchdog thread: fails and recycles tasks that run longer than their timeout plus
+    MODEL_TASK_GRACE (e.g. stuck inside a C extension where the in-worker alarm cannot
+    fire). Time spent queued does not count: the clock starts when a task is first seen running.
+    """
+    while True:
+        time.sleep(MODEL_WATCHDOG_INTERVAL)
+        with _executor_lock:
+            tasks = list(_tasks)
+        now = time.monotonic()
+        for task in tasks:
+            if task.done() or not task.running():
+                continue
+            if task.started_at is None:
+                task.started_at = now
+            elif task.timeout and now - task.started_at > task.timeout + MODEL_TASK_GRACE:
+                _recycle_executor(task)
+
+def _start_watchdog():
+    global _watchdog
+    with _executor_lock:
+        if _watchdog is None or not _watchdog.is_alive():
+            _watchdog = threading.Thread(target=_watch, name="model-pool-watchdog", daemon=True)
+            _watchdog.start()
+
+def _run_with_timeout(timeout, func, args, kwargs):
+    """
+    Runs inside the worker process: call func with a SIGALRM based time limit
+    so a pathological input aborts without taking the worker down with it.
+    """
+    if not hasattr(signal, "SIGALRM") or not timeout:
+        return func(*args, **kwargs)
+
+    def on_alarm(signum, frame):
+        raise ModelTaskTimeout(f"Task exceeded {timeout:.0f}s time limit")
+
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def _finished(task):
+    with _executor_lock:
+        _tasks.discard(task)
+    _slots.release()
+
+def submit_many(calls, timeout=MODEL_TASK_TIMEOUT):
+    """
+    Submit several (func, args, kwargs) calls, keyed like the input dictionary.
+    Either every call is admitted or none is: if the pool does not have enough free
+    slots, PoolSaturatedError is raised and nothing is submitted.
+    Returns a dictionary of key -> PoolTask (a Future).
+    """
+    acquired = 0
+    for _ in calls:
+        if not _slots.acquire(blocking=False):
+            for _ in range(acquired):
+                _slots.release()
+            raise PoolSaturatedError()
+        acquired += 1
+
+    _start_watchdog()
+    futures = {}
+    try:
+        with _executor_lock:
+            executor = _get_executor_locked()
+            for key, call in calls.items():
+                task = PoolTask(call, timeout)
+                _dispatch(task, executor)
+                _tasks.add(task)
+                futures[key] = task
+                acquired -= 1
+    finally:
+        for _ in range(acquired):
+            _slots.release()
+    for task in futures.values():
+        task.add_done_callback(_finished)
+    return futures
+
+def submit(func, *args, timeout=MODEL_TASK_TIMEOUT, **kwargs):
+    """Submit a single call to the pool. See submit_many."""
+    return submit_many({0: (func, args, kwargs)}, timeout=timeout)[0]
+
+def wait_result(future):
+    """
+    Wait for a task's result. A task that overruns its hard deadline is failed by the
+    watchdog with ModelTaskTimeout.
+    """
+    return future.result()
@@ -0,0 +1,34 @@
+# --- Level-of-detail presets for the exported GLB ---
+# simplify_tolerance : Douglas-Peucker tolerance (pixels) applied to wall and path outlines
+# buffer_resolution  : segments per quarter circle used when rounding wall corners
+# sphere_subdivisions: icosphere subdivisions for regular room markers
+# teardrop_points    : points on the arc of the connected-room teardrop markers
+# text_tolerance     : simplification tolerance for the text label outlines
+# quantize           : emit KHR_mesh_quantization (int16 positions, int8 normals)
+LOD_SETTINGS = {
+    "high": {
+        "simplify_tolerance": 0.0,
+        "buffer_resolution": 16,
+        "sphere_subdivisions": 2,
+        "teardrop_points": 50,
+        "text_tolerance": 0.0,
+        "quantize": False,
+    },
+    "medium": {
+        "simplify_tolerance": 1.0,
+        "buffer_resolution": 6,
+        "sphere_subdivisions": 1,
+        "teardrop_points": 20,
+        "text_tolerance": 0.2,
+        "quantize": True,
+    },
+    "low": {
+        "simplify_tolerance": 2.5,
+        "buffer_resolution": 3,
+        "sphere_subdivisions": 0,
+        "teardrop_points": 10,
+        "text_tolerance": 0.5,
+        "quantize": True,
+    },
+}
+DEFAULT_LOD = "high"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, LargeBinary, DateTime, Float
+from sqlalchemy import Column, Integer, String, Text, LargeBinary, DateTime, Float, Index, ForeignKey, UniqueConstraint
 from datetime import datetime
 from config import Base
 
@@ -22,5 +22,124 @@ class Landmark(Base):
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
 
+# The stacked multi-floor GLB of a landmark (see services/building_model.py)
+class BuildingModel(Base):
+    __tablename__ = 'building_models'
+
+    id = Column(Integer, primary_key=True, index=True)
+    landmark = Column(String, nullable=False, unique=True)
+    content = Column(LargeBinary, nullable=False)
+    timestamp = Column(DateTime, default=datetime.utcnow)
+    options = Column(Text, nullable=True)   # JSON floor_height/elevations/lod it was built with
+
+# 3D model jobs of one floor (see services/model_jobs.py), shared by every server worker.
+# The id is a hash of the job's inputs; created and finished are epoch seconds.
+class ModelJob(Base):
+    __tablename__ = 'model_jobs'
+
+    id = Column(String, primary_key=True)
+    status = Column(String, nullable=False)   # queued, running, done or failed
+    floor = Column(String, nullable=True)
+    landmark = Column(String, nullable=True)
+    lod = Column(String, nullable=False)
+    created = Column(Float, nullable=False)
+    finished = Column(Float, nullable=True)
+    error = Column(Text, nullable=True)
+    timed_out = Column(Integer, nullable=False, default=0)
+    result = Column(LargeBinary, nullable=True)
+
+# Artifacts derived from a floor file at upload time (see services/floor_ingest.py).
+# source_id and source_timestamp identify the version of the file they were built from.
+class FloorArtifact(Base):
+    __tablename__ = 'floor_artifacts'
+
+    id = Column(Integer, primary_key=True, index=True)
+    landmark = Column(String, nullable=False)
+    floor = Column(String, nullable=False)
+    kind = Column(String, nullable=False)
+    source_id = Column(Integer, nullable=False)
+    source_timestamp = Column(DateTime, nullable=False)
+    content = Column(LargeBinary, nullable=False)
+    build_seconds = Column(Float, nullable=False)
+    timestamp = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index('ix_floor_artifacts_floor_kind', 'landmark', 'floor', 'kind'),)
+
+# Navigation data of the latest model file of each floor, as rows (see services/floor_tables.py).
+# The model file stays the exchange format; these tables are rebuilt from it on upload.
+class Floor(Base):
+    __tablename__ = 'floors'
+
+    id = Column(Integer, primary_key=True, index=True)
+    landmark = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+    source_id = Column(Integer, nullable=False)
+    source_timestamp = Column(DateTime, nullable=False)
+    kinds_version = Column(String)  # floor_tables.NODE_KINDS_VERSION the node kinds were derived with
+
+    __table_args__ = (UniqueConstraint('landmark', 'name', name='uq_floors_landmark_name'),)
+
+class Node(Base):
+    __tablename__ = 'nodes'
+
+    id = Column(Integer, primary_key=True)
+    floor_id = Column(Integer, ForeignKey('floors.id', ondelete='CASCADE'), nullable=False)
+    name = Column(String, nullable=False)
+    x = Column(Integer, nullable=False)
+    y = Column(Integer, nullable=False)
+    kind = Column(String, nullable=False)
+
+    __table_args__ = (Index('ix_nodes_floor_name', 'floor_id', 'name'),
+                      Index('ix_nodes_name', 'name'),
+                      Index('ix_nodes_kind', 'kind', 'floor_id'))
+
+# One generated path of a floor; its cells are stored as edges
+class FloorPath(Base):
+    __tablename__ = 'paths'
+
+    id = Column(Integer, primary_key=True)
+    floor_id = Column(Integer, ForeignKey('floors.id', ondelete='CASCADE'), nullable=False)
+    number = Column(Integer, nullable=False)
+    start_x = Column(Integer, nullable=False)
+    start_y = Column(Integer, nullable=False)
+    end_x = Column(Integer, nullable=False)
+    end_y = Column(Integer, nullable=False)
+    length = Column(Float, nullable=False)
+
+    __table_args__ = (Index('ix_paths_endpoints', 'floor_id', 'start_x', 'start_y', 'end_x', 'end_y'),)
+
+# A straight run of a path: `steps` equal steps from (x1, y1) to (x2, y2)
+class Edge(Base):
+    __tablename__ = 'edges'
+
+    id = Column(Integer, primary_key=True)
+    floor_id = Column(Integer, ForeignKey('floors.id', ondelete='CASCADE'), nullable=False)
+    path = Column(Integer, nullable=False)
+    seq = Column(Integer, nullable=False)
+    x1 = Column(Integer, nullable=False)
+    y1 = Column(Integer, nullable=False)
+    x2 = Column(Integer, nullable=False)
+    y2 = Column(Integer, nullable=False)
+    steps = Column(Integer, nullable=False)
+
+    __table_args__ = (Index('ix_edges_floor_path', 'floor_id', 'path', 'seq'),)
+
+# A blocked part of a floor (see services/closures.py): grid cells, edges between two
+# neighbouring cells and rectangular zones, as JSON lists. Open-ended when expires_at is null.
+class Closure(Base):
+    __tablename__ = 'closures'
+
+    id = Column(Integer, primary_key=True, index=True)
+    landmark = Column(String, nullable=False)
+    floor = Column(String, nullable=False)
+    cells = Column(Text, nullable=False, default="[]")
+    edges = Column(Text, nullable=False, default="[]")
+    zones = Column(Text, nullable=False, default="[]")
+    reason = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime)
+
+    __table_args__ = (Index('ix_closures_landmark', 'landmark', 'expires_at'),)
+
 # 🚫 REMOVE this line when using Supabase (or comment it out)
 # Base.metadata.create_all(bind=engine)
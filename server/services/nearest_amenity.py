@@ -0,0 +1,150 @@
+import io
+import threading
+import numpy as np
+from services import floor_ingest, floor_tables, closures
+
+# landmark -> (BuildingGraph, closure ids, NearestTable of the building around those closures)
+_tables = {}
+_lock = threading.Lock()
+
+
+class NearestTable:
+    """
+    Nearest node of each kind from every vertex of a graph, from one multi-source
+    Dijkstra per kind (the graphs are undirected, so the distance from the nearest
+    source is the distance to it):
+      - dist[k][v]: cost from vertex v to the nearest node of kind k (inf if none is reachable)
+      - source[k][v]: that node's vertex
+      - pred[k][v]: next vertex from v towards it, so the route is a walk along pred
+    kinds_version is the floor_tables.NODE_KINDS_VERSION the node kinds were derived with.
+    """
+
+    def __init__(self, kinds, dist, source, pred, kinds_version=floor_tables.NODE_KINDS_VERSION):
+        self.kinds = list(kinds)
+        self.kinds_version = kinds_version
+        self.row = {kind: i for i, kind in enumerate(self.kinds)}
+        self.dist = dist
+        self.source = source
+        self.pred = pred
+
+    @classmethod
+    def compute(cls, csr, kind_vertices):
+        """kind_vertices: {kind: [vertex, ...]}; kinds without vertices are left out."""
+        from scipy.sparse.csgraph import dijkstra
+
+        kinds = [kind for kind, vertices in kind_vertices.items() if vertices]
+        count = csr.shape[0]
+        dist = np.full((len(kinds), count), np.inf, dtype=np.float32)
+        source = np.full((len(kinds), count), -1, dtype=np.int32)
+        pred = np.full((len(kinds), count), -9999, dtype=np.int32)
+        for row, kind in enumerate(kinds):
+            dist[row], pred[row], source[row] = dijkstra(
+                csr, directed=False, indices=sorted(set(kind_vertices[kind])),
+                min_only=True, return_predecessors=True)
+        return cls(kinds, dist, source, pred)
+
+    def lookup(self, kind, vertex):
+        """(nearest vertex, cost, [vertex, ..., nearest vertex]) or None if there is none."""
+        row = self.row.get(kind)
+        if row is None or not np.isfinite(self.dist[row, vertex]):
+            return None
+        path = [vertex]
+        while self.pred[row, path[-1]] >= 0:
+            path.append(int(self.pred[row, path[-1]]))
+        return int(self.source[row, vertex]), float(self.dist[row, vertex]), path
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, kinds=np.array(self.kinds, dtype=str), kinds_version=np.array(self.kinds_version),
+                            dist=self.dist, source=self.source, pred=self.pred)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, content):
+        arrays = np.load(io.BytesIO(content), allow_pickle=False)
+        kinds_version = str(arrays["kinds_version"]) if "kinds_version" in arrays.files else None
+        return cls(arrays["kinds"].tolist(), arrays["dist"], arrays["source"], arrays["pred"], kinds_version)
+
+
+def _kind_vertices(named_vertices):
+    """{kind: [vertex]} of the non-room nodes among (node_name, vertex) pairs."""
+    kinds = {}
+    for name, vertex in named_vertices:
+        kind = floor_tables.node_kind(name)
+        if kind != floor_tables.DEFAULT_NODE_KIND:
+            kinds.setdefault(kind, []).append(vertex)
+    return kinds
+
+def floor_table(graph, csr=None):
+    """NearestTable of a FloorGraph (costs in grid cells); built at model ingest."""
+    return NearestTable.compute(graph.csr() if csr is None else csr, _kind_vertices(graph.node_vertex.items()))
+
+def building_table(building):
+    """
+    NearestTable of a BuildingGraph (costs in meters) around its active closures, built
+    once per building graph and again whenever the closures change.
+    """
+    ids = closures.closed_ids(building.landmark)
+    with _lock:
+        cached = _tables.get(building.landmark)
+        if cached is None or cached[0] is not building or cached[1] != ids:
+            named = [(name, building.node_vertex(floor, name))
+                     for floor, nodes in building.nodes.items() for name in nodes]
+            table = NearestTable.compute(closures.building_csr(building), _kind_vertices(named))
+            cached = _tables[building.landmark] = (building, ids, table)
+    return cached[2]
+
+def _node_at(nodes, cell, kind):
+    """Name of a node of the given kind at a cell."""
+    for name, location in nodes.items():
+        if tuple(location) == tuple(cell) and floor_tables.node_kind(name) == kind:
+            return name
+    return None
+
+def nearest_on_floor(landmark_name, floor_name, node_name, kind):
+    """
+    Nearest node of a kind on the same floor, by walking distance along the floor's paths.
+    Returns {"node", "floor", "location", "cost" (cells), "path"} or None; raises KeyError
+    for an unknown floor or node.
+    """
+    graph = floor_ingest.load_floor_graph(landmark_name, floor_name)
+    if graph is None or node_name not in graph.node_vertex:
+        raise KeyError(node_name)
+    if closures.active(landmark_name, floor_name):
+        # the ingest table ignores closures; a floor's table takes milliseconds to redo
+        table = floor_table(graph, closures.floor_csr(landmark_name, floor_name, graph))
+    else:
+        content = floor_ingest.load_artifact(landmark_name, floor_name, floor_ingest.NEAREST_ARTIFACT)
+        table = NearestTable.from_bytes(content) if content is not None else None
+        if table is None or table.kinds_version != floor_tables.NODE_KINDS_VERSION:
+            table = floor_table(graph)  # not ingested yet, or ingested under other kind rules
+    found = table.lookup(kind, graph.node_vertex[node_name])
+    if found is None:
+        return None
+    target, cost, path = found
+    cells = [[int(x), int(y)] for x, y in graph.cells[path]]
+    return {"node": _node_at(graph.nodes, graph.cells[target], kind), "floor": floor_name,
+            "location": cells[-1], "cost": cost, "path": cells}
+
+def nearest_in_building(building, floor_name, node_name, kind):
+    """
+    Nearest node of a kind anywhere in the building (using lifts and stairs), by walking
+    distance. Returns {"node", "floor", "location", "cost" (meters), "legs"} or None;
+    raises KeyError for an unknown floor or node.
+    """
+    vertex = building.node_vertex(floor_name, node_name)
+    if vertex is None:
+        raise KeyError(node_name)
+    found = building_table(building).lookup(kind, vertex)
+    if found is None:
+        return None
+    target, cost, path = found
+    legs = []
+    for v in path:
+        floor, x, y = building.vertices[v]
+        if not legs or legs[-1]["floor"] != floor:
+            legs.append({"floor": floor, "path": []})
+        legs[-1]["path"].append([x, y])
+    floor, x, y = building.vertices[target]
+    return {"node": _node_at(building.nodes[floor], (x, y), kind), "floor": floor,
+            "location": [x, y], "cost": round(cost, 2), "legs": legs}
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+
+# The only module that calls osmnx. Its public API changed between 1.x and 2.x (bounding
+# boxes went from north, south, east, west arguments to a (west, south, east, north) tuple,
+# get_largest_component moved to truncate.largest_component, config() became settings),
+# so each call is made here for the installed major version. Bounding boxes passed in are
+# (north, south, east, west), like the REGIONS of services/outdoor_graph.py.
+SUPPORTED_MAJOR_VERSIONS = (1, 2)
+
+
+def _osmnx():
+    """The osmnx module, checked against the supported versions."""
+    import osmnx as ox
+
+    try:
+        major = int(ox.__version__.split(".")[0])
+    except (AttributeError, ValueError):
+        major = None
+    if major not in SUPPORTED_MAJOR_VERSIONS:
+        raise RuntimeError(f"osmnx {getattr(ox, '__version__', '?')} is not supported "
+                           f"(expected major version {' or '.join(map(str, SUPPORTED_MAJOR_VERSIONS))})")
+    return ox, major
+
+def configure(use_cache=True, log_console=True):
+    """Turn on osmnx's Overpass response cache (server/cache) and console logging."""
+    ox, _ = _osmnx()
+    ox.settings.use_cache = use_cache
+    ox.settings.log_console = log_console
+
+def graph_from_bbox(bbox, network_type):
+    """Download (or read from the cache) the graph of one network type inside a bounding box."""
+    ox, major = _osmnx()
+    north, south, east, west = bbox
+    if major >= 2:
+        return ox.graph_from_bbox((west, south, east, north), network_type=network_type)
+    return ox.graph_from_bbox(north, south, east, west, network_type=network_type)
+
+def graph_from_elements(nodes, ways, bidirectional):
+    """
+    Build an unsimplified graph keeping every component from raw OSM node and way
+    elements (Overpass JSON shape). They are written to a temporary .osm file and read
+    with graph_from_xml, the public entry point for local data.
+    """
+    ox, _ = _osmnx()
+    root = ET.Element("osm", version="0.6")
+    for node in nodes:
+        element = ET.SubElement(root, "node", id=str(node["id"]), lat=str(node["lat"]), lon=str(node["lon"]))
+        for key, value in node.get("tags", {}).items():
+            ET.SubElement(element, "tag", k=key, v=str(value))
+    for way in ways:
+        element = ET.SubElement(root, "way", id=str(way["id"]))
+        for ref in way.get("nodes", []):
+            ET.SubElement(element, "nd", ref=str(ref))
+        for key, value in way.get("tags", {}).items():
+            ET.SubElement(element, "tag", k=key, v=str(value))
+    handle, path = tempfile.mkstemp(suffix=".osm")
+    try:
+        with os.fdopen(handle, "wb") as file:
+            ET.ElementTree(root).write(file, encoding="utf-8", xml_declaration=True)
+        return ox.graph_from_xml(path, bidirectional=bidirectional, simplify=False, retain_all=True)
+    finally:
+        os.remove(path)
+
+def truncate_bbox(graph, bbox):
+    """Keep the part of a graph inside a bounding box (edges crossing it are kept)."""
+    ox, major = _osmnx()
+    north, south, east, west = bbox
+    if major >= 2:
+        return ox.truncate.truncate_graph_bbox(graph, (west, south, east, north), truncate_by_edge=True)
+    return ox.truncate.truncate_graph_bbox(graph, north, south, east, west, truncate_by_edge=True)
+
+def simplify(graph):
+    ox, _ = _osmnx()
+    return ox.simplify_graph(graph)
+
+def largest_component(graph):
+    """The largest weakly connected component of a graph."""
+    ox, major = _osmnx()
+    if major >= 2:
+        return ox.truncate.largest_component(graph)
+    return ox.utils_graph.get_largest_component(graph)
+
+def read_osm_file(osm_file):
+    """Raw node and way elements (Overpass JSON shape) of a local .osm XML extract."""
+    elements = []
+    for _, element in ET.iterparse(osm_file):
+        if element.tag not in ("node", "way"):
+            continue
+        item = {"type": element.tag, "id": int(element.get("id")),
+                "tags": {tag.get("k"): tag.get("v") for tag in element.findall("tag")}}
+        if element.tag == "node":
+            item["lat"], item["lon"] = float(element.get("lat")), float(element.get("lon"))
+        else:
+            item["nodes"] = [int(nd.get("ref")) for nd in element.findall("nd")]
+        elements.append(item)
+        element.clear()
+    return elements
@@ -0,0 +1,280 @@
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from services import graph_artifact, osmnx_compat
+
+# Campus bounding box used for outdoor routing: (north, south, east, west)
+CAMPUS_BBOX = (12.8303, 12.8169, 80.0563, 80.0363)
+NETWORK_TYPES = ("walk", "bike", "drive")
+
+def _load_regions():
+    """
+    Region tiles served by this deployment: {name: (north, south, east, west)}.
+    OUTDOOR_REGIONS holds a JSON object of that shape, or the path of a JSON file with one;
+    the first region is the default. Without it the campus is the only region.
+    """
+    value = os.getenv("OUTDOOR_REGIONS", "").strip()
+    if not value:
+        return {"campus": CAMPUS_BBOX}
+    if not value.startswith("{"):
+        with open(value) as file:
+            value = file.read()
+    return {name: tuple(float(v) for v in bbox) for name, bbox in json.loads(value).items()}
+
+REGIONS = _load_regions()
+DEFAULT_REGION = next(iter(REGIONS))
+# Compiled tiles (and stitched multi-tile graphs) kept in memory per process, least recently used evicted first
+OUTDOOR_TILE_CACHE_SIZE = int(os.getenv("OUTDOOR_TILE_CACHE_SIZE", "8"))
+
+# Travel speeds in km/h used for the "time" edge weight. Drive edges use the OSM
+# maxspeed tag when present, otherwise the default speed of their highway type.
+MODE_SPEEDS = {
+    "walk": float(os.getenv("WALK_SPEED_KMH", "4.8")),
+    "bike": float(os.getenv("BIKE_SPEED_KMH", "14")),
+    "drive": float(os.getenv("DRIVE_SPEED_KMH", "25")),
+}
+DRIVE_HIGHWAY_SPEEDS = {
+    "motorway": 80, "motorway_link": 50, "trunk": 60, "trunk_link": 40,
+    "primary": 50, "primary_link": 35, "secondary": 40, "secondary_link": 30,
+    "tertiary": 30, "tertiary_link": 25, "unclassified": 25, "residential": 20,
+    "living_street": 10, "service": 15,
+}
+
+# (network_type, region) -> prepared networkx MultiDiGraph, shared by every request in this process
+_graphs = {}
+_locks = {mode: threading.Lock() for mode in NETWORK_TYPES}
+# (network_type, regions) -> CompiledGraph used for routing, in least recently used order.
+# Single tiles are memory-mapped from their artifact when present; multi-region keys
+# hold adjacent tiles stitched together.
+_tiles = OrderedDict()
+_tiles_lock = threading.Lock()
+# (network_type, regions) -> lock held while that graph loads, dropped with the graph
+_tile_locks = {}
+
+def parse_maxspeed(value):
+    """
+    Speed in km/h from an OSM maxspeed tag ("50", "30 mph", or a list of those after
+    simplification, in which case the lowest wins). Returns None if nothing parses.
+    """
+    speeds = []
+    for item in value if isinstance(value, list) else [value]:
+        match = re.match(r"\s*(\d+(?:\.\d+)?)\s*(mph)?", str(item))
+        if match:
+            speeds.append(float(match.group(1)) * (1.609344 if match.group(2) else 1.0))
+    return min(speeds) if speeds else None
+
+def edge_speed(mode, data):
+    """Travel speed in km/h for one edge of a graph of the given network type."""
+    if mode != "drive":
+        return MODE_SPEEDS[mode]
+    speed = parse_maxspeed(data["maxspeed"]) if data.get("maxspeed") else None
+    if speed:
+        return speed
+    highways = data.get("highway", [])
+    highways = highways if isinstance(highways, list) else [highways]
+    known = [DRIVE_HIGHWAY_SPEEDS[h] for h in highways if h in DRIVE_HIGHWAY_SPEEDS]
+    return min(known) if known else MODE_SPEEDS["drive"]
+
+def add_travel_times(graph, mode):
+    """Annotate every edge with "time": minutes to travel its length at the mode's speed."""
+    for _, _, data in graph.edges(data=True):
+        data["time"] = data["length"] / (edge_speed(mode, data) * 1000.0 / 60.0)
+    return graph
+
+def load_graph(mode, region=DEFAULT_REGION):
+    """
+    Build the OSM graph of one region for one network type, with travel times on every edge.
+    osmnx serves the Overpass response from server/cache when it is there, but still
+    parses it and builds the graph, which is why the result is kept in memory.
+    """
+    # osmnx is heavy (geopandas, networkx) and only imported by osmnx_compat when no artifact exists
+    osmnx_compat.configure(use_cache=True, log_console=True)
+    start = time.perf_counter()
+    graph = add_travel_times(osmnx_compat.graph_from_bbox(REGIONS[region], mode), mode)
+    print(f"Loaded '{mode}' outdoor graph of '{region}' ({len(graph)} nodes) in {time.perf_counter() - start:.2f}s")
+    return graph
+
+def get_graph(mode, region=DEFAULT_REGION):
+    """
+    Return the resident networkx graph of a region for a network type, loading it on first use.
+    Concurrent first requests for the same mode wait for a single load.
+    """
+    if mode not in NETWORK_TYPES:
+        raise ValueError(f"Unknown mode '{mode}'. Expected one of: {', '.join(NETWORK_TYPES)}")
+    graph = _graphs.get((mode, region))
+    if graph is not None:
+        return graph
+    with _locks[mode]:
+        graph = _graphs.get((mode, region))
+        if graph is None:
+            graph = load_graph(mode, region)
+            _graphs[(mode, region)] = graph
+        return graph
+
+def region_artifact_path(mode, region=DEFAULT_REGION):
+    """Artifact directory of a region tile (the default region keeps the original layout)."""
+    return graph_artifact.artifact_path(mode, region=None if region == DEFAULT_REGION else region)
+
+def load_shared(region=DEFAULT_REGION, reuse=True):
+    """
+    The region's shared multi-mode artifact (compile_outdoor_graph.py --shared), or None.
+    With reuse, the shared graph behind a resident mode view is returned instead of
+    mapping the artifact again, so every mode of a region searches the same arrays.
+    """
+    if reuse:
+        with _tiles_lock:
+            for compiled in _tiles.values():
+                if compiled.parent is not None and compiled.parent.meta.get("region") == region:
+                    return compiled.parent
+    shared = graph_artifact.load_artifact(region_artifact_path(graph_artifact.SHARED_GRAPH, region))
+    if shared is not None:
+        shared.meta["region"] = region
+    return shared
+
+def load_compiled(mode, region=DEFAULT_REGION, shared=None):
+    """
+    Load the compiled graph of one region for one network type: the mode's view of the
+    shared artifact (`shared`, or the region's; False for none) when it has the mode,
+    otherwise the per-mode artifact written by compile_outdoor_graph.py, memory-mapped.
+    Without any artifact the OSM graph is built with osmnx and compiled in memory.
+    """
+    start = time.perf_counter()
+    shared = load_shared(region) if shared is None else shared
+    if shared and mode in shared.meta["modes"]:
+        compiled = shared.for_mode(mode)
+        compiled.meta["region"] = region
+        print(f"Mapped '{mode}' view of the shared outdoor graph of '{region}' ({compiled.edge_count} of "
+              f"{shared.edge_count} edges) in {time.perf_counter() - start:.3f}s")
+        return compiled
+    compiled = graph_artifact.load_artifact(region_artifact_path(mode, region))
+    if compiled is not None:
+        compiled.meta["region"] = region
+        print(f"Mapped '{mode}' outdoor graph artifact of '{region}' ({compiled.node_count} nodes) "
+              f"in {time.perf_counter() - start:.3f}s")
+        return compiled
+    return graph_artifact.compile_graph(load_graph(mode, region), mode, REGIONS[region], source="osmnx",
+                                        region=region)
+
+def _bbox_distance(bbox, lat, lon):
+    north, south, east, west = bbox
+    return max(south - lat, 0, lat - north) + max(west - lon, 0, lon - east)
+
+def region_of(lat, lon):
+    """Region whose bounding box contains a point; points outside every region get the nearest one."""
+    return min(REGIONS, key=lambda name: _bbox_distance(REGIONS[name], lat, lon))
+
+def regions_for(points):
+    """
+    Regions needed to route between [(lat, lon), ...]: the tiles containing the points,
+    plus every tile overlapping the box spanned by them when they lie in different tiles
+    (so routes can pass through the tiles in between). Returned in configuration order.
+    """
+    names = {region_of(lat, lon) for lat, lon in points} or {DEFAULT_REGION}
+    if len(names) > 1:
+        lats, lons = [p[0] for p in points], [p[1] for p in points]
+        north, south, east, west = max(lats), min(lats), max(lons), min(lons)
+        names.update(name for name, (n, s, e, w) in REGIONS.items()
+                     if s <= north and n >= south and w <= east and e >= west)
+    return tuple(name for name in REGIONS if name in names)
+
+def _get_tile(mode, regions):
+    """
+    Return the resident compiled graph covering `regions` (one tile, or adjacent tiles
+    stitched together), loading it on first use and evicting the least recently used
+    graphs beyond OUTDOOR_TILE_CACHE_SIZE.
+    """
+    if mode not in NETWORK_TYPES:
+        raise ValueError(f"Unknown mode '{mode}'. Expected one of: {', '.join(NETWORK_TYPES)}")
+    key = (mode, regions)
+    with _tiles_lock:
+        if key in _tiles:
+            _tiles.move_to_end(key)
+            return _tiles[key]
+        lock = _tile_locks.setdefault(key, threading.Lock())
+    with lock:
+        compiled = _tiles.get(key)
+        if compiled is None:
+            if len(regions) == 1:
+                compiled = load_compiled(mode, regions[0])
+            else:
+                start = time.perf_counter()
+                compiled = graph_artifact.stitch_graphs([_get_tile(mode, (region,)) for region in regions])
+                print(f"Stitched '{mode}' outdoor tiles {', '.join(regions)} ({compiled.node_count} nodes) "
+                      f"in {time.perf_counter() - start:.3f}s")
+            _store_tile(key, compiled)
+        return compiled
+
+def _store_tile(key, compiled):
+    with _tiles_lock:
+        _tiles[key] = compiled
+        _tiles.move_to_end(key)
+        while len(_tiles) > max(OUTDOOR_TILE_CACHE_SIZE, 1):
+            (mode, regions), _ = _tiles.popitem(last=False)
+            _tile_locks.pop((mode, regions), None)
+            print(f"Evicted '{mode}' outdoor graph of {'+'.join(regions)}")
+
+def get_compiled(mode, region=DEFAULT_REGION):
+    """Return the resident compiled graph of a region (default: the default region) for a network type."""
+    return _get_tile(mode, (region,))
+
+def graph_for(mode, points):
+    """Return the compiled graph for routing between [(lat, lon), ...] (see regions_for)."""
+    return _get_tile(mode, regions_for(points))
+
+def is_resident(compiled):
+    """Whether a compiled graph is still held by the tile cache (callers drop tables of evicted graphs)."""
+    with _tiles_lock:
+        return any(graph is compiled for graph in _tiles.values())
+
+def load_artifacts(modes=NETWORK_TYPES):
+    """Memory-map the default region's compiled artifacts that exist on disk. Cheap enough to run at import."""
+    shared = load_shared()
+    for mode in modes:
+        key = (mode, (DEFAULT_REGION,))
+        if key in _tiles:
+            continue
+        if shared is not None and mode in shared.meta["modes"]:
+            compiled = shared.for_mode(mode)
+        else:
+            compiled = graph_artifact.load_artifact(region_artifact_path(mode))
+        if compiled is not None:
+            compiled.meta["region"] = DEFAULT_REGION
+            _store_tile(key, compiled)
+
+def prewarm(modes=NETWORK_TYPES):
+    """Load the default region's routing graphs for the given modes ahead of the first request."""
+    for mode in modes:
+        get_compiled(mode)
+
+def refresh(modes=NETWORK_TYPES):
+    """
+    Reload the routing graphs for the given modes and swap them in: a re-compiled
+    artifact is picked up from disk, otherwise the OSM graph is rebuilt. Requests keep
+    using the previous graph until the new one is ready. Every resident tile (and the
+    default region) is reloaded; stitched graphs are dropped and stitched again on use.
+    """
+    shared = {}   # region -> freshly mapped shared artifact, shared by the modes refreshed here
+    for mode in modes:
+        with _locks[mode]:
+            for key in [key for key in _graphs if key[0] == mode]:
+                del _graphs[key]
+        with _tiles_lock:
+            keys = [key for key in _tiles if key[0] == mode]
+            for key in keys:
+                if len(key[1]) > 1:
+                    del _tiles[key]
+                    _tile_locks.pop(key, None)
+        regions = {key[1][0] for key in keys if len(key[1]) == 1} | {DEFAULT_REGION}
+        for region in regions:
+            if region not in shared:
+                shared[region] = load_shared(region, reuse=False) or False
+            _store_tile((mode, (region,)), load_compiled(mode, region, shared[region]))
+    return list(modes)
+
+def loaded_modes():
+    """Network types that currently have a resident routing graph."""
+    with _tiles_lock:
+        return [mode for mode in NETWORK_TYPES if any(key[0] == mode for key in _tiles)]
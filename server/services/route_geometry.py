@@ -0,0 +1,33 @@
+# Compact encodings of outdoor routes for clients that draw them on their own map.
+RESPONSE_FORMATS = ("html", "geojson", "polyline")
+
+def route_coordinates(graph, path):
+    """[(lat, lon), ...] of the nodes of a path (array indices) in a compiled graph."""
+    return [(float(graph.node_lat[node]), float(graph.node_lon[node])) for node in path]
+
+def encode_polyline(coordinates, precision=5):
+    """
+    Encode [(lat, lon), ...] with the Google encoded polyline algorithm, as understood by
+    Leaflet (polyline plugins), Mapbox and Google Maps.
+    """
+    factor = 10 ** precision
+    encoded = []
+    previous = (0, 0)
+    for lat, lon in coordinates:
+        current = (int(round(lat * factor)), int(round(lon * factor)))
+        for delta in (current[0] - previous[0], current[1] - previous[1]):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                encoded.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            encoded.append(chr(value + 63))
+        previous = current
+    return "".join(encoded)
+
+def route_geojson(coordinates, properties=None):
+    """GeoJSON Feature with a LineString of the route (GeoJSON uses [lon, lat] order)."""
+    return {
+        "type": "Feature",
+        "geometry": {"type": "LineString", "coordinates": [[lon, lat] for lat, lon in coordinates]},
+        "properties": properties or {}
+    }
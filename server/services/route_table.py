@@ -0,0 +1,92 @@
+import time
+import threading
+import numpy as np
+from services import outdoor_graph, landmark_index
+from services.graph_artifact import ROUTING_WEIGHTS
+
+# (network_type, weight, region) -> RouteTable, rebuilt when the graph or the landmarks change
+_tables = {}
+_lock = threading.Lock()
+
+
+class RouteTable:
+    """
+    Shortest routes from every landmark to every graph node for one (mode, weight):
+      - distances: landmark x landmark matrix of route costs (inf when unreachable)
+      - predecessors: landmark x node shortest-path trees (int32, -9999 at the root
+        and for unreachable nodes), so a route is an O(path length) walk back to the root
+    """
+
+    def __init__(self, graph, snapped, weight):
+        from scipy.sparse.csgraph import dijkstra
+
+        self.graph = graph
+        self.snapped = snapped
+        self.weight = weight
+        self.names = list(snapped)
+        self.row = {name: i for i, name in enumerate(self.names)}
+        self.nodes = np.array([snapped[name][2] for name in self.names], dtype=np.int64)
+        if len(self.nodes):
+            dist, predecessors = dijkstra(graph.csr(weight), directed=True, indices=self.nodes,
+                                          return_predecessors=True)
+            self.distances = dist[:, self.nodes]
+            self.predecessors = predecessors.astype(np.int32)
+        else:
+            self.distances = np.zeros((0, 0))
+            self.predecessors = np.zeros((0, graph.node_count), dtype=np.int32)
+
+    def route(self, source, target):
+        """
+        Return (list of node indices, cost) between two landmarks, or (None, inf) if there
+        is no route. Raises KeyError if either name is not in the table (e.g. a landmark
+        added after the table was built).
+        """
+        for name in (source, target):
+            if name not in self.row:
+                raise KeyError(name)
+        row = self.row[source]
+        cost = float(self.distances[row, self.row[target]])
+        if not np.isfinite(cost):
+            return None, float("inf")
+        root, node = self.nodes[row], int(self.nodes[self.row[target]])
+        tree = self.predecessors[row]
+        path = [node]
+        while node != root:
+            node = int(tree[node])
+            path.append(node)
+        path.reverse()
+        return path, cost
+
+
+def get_table(mode, weight, graph=None):
+    """
+    Return the RouteTable for a network type and weight over `graph` (default: the
+    default region's compiled graph), building it on first use or after the compiled graph or
+    the landmarks changed. Returns None for weights that are not precomputed.
+    """
+    if weight not in ROUTING_WEIGHTS:
+        return None
+    graph = outdoor_graph.get_compiled(mode) if graph is None else graph
+    snapped = landmark_index.get_table(mode, graph)
+    key = (mode, weight, graph.meta.get("region"))
+    table = _tables.get(key)
+    if table is not None and table.graph is graph and table.snapped is snapped:
+        return table
+
+    start = time.perf_counter()
+    table = RouteTable(graph, snapped, weight)
+    print(f"Built '{mode}'/'{weight}' landmark route table ({len(table.names)} landmarks) "
+          f"in {time.perf_counter() - start:.3f}s")
+    with _lock:
+        # Tables of evicted region tiles would keep their graphs (and trees) alive
+        for stale in [k for k, t in _tables.items() if not outdoor_graph.is_resident(t.graph)]:
+            del _tables[stale]
+        _tables[key] = table
+    return table
+
+def prewarm(modes=outdoor_graph.NETWORK_TYPES):
+    """Load the outdoor graphs and build every landmark route table ahead of the first request."""
+    outdoor_graph.prewarm(modes)
+    for mode in modes:
+        for weight in ROUTING_WEIGHTS:
+            get_table(mode, weight)
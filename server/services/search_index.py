@@ -0,0 +1,234 @@
+import os
+import re
+import threading
+from collections import defaultdict, namedtuple
+from config import SessionLocal
+from services.models import FileStorage
+from services.utils import load_nodes_from_content
+from services.floor_files import FLOOR_FILE_PATTERN, ModelFileWatch
+from services import landmark_index
+
+# --- Search configuration ---
+SEARCH_MAX_PREFIX = int(os.getenv("SEARCH_MAX_PREFIX", "12"))          # longest token prefix indexed
+SEARCH_MIN_SIMILARITY = float(os.getenv("SEARCH_MIN_SIMILARITY", "0.5"))  # trigram share for fuzzy matches
+SEARCH_MAX_RESULTS = 50
+
+# kind: "landmark" or "node"; floor and location are None for landmarks
+SearchEntry = namedtuple("SearchEntry", ["kind", "name", "landmark", "floor", "location", "key"])
+
+# Ranks of the ways a name can match a query (lower is better)
+EXACT, NAME_PREFIX, WORD_PREFIX, SUBSTRING, FUZZY = range(5)
+
+
+def _normalise(text):
+    return " ".join(str(text).lower().split())
+
+def _words(text):
+    return re.findall(r"\w+", text)
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """
+    In-memory autocomplete index over landmark names and indoor node names.
+    Entries are grouped in documents (the landmark list, or one floor of one landmark)
+    that are replaced as a whole, so a re-uploaded model only re-indexes its floor:
+      - prefixes: every prefix (up to SEARCH_MAX_PREFIX characters) of every word -> entry ids
+      - trigrams: every trigram of every name -> entry ids, for substring and typo matches
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.documents = defaultdict(list)   # document key -> entry ids
+        self.prefixes = defaultdict(set)
+        self.trigrams = defaultdict(set)
+        self.landmarks_etag = None
+        self._next_id = 0
+
+    def replace_document(self, document, entries):
+        """Remove the entries of a document and index `entries` in their place."""
+        for entry_id in self.documents.pop(document, []):
+            entry = self.entries.pop(entry_id)
+            for key in self._prefix_keys(entry.key):
+                self.prefixes[key].discard(entry_id)
+                if not self.prefixes[key]:
+                    del self.prefixes[key]
+            for gram in _trigrams(entry.key):
+                self.trigrams[gram].discard(entry_id)
+                if not self.trigrams[gram]:
+                    del self.trigrams[gram]
+        for entry in entries:
+            entry_id = self._next_id
+            self._next_id += 1
+            self.entries[entry_id] = entry
+            self.documents[document].append(entry_id)
+            for key in self._prefix_keys(entry.key):
+                self.prefixes[key].add(entry_id)
+            for gram in _trigrams(entry.key):
+                self.trigrams[gram].add(entry_id)
+
+    @staticmethod
+    def _prefix_keys(key):
+        return {word[:length] for word in _words(key) for length in range(1, min(len(word), SEARCH_MAX_PREFIX) + 1)}
+
+    def _rank(self, entry, query, words):
+        if entry.key == query:
+            return EXACT
+        if entry.key.startswith(query):
+            return NAME_PREFIX
+        name_words = _words(entry.key)
+        if all(any(w.startswith(q) for w in name_words) for q in words):
+            return WORD_PREFIX
+        if query in entry.key:
+            return SUBSTRING
+        return None
+
+    def search(self, query, limit=10, landmark=None, kind=None):
+        """
+        Ranked matches for a query: exact name, name prefix, every query word a word
+        prefix, substring, then names sharing most of the query's trigrams (typos).
+        Ties go to landmarks before rooms, then shorter names.
+        """
+        query = _normalise(query)
+        if not query:
+            return []
+        words = _words(query)
+        # Entries with a word starting with each query word
+        candidates = None
+        for word in words:
+            ids = self.prefixes.get(word[:SEARCH_MAX_PREFIX], set())
+            candidates = set(ids) if candidates is None else candidates & ids
+        scored = {i: self._rank(self.entries[i], query, words) for i in candidates or ()}
+
+        # Substrings and near misses through shared trigrams
+        grams = _trigrams(query)
+        counts = defaultdict(int)
+        for gram in grams:
+            for entry_id in self.trigrams.get(gram, ()):
+                counts[entry_id] += 1
+        for entry_id, count in counts.items():
+            if scored.get(entry_id) is not None:
+                continue
+            rank = self._rank(self.entries[entry_id], query, words)
+            similarity = count / len(grams)
+            if rank is None and similarity >= SEARCH_MIN_SIMILARITY:
+                rank = FUZZY + 1 - similarity
+            scored[entry_id] = rank
+
+        matches = []
+        for entry_id, rank in scored.items():
+            entry = self.entries[entry_id]
+            if rank is None or (landmark and entry.landmark != landmark) or (kind and entry.kind != kind):
+                continue
+            matches.append((rank, entry.kind != "landmark", len(entry.key), entry.key, entry.floor or "", entry))
+        matches.sort(key=lambda match: match[:5])
+        return [match[-1] for match in matches[:limit]]
+
+
+_index = None
+_lock = threading.Lock()         # guards _index and the searches over it
+_build_lock = threading.Lock()   # one thread builds the index, outside _lock
+_changed_floors = set()          # (landmark, floor) uploaded while the index was being built
+_watch = ModelFileWatch()        # floors whose model files other workers changed
+
+def _landmark_entries(directory):
+    entries = [SearchEntry("landmark", r.landmark_name, r.landmark_name, None, (r.latitude, r.longitude),
+                           _normalise(r.landmark_name)) for r in directory["records"].values()]
+    return entries, directory["etag"]
+
+def _floor_entries(landmark_name, floor_name, content):
+    nodes, _ = load_nodes_from_content(content)
+    return [SearchEntry("node", name, landmark_name, floor_name, location, _normalise(name))
+            for name, location in nodes.items()]
+
+def _latest_model_files(landmark_name=None, floor_name=None):
+    """{(landmark, floor): content} of the latest model file of each floor."""
+    db = SessionLocal()
+    try:
+        # pick the latest version of each floor by its metadata, then load only those contents
+        query = db.query(FileStorage.id, FileStorage.landmark, FileStorage.filename).filter(
+            FileStorage.filename.like("model-%.txt"))
+        if landmark_name is not None:
+            query = query.filter(FileStorage.landmark == landmark_name)
+        if floor_name is not None:
+            query = query.filter(FileStorage.filename == f"model-{floor_name}.txt")
+        latest = {}
+        for file_id, landmark, filename in query.order_by(FileStorage.timestamp.desc()).all():
+            match = FLOOR_FILE_PATTERN.match(filename)
+            if match:
+                latest.setdefault((landmark, match.group(2)), file_id)
+        contents = dict(db.query(FileStorage.id, FileStorage.content).filter(
+            FileStorage.id.in_(list(latest.values()))).all()) if latest else {}
+        return {key: contents[file_id] for key, file_id in latest.items()}
+    finally:
+        db.close()
+
+def _load_floor_entries(landmark_name, floor_name):
+    """Entries of one floor from its latest model file (none if it has no model file)."""
+    content = _latest_model_files(landmark_name, floor_name).get((landmark_name, floor_name))
+    return _floor_entries(landmark_name, floor_name, content) if content is not None else []
+
+def _build_index():
+    index = SearchIndex()
+    entries, index.landmarks_etag = _landmark_entries(landmark_index.get_directory())
+    index.replace_document("landmarks", entries)
+    for (landmark_name, floor_name), content in _latest_model_files().items():
+        index.replace_document((landmark_name, floor_name), _floor_entries(landmark_name, floor_name, content))
+    print(f"Built search index ({len(index.entries)} names)")
+    return index
+
+def _build_and_publish():
+    """Build the index without holding _lock, then re-index the floors uploaded meanwhile and publish it."""
+    global _index
+    with _lock:
+        _changed_floors.clear()
+    index = _build_index()
+    while True:
+        with _lock:
+            changed = list(_changed_floors)
+            _changed_floors.clear()
+            if not changed:
+                _index = index
+                return
+        for landmark_name, floor_name in changed:
+            index.replace_document((landmark_name, floor_name), _load_floor_entries(landmark_name, floor_name))
+
+def get_index():
+    """
+    Return the search index, building it on first use, re-indexing landmarks when they
+    changed and floors whose model files another worker changed.
+    """
+    changed = _watch.changed()
+    if _index is None:
+        with _build_lock:
+            if _index is None:
+                _build_and_publish()
+    for landmark_name, floor_name in changed:
+        refresh_floor(landmark_name, floor_name)
+    directory = landmark_index.get_directory()
+    with _lock:
+        if directory["etag"] != _index.landmarks_etag:
+            entries, _index.landmarks_etag = _landmark_entries(directory)
+            _index.replace_document("landmarks", entries)
+        return _index
+
+def search(query, limit=10, landmark=None, kind=None):
+    """Ranked SearchEntry matches for a query (see SearchIndex.search)."""
+    index = get_index()
+    with _lock:
+        return index.search(query, min(limit, SEARCH_MAX_RESULTS), landmark, kind)
+
+def refresh_floor(landmark_name, floor_name):
+    """Re-index one floor from its latest model file, after the model was uploaded."""
+    with _lock:
+        if _index is None:
+            # a build in progress may have read the previous model; it re-indexes the floor before publishing
+            _changed_floors.add((landmark_name, floor_name))
+            return
+    entries = _load_floor_entries(landmark_name, floor_name)
+    with _lock:
+        if _index is not None:
+            _index.replace_document((landmark_name, floor_name), entries)
@@ -2,6 +2,7 @@ import io
 from PIL import Image, ImageDraw
 import base64
 from math import sqrt
+from ast import literal_eval
 from config import SessionLocal  # Import SessionLocal from config
 from services.models import FileStorage  # Import model for potential future use
 
@@ -79,26 +80,27 @@ def generate_path_image(path, nodes):
 def load_model_from_db(floor_name, landmark_name):
     """
     Fetch nodes and paths from the latest version of the model file
-    for the specified floor and landmark.
+    for the specified floor and landmark (from its compiled floor graph when the
+    upload was ingested, see services/floor_ingest.py).
     """
-    db = SessionLocal()
-    model_filename = f"model-{floor_name}.txt"
-    model_file = db.query(FileStorage).filter(
-        FileStorage.filename == model_filename,
-        FileStorage.landmark == landmark_name
-    ).order_by(FileStorage.timestamp.desc()).first()
-
-    if not model_file:
-        db.close()
+    from services import floor_ingest
+    graph = floor_ingest.load_floor_graph(landmark_name, floor_name)
+    if graph is None:
         return None
+    return {floor_name: {"nodes": graph.nodes, "paths": graph.paths}}
 
+def parse_model_content(content):
+    """
+    Parse the nodes and paths of a model file's content.
+    Returns (nodes, paths): {node_name: (x, y)} and a list of [(x, y), ...] cell lists.
+    """
     nodes = {}
     paths = []
     
-    if isinstance(model_file.content, bytes):
-       lines = model_file.content.decode("utf-8").splitlines()
+    if isinstance(content, bytes):
+       lines = content.decode("utf-8").splitlines()
     else:
-       lines = model_file.content.splitlines()
+       lines = content.splitlines()
 
     section = None
 
@@ -118,30 +120,35 @@ def load_model_from_db(floor_name, landmark_name):
             nodes[node_name] = location
 
         elif section == "paths" and line:
-            path_coords = eval(line.split(": ")[1])
+            path_coords = literal_eval(line.split(": ")[1])
             paths.append(path_coords)
 
-    db.close()
-    return {floor_name: {"nodes": nodes, "paths": paths}}
+    return nodes, paths
 
 def generate_path_image_from_db(path, nodes, floor_name, landmark):
     """
     Generate a base64 image of the path using the latest base map image for the specified floor and landmark.
     """
-    db = SessionLocal()
-    frame_filename = f"mapbase-{floor_name}.png"
-    frame_file = db.query(FileStorage).filter(
-        FileStorage.filename == frame_filename,
-        FileStorage.landmark == landmark
-    ).order_by(FileStorage.timestamp.desc()).first()
-
-    if not frame_file:
+    from services import floor_ingest
+    # The base map already resized to the canvas when it was uploaded, if it was ingested
+    canvas = floor_ingest.load_artifact(landmark, floor_name, floor_ingest.CANVAS_ARTIFACT)
+    if canvas is not None:
+        base_map = Image.open(io.BytesIO(canvas))
+    else:
+        db = SessionLocal()
+        frame_filename = f"mapbase-{floor_name}.png"
+        frame_file = db.query(FileStorage).filter(
+            FileStorage.filename == frame_filename,
+            FileStorage.landmark == landmark
+        ).order_by(FileStorage.timestamp.desc()).first()
         db.close()
-        raise FileNotFoundError(f"Base map image '{frame_filename}' for landmark '{landmark}' not found in the database.")
 
-    # Load the image from the database
-    base_map = Image.open(io.BytesIO(frame_file.content))
-    base_map = base_map.resize((CANVAS_WIDTH, CANVAS_HEIGHT))
+        if not frame_file:
+            raise FileNotFoundError(f"Base map image '{frame_filename}' for landmark '{landmark}' not found in the database.")
+
+        # Load the image from the database
+        base_map = Image.open(io.BytesIO(frame_file.content))
+        base_map = base_map.resize((CANVAS_WIDTH, CANVAS_HEIGHT))
     draw = ImageDraw.Draw(base_map)
 
     # Draw nodes as yellow circles with offsets
@@ -159,7 +166,6 @@ def generate_path_image_from_db(path, nodes, floor_name, landmark):
     img_io = io.BytesIO()
     base_map.save(img_io, 'PNG')
     img_io.seek(0)
-    db.close()
     return base64.b64encode(img_io.read()).decode('utf-8')
 
 def load_nodes_from_content(content):
@@ -0,0 +1,93 @@
+import os
+import sys
+import math
+import random
+import tempfile
+from datetime import datetime
+import pytest
+
+# The services import config, which creates the (lazy) database engine from DATABASE_URL.
+# Unit tests never connect; the endpoint tests bind the sessions to a SQLite file (see app_client).
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+# No compiled outdoor artifacts: the endpoint tests route on a synthetic street grid
+os.environ["OUTDOOR_ARTIFACT_DIR"] = tempfile.mkdtemp(prefix="outdoor-artifacts-")
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN_DIR = os.path.join(os.path.dirname(SERVER_DIR), "admin")
+sys.path.insert(0, SERVER_DIR)
+
+BBOX = (12.83, 12.81, 80.06, 80.04)
+FLOORS = ("2", "3", "6")
+# Inside the synthetic grid; the floor files of admin/ belong to Tech Park
+LANDMARKS = {"Tech Park": (12.8245, 80.045), "BIO-Tech Block": (12.824, 80.042),
+             "SRM University Building": (12.823, 80.047)}
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    from services.graph_artifact import EARTH_RADIUS_M
+
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+def _grid_graph(seed, size=12, drop=0.15, one_way=0.2):
+    """A jittered street grid; edges are at least as long as the great circle, like real roads."""
+    import networkx as nx
+
+    rng = random.Random(seed)
+    graph = nx.MultiDiGraph()
+    for i in range(size):
+        for j in range(size):
+            graph.add_node(1000 + i * size + j, y=BBOX[1] + 0.0015 * i + rng.uniform(-0.0003, 0.0003),
+                           x=BBOX[3] + 0.0015 * j + rng.uniform(-0.0003, 0.0003))
+    for i in range(size):
+        for j in range(size):
+            u = 1000 + i * size + j
+            for v in ([u + 1] if j + 1 < size else []) + ([u + size] if i + 1 < size else []):
+                if rng.random() < drop:
+                    continue
+                a, b = graph.nodes[u], graph.nodes[v]
+                length = _haversine(a["y"], a["x"], b["y"], b["x"]) * rng.uniform(1.0, 1.4)
+                minutes = length / (rng.uniform(5, 40) * 1000 / 60)
+                pairs = [(u, v)] if rng.random() < one_way else [(u, v), (v, u)]
+                for s, t in pairs:
+                    graph.add_edge(s, t, length=length, time=minutes)
+    return graph
+
+@pytest.fixture(scope="session")
+def grid_graph():
+    """grid_graph(seed, size=12, drop=0.15, one_way=0.2) -> networkx MultiDiGraph inside BBOX."""
+    return _grid_graph
+
+@pytest.fixture(scope="session")
+def app_client(tmp_path_factory):
+    """
+    Flask test client over a SQLite database holding the three landmarks and the Tech Park
+    floor files of admin/, with every outdoor mode routed on a connected synthetic grid.
+    """
+    from sqlalchemy import create_engine
+    import config
+    from services.models import FileStorage, Landmark
+    from services import outdoor_graph
+    from services.graph_artifact import compile_graph
+
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('db') / 'test.db'}")
+    config.Base.metadata.create_all(engine)
+    config.SessionLocal.configure(bind=engine)
+    db = config.SessionLocal()
+    for floor in FLOORS:
+        for filename, file_type in ((f"model-{floor}.txt", "text"), (f"mapbase-{floor}.png", "image")):
+            with open(os.path.join(ADMIN_DIR, filename), "rb") as file:
+                db.add(FileStorage(filename=filename, file_type=file_type, content=file.read(),
+                                   timestamp=datetime.utcnow(), landmark="Tech Park"))
+    for i, (name, (lat, lon)) in enumerate(LANDMARKS.items()):
+        db.add(Landmark(id=f"test-{i}", landmark_name=name, latitude=lat, longitude=lon))
+    db.commit()
+    db.close()
+
+    def load_compiled(mode, region=outdoor_graph.DEFAULT_REGION, shared=None):
+        return compile_graph(_grid_graph(7, drop=0, one_way=0), mode, BBOX, "test", region=region)
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(outdoor_graph, "load_compiled", load_compiled)
+        from app import app
+        yield app.test_client()
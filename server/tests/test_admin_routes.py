@@ -0,0 +1,84 @@
+import io
+import os
+import pytest
+from conftest import ADMIN_DIR
+
+
+@pytest.fixture
+def no_building_builds(monkeypatch):
+    from services import building_model
+
+    queued = []
+    monkeypatch.setattr(building_model, "queue_building_build", lambda landmark, **options: queued.append(landmark))
+    return queued
+
+def _model_file(floor):
+    with open(os.path.join(ADMIN_DIR, f"model-{floor}.txt"), "rb") as file:
+        return file.read()
+
+def _floors_with(app_client, node):
+    results = app_client.get("/api/search", query_string={"q": node, "landmark": "Tech Park"}).json["results"]
+    return sorted(result["floor"] for result in results if result["name"] == node)
+
+def _indoor_floors():
+    from services import indoor_graph
+
+    return sorted(indoor_graph.get_building_graph("Tech Park").nodes)
+
+def test_floor_file_upload_rename_and_delete(app_client, no_building_builds):
+    response = app_client.post("/api/file_storage", content_type="multipart/form-data", data={
+        "landmark": "Tech Park", "file": (io.BytesIO(_model_file("2")), "model-8.txt")})
+    assert response.status_code == 201
+    file_id = response.json["id"]
+    assert _floors_with(app_client, "TP 216") == ["2", "8"]
+    assert "8" in _indoor_floors()
+
+    # renamed away from model-*: the floor is dropped like a deleted one
+    response = app_client.put(f"/api/file_storage/{file_id}", data={"filename": "notes-8.txt"})
+    assert response.status_code == 200
+    assert _floors_with(app_client, "TP 216") == ["2"]
+    assert "8" not in _indoor_floors()
+
+    assert app_client.put(f"/api/file_storage/{file_id}", data={"filename": "model-8.txt"}).status_code == 200
+    assert _floors_with(app_client, "TP 216") == ["2", "8"]
+    assert app_client.delete(f"/api/file_storage/{file_id}").status_code == 200
+    assert _floors_with(app_client, "TP 216") == ["2"]
+    assert "8" not in _indoor_floors()
+    assert no_building_builds == ["Tech Park"] * 4
+
+def test_invalid_model_upload_is_rejected(app_client):
+    response = app_client.post("/api/file_storage", content_type="multipart/form-data", data={
+        "landmark": "Tech Park", "file": (io.BytesIO(b"not a model"), "model-8.txt")})
+    assert response.status_code == 400
+
+def test_closure_reroutes_until_lifted(app_client):
+    from services import indoor_graph
+
+    def nearest_lift():
+        return app_client.get("/api/nearest", query_string={"landmark": "Tech Park", "floor": "2", "node": "TP 216",
+                                                            "kind": "lift"}).json
+
+    before = nearest_lift()
+    lift_cell = list(indoor_graph.get_building_graph("Tech Park").nodes[before["floor"]][before["node"]])
+    response = app_client.post("/api/closures", json={"landmark": "Tech Park", "floor": before["floor"],
+                                                      "cells": [lift_cell], "reason": "maintenance"})
+    assert response.status_code == 201
+    closure_id = response.json["closure"]["id"]
+    try:
+        listed = app_client.get("/api/closures?landmark=Tech Park").json
+        assert [area["id"] for area in listed] == [closure_id]
+        during = nearest_lift()
+        assert (during["floor"], during["node"]) != (before["floor"], before["node"])
+        assert during["cost"] >= before["cost"]
+    finally:
+        assert app_client.delete(f"/api/closures/{closure_id}").status_code == 200
+    assert nearest_lift() == before
+    assert app_client.delete(f"/api/closures/{closure_id}").status_code == 404
+
+@pytest.mark.parametrize("body", [
+    {"floor": "2", "cells": [[1, 1]]},
+    {"landmark": "Tech Park", "floor": "2"},
+    {"landmark": "Tech Park", "floor": "2", "cells": [[1, 1]], "ttl": "soon"},
+])
+def test_closure_rejects_bad_requests(app_client, body):
+    assert app_client.post("/api/closures", json=body).status_code == 400
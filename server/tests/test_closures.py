@@ -0,0 +1,38 @@
+import pytest
+from services.closures import ClosedArea, ClosureError, parse_geometry
+
+
+def _area(cells=(), edges=(), zones=()):
+    return ClosedArea(1, "Tech Park", "2", cells, edges, zones)
+
+def test_blocks_path_through_closed_cell():
+    area = _area(cells=[[5, 5]])
+    assert area.blocks_path([(4, 5), (5, 5), (6, 5)])
+    assert not area.blocks_path([(4, 4), (5, 4), (6, 4)])
+
+def test_blocks_path_through_zone_is_inclusive():
+    area = _area(zones=[[10, 10, 12, 11]])
+    assert area.blocks_path([(9, 11), (10, 11)])
+    assert area.blocks_path([(12, 12), (12, 11)])
+    assert not area.blocks_path([(9, 9), (13, 12)])
+
+def test_blocks_path_edge_in_either_direction():
+    area = _area(edges=[[[3, 3], [4, 3]]])
+    assert area.blocks_path([(2, 3), (3, 3), (4, 3)])
+    assert area.blocks_path([(4, 3), (3, 3)])
+    # both cells are open, only the step between them is closed
+    assert not area.blocks_path([(3, 3), (3, 4), (4, 4), (4, 3)])
+
+def test_parse_geometry_normalises_zones():
+    cells, edges, zones = parse_geometry({"cells": [[1, 2]], "zones": [{"x1": 8, "y1": 9, "x2": 4, "y2": 3}]})
+    assert cells == [[1, 2]] and edges == [] and zones == [[4, 3, 8, 9]]
+
+@pytest.mark.parametrize("data", [
+    {},
+    {"cells": [[500, 2]]},
+    {"edges": [[[1, 1], [3, 1]]]},
+    {"zones": [[1, 2, 3]]},
+])
+def test_parse_geometry_rejects(data):
+    with pytest.raises(ClosureError):
+        parse_geometry(data)
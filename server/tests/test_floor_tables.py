@@ -0,0 +1,25 @@
+import pytest
+from services.floor_tables import compress_path, expand_path, node_kind
+
+
+@pytest.mark.parametrize("path", [
+    [(3, 4)],
+    [(0, 0), (1, 0), (2, 0), (3, 0)],
+    [(0, 0), (1, 1), (2, 2), (2, 3), (2, 4), (1, 4), (0, 5)],
+    [(10, 10), (11, 10), (11, 10), (12, 10)],
+    [(5, 5), (4, 4), (4, 3), (5, 3), (6, 3), (6, 4)],
+])
+def test_compress_path_round_trip(path):
+    assert expand_path(path[0], compress_path(path)) == [tuple(cell) for cell in path]
+
+def test_compress_path_merges_straight_runs():
+    path = [(0, 0), (1, 0), (2, 0), (2, 1), (2, 2), (3, 3)]
+    assert compress_path(path) == [(0, 0, 2, 0, 2), (2, 0, 2, 2, 2), (2, 2, 3, 3, 1)]
+
+def test_node_kind():
+    assert node_kind("Lift 1") == "lift"
+    assert node_kind("Emergency Exit") == "exit"
+    assert node_kind("Main Gate") == "entrance"
+    assert node_kind("Gents Washroom") == "restroom"
+    assert node_kind("Hall 2 [Lab]") == "lab"
+    assert node_kind("TP 216") == "room"
@@ -0,0 +1,55 @@
+import random
+import numpy as np
+import pytest
+from services.graph_artifact import MODE_BITS, compile_graph, merge_mode_graphs
+from conftest import BBOX
+
+
+@pytest.fixture(scope="module")
+def compiled(grid_graph):
+    return compile_graph(grid_graph(1), "walk", BBOX, "test")
+
+@pytest.mark.parametrize("weight", ["length", "time"])
+def test_astar_matches_dijkstra(compiled, weight):
+    from scipy.sparse.csgraph import dijkstra
+
+    rng = random.Random(2)
+    for _ in range(60):
+        source, target = rng.randrange(compiled.node_count), rng.randrange(compiled.node_count)
+        expected = dijkstra(compiled.csr(weight), directed=True, indices=source)[target]
+        path, cost, settled = compiled.astar(source, target, weight)
+        if not np.isfinite(expected):
+            assert path is None and cost == float("inf")
+            continue
+        assert cost == pytest.approx(expected)
+        assert path[0] == source and path[-1] == target
+        assert compiled.path_weight(path, weight) == pytest.approx(expected)
+        assert settled <= compiled.node_count * 2
+
+def test_astar_same_node(compiled):
+    assert compiled.astar(5, 5, "length") == ([5], 0.0, 1)
+
+def test_merged_mode_views_match_mode_graphs(grid_graph):
+    from scipy.sparse.csgraph import dijkstra
+
+    graphs = {mode: compile_graph(grid_graph(seed), mode, BBOX, "test")
+              for seed, mode in ((3, "walk"), (4, "bike"), (5, "drive"))}
+    shared = merge_mode_graphs(graphs)
+    assert set(np.unique(shared.mode_mask)) <= set(range(1, sum(MODE_BITS.values()) + 1))
+    for mode, graph in graphs.items():
+        view = shared.for_mode(mode)
+        assert view.edge_count == graph.edge_count
+        # same nodes (the shared graph holds the union, sorted by OSM id)
+        nodes = [view.node_index(osmid) for osmid in graph.node_osmid]
+        for weight in ("length", "time"):
+            for source in (0, 17, 60):
+                expected = dijkstra(graph.csr(weight), directed=True, indices=source)
+                actual = dijkstra(view.csr(weight), directed=True, indices=nodes[source])[nodes]
+                np.testing.assert_allclose(actual, expected)
+        u, v = 0, int(graph.indices[graph.indptr[0]])
+        assert view.edge_weight(nodes[u], nodes[v], "length") == pytest.approx(graph.edge_weight(u, v, "length"))
+
+def test_for_mode_rejects_missing_mode(grid_graph):
+    shared = merge_mode_graphs({"walk": compile_graph(grid_graph(6), "walk", BBOX, "test")})
+    with pytest.raises(ValueError):
+        shared.for_mode("drive")
@@ -0,0 +1,23 @@
+from sqlalchemy import create_engine, inspect, text
+from init_db import init_db, missing_columns
+
+
+def test_init_db_adds_missing_nullable_columns(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        # building_models as created before the build options were stored
+        connection.execute(text("CREATE TABLE building_models (id INTEGER PRIMARY KEY, landmark VARCHAR NOT NULL UNIQUE, "
+                                "content BLOB NOT NULL, timestamp DATETIME)"))
+    assert [column.name for column in missing_columns(engine)] == ["options"]
+
+    init_db(engine)
+    inspector = inspect(engine)
+    assert "options" in {column["name"] for column in inspector.get_columns("building_models")}
+    assert {"floors", "model_jobs", "file_storage"} <= set(inspector.get_table_names())
+    assert missing_columns(engine) == []
+    init_db(engine)   # running it again changes nothing
+
+def test_init_db_dry_run_changes_nothing(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    init_db(engine, dry_run=True)
+    assert inspect(engine).get_table_names() == []
@@ -0,0 +1,187 @@
+import io
+import time
+import base64
+import pytest
+from services import model_jobs
+from services.models import ModelJob
+
+
+def _png():
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (120, 80), "white")
+    ImageDraw.Draw(image).rectangle((20, 20, 100, 60), outline="black", width=3)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+def test_model_job_requires_fields(app_client):
+    response = app_client.post("/api/model_jobs", json={"floor": "2", "landmark": "Tech Park"})
+    assert response.status_code == 400
+
+def test_model_job_round_trip(app_client):
+    body = {"floor": "2", "landmark": "Tech Park", "image": _png(), "lod": "low"}
+    response = app_client.post("/api/model_jobs", json=body)
+    assert response.status_code in (200, 202)
+    job_id = response.json["job_id"]
+    assert response.headers["Location"] == f"/api/model_jobs/{job_id}"
+
+    status = app_client.get(f"/api/model_jobs/{job_id}?wait=20").json
+    assert status["status"] == "done"
+    result = app_client.get(status["result_url"])
+    assert result.status_code == 200 and result.mimetype == "model/gltf-binary"
+    assert result.data[:4] == b"glTF"
+    # identical inputs reuse the finished job
+    again = app_client.post("/api/model_jobs", json=body)
+    assert again.status_code == 200 and again.json["job_id"] == job_id
+
+def test_model_job_stored_by_another_worker(app_client):
+    import config
+
+    db = config.SessionLocal()
+    db.add(ModelJob(id="other-worker-job", status="done", floor="3", landmark="Tech Park", lod="low",
+                    created=time.time() - 5, finished=time.time(), result=b"glTF-bytes"))
+    db.commit()
+    db.close()
+    assert model_jobs.get_job("other-worker-job")["status"] == "done"
+    assert app_client.get("/api/model_jobs/other-worker-job").json["status"] == "done"
+    assert app_client.get("/api/model_jobs/other-worker-job/result").data == b"glTF-bytes"
+
+def test_model_job_unknown(app_client):
+    assert app_client.get("/api/model_jobs/missing").status_code == 404
+    assert app_client.get("/api/model_jobs/missing/result").status_code == 404
+
+def _search_floors(app_client, query):
+    response = app_client.get("/api/search", query_string={"q": query, "landmark": "Tech Park", "type": "node"})
+    assert response.status_code == 200
+    return sorted(result["floor"] for result in response.json["results"] if result["name"] == query)
+
+def test_search_endpoint(app_client):
+    results = app_client.get("/api/search?q=tech").json["results"]
+    assert results[0] == {"type": "landmark", "name": "Tech Park", "landmark": "Tech Park",
+                          "floor": None, "location": [12.8245, 80.045]}
+    assert _search_floors(app_client, "TP 216") == ["2"]
+    assert app_client.get("/api/search?q=tp&type=room").status_code == 400
+    assert app_client.get("/api/search?q=tp&limit=x").status_code == 400
+
+def test_search_sees_model_files_of_other_workers(app_client, monkeypatch):
+    import config
+    from datetime import datetime
+    from services import floor_files
+    from services.models import FileStorage
+
+    monkeypatch.setattr(floor_files, "FLOOR_FILE_POLL_SECONDS", 0)
+    _search_floors(app_client, "TP 216")
+    db = config.SessionLocal()
+    content = db.query(FileStorage.content).filter(FileStorage.filename == "model-2.txt").scalar()
+    # stored directly, as another worker would, so this worker's refresh_floor never runs
+    copy = FileStorage(filename="model-9.txt", file_type="text", content=content,
+                       timestamp=datetime.utcnow(), landmark="Tech Park")
+    db.add(copy)
+    db.commit()
+    try:
+        assert _search_floors(app_client, "TP 216") == ["2", "9"]
+    finally:
+        db.delete(copy)
+        db.commit()
+        db.close()
+    assert _search_floors(app_client, "TP 216") == ["2"]
+
+def _batch(app_client, pairs, **options):
+    import json
+
+    response = app_client.post("/api/batch_path", json={"landmark": "Tech Park", "pairs": pairs, **options})
+    assert response.status_code == 200 and response.mimetype == "application/x-ndjson"
+    return sorted((json.loads(line) for line in response.data.decode().splitlines()), key=lambda r: r["index"])
+
+def test_batch_path_costs_match_dijkstra(app_client):
+    from scipy.sparse.csgraph import dijkstra
+    from services import indoor_graph
+
+    pairs = [{"start": "TP 216", "start_floor": "2", "end": "TP 214", "end_floor": "2"},
+             {"start": "TP 216", "start_floor": "2", "end": "TP 305", "end_floor": "3"},
+             {"start": "TP 305", "start_floor": "3", "end": "TP 216", "end_floor": "2"}]
+    results = _batch(app_client, pairs)
+    building = indoor_graph.get_building_graph("Tech Park")
+    for pair, result in zip(pairs, results):
+        source = building.node_vertex(pair["start_floor"], pair["start"])
+        target = building.node_vertex(pair["end_floor"], pair["end"])
+        assert result["cost"] == pytest.approx(dijkstra(building.csr, directed=False, indices=source)[target], abs=0.01)
+        assert result["legs"][0]["floor"] == pair["start_floor"] and result["legs"][-1]["floor"] == pair["end_floor"]
+    assert [leg["floor"] for leg in results[1]["legs"]] == ["2", "3"]
+    costs_only = _batch(app_client, pairs[:1], include_path=False)[0]
+    assert "legs" not in costs_only and costs_only["cost"] == results[0]["cost"]
+
+def test_batch_path_reports_bad_pairs_per_line(app_client):
+    results = _batch(app_client, [{"start": "TP 216", "start_floor": "2"},
+                                  {"start": "TP 216", "start_floor": "2", "end": "Nowhere", "end_floor": "2"},
+                                  "not a pair"])
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert all(result["cost"] is None and result["error"] for result in results)
+
+def test_batch_path_rejects_bad_requests(app_client):
+    assert app_client.post("/api/batch_path", json={"pairs": [{}]}).status_code == 400
+    assert app_client.post("/api/batch_path", json={"landmark": "Tech Park", "pairs": []}).status_code == 400
+    assert app_client.post("/api/batch_path", json={"landmark": "Nowhere", "pairs": [{}]}).status_code == 404
+
+def _nearest(app_client, **query):
+    return app_client.get("/api/nearest", query_string={"landmark": "Tech Park", "floor": "2", "node": "TP 216", **query})
+
+@pytest.mark.parametrize("kind, scope", [("lift", "floor"), ("lift", "building"), ("restroom", "building"),
+                                         ("stairs", "floor")])
+def test_nearest_matches_brute_force(app_client, kind, scope):
+    from scipy.sparse.csgraph import dijkstra
+    from services import indoor_graph
+    from services.floor_tables import node_kind
+
+    response = _nearest(app_client, kind=kind, scope=scope)
+    assert response.status_code == 200
+    body = response.json
+    building = indoor_graph.get_building_graph("Tech Park")
+    dist = dijkstra(building.csr, directed=False, indices=building.node_vertex("2", "TP 216"))
+    candidates = [(floor, name) for floor, nodes in building.nodes.items() for name in nodes
+                  if node_kind(name) == kind and (scope == "building" or floor == "2")]
+    expected = min(dist[building.node_vertex(floor, name)] for floor, name in candidates)
+    assert body["cost"] == pytest.approx(expected, abs=0.01)
+    assert node_kind(body["node"]) == kind
+    assert body["legs"][0]["path"][0] == list(building.nodes["2"]["TP 216"])
+    assert body["legs"][-1]["floor"] == body["floor"]
+
+def test_nearest_rejects_bad_requests(app_client):
+    assert _nearest(app_client).status_code == 400
+    assert _nearest(app_client, kind="lift", scope="campus").status_code == 400
+    assert _nearest(app_client, kind="lift", node="Nowhere").status_code == 404
+    assert _nearest(app_client, kind="helipad").status_code == 404
+
+def test_events_stream_versions_and_closure_changes(app_client):
+    import json
+    from services import landmark_events
+
+    def event(chunks):
+        chunk = next(chunks)
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode()
+        lines = [line for line in chunk.splitlines() if line.startswith(("event:", "data:"))]
+        return lines[0].split(": ", 1)[1], json.loads(lines[1].split(": ", 1)[1])
+
+    response = app_client.get("/api/events?landmark=Tech Park", buffered=False)
+    assert response.status_code == 200 and response.mimetype == "text/event-stream"
+    chunks = iter(response.response)
+    name, versions = event(chunks)
+    assert name == "versions" and sorted(versions["models"]) == ["2", "3", "6"]
+    assert versions["closures"] == {"version": None, "ids": []}
+
+    created = app_client.post("/api/closures", json={"landmark": "Tech Park", "floor": "2", "cells": [[1, 1]]})
+    closure_id = created.json["closure"]["id"]
+    try:
+        name, data = event(chunks)
+        assert name == "closures" and data["ids"] == [closure_id]
+    finally:
+        app_client.delete(f"/api/closures/{closure_id}")
+    name, data = event(chunks)
+    assert name == "closures" and data == {"landmark": "Tech Park", "version": None, "ids": []}
+    response.close()
+    assert not landmark_events._subscribers.get("Tech Park")
+
+def test_events_requires_landmark(app_client):
+    assert app_client.get("/api/events").status_code == 400
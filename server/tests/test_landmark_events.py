@@ -0,0 +1,30 @@
+from services.landmark_events import _changes, _format
+
+
+def _versions(models=None, mapbases=None, closures=None, ids=()):
+    return {"models": models or {}, "mapbases": mapbases or {},
+            "closures": {"version": closures, "ids": list(ids)}}
+
+def test_no_changes():
+    versions = _versions({"2": "t1"}, {"2": "t1"}, "abc", [1])
+    assert _changes("Tech Park", versions, _versions({"2": "t1"}, {"2": "t1"}, "abc", [1])) == []
+
+def test_changed_added_and_removed_floors():
+    old = _versions({"2": "t1", "3": "t1"}, {"2": "t1"})
+    new = _versions({"2": "t2", "6": "t2"}, {"2": "t1"})
+    assert _changes("Tech Park", old, new) == [
+        ("model", {"landmark": "Tech Park", "floor": "2", "version": "t2"}),
+        ("model", {"landmark": "Tech Park", "floor": "3", "version": None}),
+        ("model", {"landmark": "Tech Park", "floor": "6", "version": "t2"}),
+    ]
+
+def test_mapbase_and_closure_changes():
+    old = _versions(mapbases={"2": "t1"})
+    new = _versions(mapbases={"2": "t2"}, closures="abc", ids=[4, 7])
+    assert _changes("Tech Park", old, new) == [
+        ("mapbase", {"landmark": "Tech Park", "floor": "2", "version": "t2"}),
+        ("closures", {"landmark": "Tech Park", "version": "abc", "ids": [4, 7]}),
+    ]
+
+def test_format():
+    assert _format("model", {"floor": "2"}) == 'event: model\ndata: {"floor": "2"}\n\n'
@@ -0,0 +1,97 @@
+import pytest
+
+
+@pytest.mark.parametrize("body, error", [
+    ({}, "Missing required fields: source, target, optimizer, mode"),
+    ({"source": "Tech Park", "target": "BIO-Tech Block", "mode": "walk"}, "Missing required fields: optimizer"),
+    ({"source": "Tech Park", "target": "BIO-Tech Block", "mode": "walk", "optimizer": "fastest"},
+     "Invalid optimizer 'fastest'. Expected length or time"),
+    ({"source": "Tech Park", "target": "BIO-Tech Block", "mode": "boat", "optimizer": "length"},
+     "Invalid mode 'boat'. Expected one of: walk, bike, drive"),
+    ({"source": ["Tech Park"], "target": "BIO-Tech Block", "mode": "walk", "optimizer": "length"},
+     "source and target must be landmark names"),
+])
+def test_distance_rejects_bad_requests(app_client, body, error):
+    response = app_client.post("/api/distance", json=body)
+    assert response.status_code == 400
+    assert response.json["error"] == error
+
+def test_distance_unknown_landmark(app_client):
+    response = app_client.post("/api/distance", json={"source": "Tech Park", "target": "Nowhere",
+                                                      "mode": "walk", "optimizer": "length"})
+    assert response.status_code == 404
+
+@pytest.mark.parametrize("optimizer, unit", [("length", "meters"), ("time", "minutes")])
+def test_distance_map(app_client, optimizer, unit):
+    response = app_client.post("/api/distance", json={"source": "Tech Park", "target": "SRM University Building",
+                                                      "mode": "walk", "optimizer": optimizer})
+    assert response.status_code == 200
+    assert unit in response.json["info"]
+    assert response.json["html_content"]
+
+def test_distance_matrix_matches_single_searches(app_client):
+    from services import outdoor_graph
+
+    names = ["Tech Park", "BIO-Tech Block", {"lat": 12.823, "lon": 80.047}]
+    response = app_client.post("/api/distance_matrix", json={"sources": names, "optimizer": "length"})
+    assert response.status_code == 200
+    body = response.json
+    assert body["unit"] == "meters" and len(body["matrix"]) == 3 and len(body["matrix"][0]) == 3
+    graph = outdoor_graph.get_compiled("walk")
+    for i, source in enumerate(body["sources"]):
+        for j, target in enumerate(body["targets"]):
+            u, v = graph.nearest_nodes([source["lat"], target["lat"]], [source["lon"], target["lon"]])
+            _, cost, _ = graph.astar(int(u), int(v), "length")
+            assert body["matrix"][i][j] == pytest.approx(cost, abs=0.01)
+    assert all(body["matrix"][i][i] == 0 for i in range(3))
+
+@pytest.mark.parametrize("body", [
+    {"sources": []},
+    {"sources": ["Tech Park"], "optimizer": "fastest"},
+    {"sources": ["Tech Park"], "mode": "boat"},
+    {"sources": ["Nowhere"]},
+    {"sources": [[12.8]]},
+])
+def test_distance_matrix_rejects_bad_requests(app_client, body):
+    assert app_client.post("/api/distance_matrix", json=body).status_code == 400
+
+@pytest.mark.parametrize("response_format", ["geojson", "polyline", "xml"])
+def test_distance_route_formats(app_client, response_format):
+    response = app_client.post("/api/distance", json={"source": "Tech Park", "target": "SRM University Building",
+                                                      "mode": "walk", "optimizer": "length",
+                                                      "format": response_format})
+    if response_format == "xml":
+        assert response.status_code == 400
+        return
+    assert response.status_code == 200
+    body = response.json
+    assert body["distance"] > 0 and "html_content" not in body
+    if response_format == "geojson":
+        assert body["route"]["geometry"]["type"] == "LineString"
+        assert body["route"]["properties"]["distance"] == body["distance"]
+    else:
+        assert isinstance(body["polyline"], str) and body["polyline"]
+
+def test_journey_from_a_room_to_another_landmark(app_client):
+    response = app_client.post("/api/journey", json={
+        "source": {"landmark": "Tech Park", "floor": "3", "node": "TP 305"}, "target": "SRM University Building"})
+    assert response.status_code == 200
+    body = response.json
+    legs = body["legs"]
+    assert legs[0]["type"] == "indoor" and legs[0]["floor"] == "3" and legs[0]["path"][0] == [141, 39]
+    assert legs[-1]["type"] == "outdoor" and legs[-1]["polyline"]
+    assert body["cost"] == pytest.approx(sum(leg["cost"] for leg in legs), abs=0.1)
+    # the stitched graph is cached: the same request gives the same route
+    assert app_client.post("/api/journey", json={
+        "source": {"landmark": "Tech Park", "floor": "3", "node": "TP 305"},
+        "target": "SRM University Building"}).json == body
+
+@pytest.mark.parametrize("body, status", [
+    ({"source": "Tech Park"}, 400),
+    ({"source": "Tech Park", "target": {"landmark": "Tech Park", "floor": "2"}}, 400),
+    ({"source": "Tech Park", "target": "BIO-Tech Block", "optimizer": "fastest"}, 400),
+    ({"source": {"landmark": "Tech Park", "floor": "3", "node": "TP 999"}, "target": "BIO-Tech Block"}, 404),
+    ({"source": {"landmark": "BIO-Tech Block", "floor": "1", "node": "Lab"}, "target": "Tech Park"}, 404),
+])
+def test_journey_rejects_bad_endpoints(app_client, body, status):
+    assert app_client.post("/api/journey", json=body).status_code == status
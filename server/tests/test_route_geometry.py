@@ -0,0 +1,38 @@
+import random
+import pytest
+from services.route_geometry import encode_polyline
+
+
+def _decode(encoded, precision=5):
+    values, value, shift = [], 0, 0
+    for char in encoded:
+        byte = ord(char) - 63
+        value |= (byte & 0x1f) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value, shift = 0, 0
+    points, lat, lon = [], 0, 0
+    for dlat, dlon in zip(values[::2], values[1::2]):
+        lat, lon = lat + dlat, lon + dlon
+        points.append((lat / 10 ** precision, lon / 10 ** precision))
+    return points
+
+def test_encode_polyline_reference_example():
+    # the example of the encoded polyline algorithm format documentation
+    points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+    assert encode_polyline(points) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+def test_encode_polyline_empty_and_origin():
+    assert encode_polyline([]) == ""
+    assert encode_polyline([(0, 0)]) == "??"
+
+@pytest.mark.parametrize("precision", [5, 6])
+def test_encode_polyline_round_trip(precision):
+    rng = random.Random(precision)
+    points = [(rng.uniform(-89, 89), rng.uniform(-179, 179)) for _ in range(50)]
+    decoded = _decode(encode_polyline(points, precision), precision)
+    assert len(decoded) == len(points)
+    for (lat, lon), (expected_lat, expected_lon) in zip(decoded, points):
+        assert lat == pytest.approx(expected_lat, abs=10 ** -precision)
+        assert lon == pytest.approx(expected_lon, abs=10 ** -precision)
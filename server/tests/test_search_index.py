@@ -0,0 +1,47 @@
+from services.search_index import SearchEntry, SearchIndex, _normalise
+
+
+def _landmark(name):
+    return SearchEntry("landmark", name, name, None, (12.8, 80.0), _normalise(name))
+
+def _node(name, floor, landmark="Tech Park"):
+    return SearchEntry("node", name, landmark, floor, (10, 10), _normalise(name))
+
+def _index():
+    index = SearchIndex()
+    index.replace_document("landmarks", [_landmark(name) for name in ("Tech Park", "BIO-Tech Block", "University Building")])
+    index.replace_document(("Tech Park", "2"), [_node(name, "2") for name in ("TP 216", "TP 214", "Lift 1", "Lift 2", "Emergency Exit")])
+    index.replace_document(("Tech Park", "3"), [_node(name, "3") for name in ("TP 316", "Lift 1", "Stairs Back")])
+    return index
+
+def _names(results):
+    return [(entry.name, entry.floor) for entry in results]
+
+def test_search_ranking():
+    index = _index()
+    # exact match first, then name prefixes
+    assert _names(index.search("tech park"))[0] == ("Tech Park", None)
+    # word prefixes (every query word starts a word of the name) before near misses
+    assert [name for name, _ in _names(index.search("tp 21"))] == ["TP 214", "TP 216", "TP 316"]
+    # landmarks before rooms, then shorter names
+    assert _names(index.search("tech")) == [("Tech Park", None), ("BIO-Tech Block", None)]
+    assert _names(index.search("lift")) == [("Lift 1", "2"), ("Lift 1", "3"), ("Lift 2", "2")]
+
+def test_search_substring_and_typos():
+    index = _index()
+    assert _names(index.search("ergenc")) == [("Emergency Exit", "2")]
+    assert _names(index.search("emergncy"))[0] == ("Emergency Exit", "2")
+    assert index.search("zzz") == []
+    assert index.search("   ") == []
+
+def test_search_filters_and_limit():
+    index = _index()
+    assert _names(index.search("lift", landmark="Tech Park", kind="node", limit=2)) == [("Lift 1", "2"), ("Lift 1", "3")]
+    assert index.search("tech", kind="node") == []
+
+def test_replace_document_reindexes_one_floor():
+    index = _index()
+    index.replace_document(("Tech Park", "3"), [_node("Lift Alpha", "3")])
+    assert _names(index.search("lift alpha")) == [("Lift Alpha", "3")]
+    assert ("Stairs Back", "3") not in _names(index.search("stairs"))
+    assert ("Lift 1", "2") in _names(index.search("lift 1"))